@@ -5,8 +5,14 @@ import numpy as np
 import pandas as pd
 import re
 
-from .cache import forceTonicization, getTonicizationScaleDegree
+from .cache import (
+    forceTonicization,
+    getTonicizationScaleDegree,
+    romanNumeralAnalysis,
+)
 from .common import FIXEDOFFSET, FLOATSCALE
+from . import romantext_parser
+from .resampling import fixedGrid, resample
 from .chord_vocabulary import frompcset, closestPcSet
 
 A_COLUMNS = [
@@ -59,48 +65,70 @@ def _initialDataFrame(s):
     than usual (e.g., inversion). It may be easier to predict which features
     lead to a better Roman numeral reconstruction this way.
     """
-    dfdict = {col: [] for col in A_COLUMNS}
-    for idx, rn in enumerate(s.flat.getElementsByClass("RomanNumeral")):
-        dfdict["a_offset"].append(round(float(rn.offset), FLOATSCALE))
-        dfdict["a_measure"].append(rn.measureNumber)
-        dfdict["a_duration"].append(round(float(rn.quarterLength), FLOATSCALE))
-        dfdict["a_annotationNumber"].append(idx)
-        # Get basic information from Roman numeral object, then hack it
-        rn, rncorr = _extractRomanNumeralInformation(rn)
-        rncorr = _correctRomanNumeral(rncorr)
-        dfdict["a_romanNumeral"].append(_removeInversion(rncorr["rn"]))
-        dfdict["a_harmonicRhythm"].append(0)
-        dfdict["a_pitchNames"].append(tuple(rncorr["pitchNames"]))
-        dfdict["a_bass"].append(rncorr["pitchNames"][0])
-        dfdict["a_tenor"].append(rncorr["pitchNames"][1])
-        dfdict["a_alto"].append(rncorr["pitchNames"][2])
-        if len(rncorr["pitchNames"]) == 4:
-            dfdict["a_soprano"].append(rncorr["pitchNames"][3])
-        else:
-            dfdict["a_soprano"].append(rncorr["root"])
-        dfdict["a_root"].append(rncorr["root"])
-        dfdict["a_inversion"].append(rncorr["inversion"])
-        dfdict["a_quality"].append(rncorr["quality"])
-        dfdict["a_pcset"].append(rncorr["pcset"])
-        dfdict["a_localKey"].append(rncorr["localKey"])
-        dfdict["a_tonicizedKey"].append(rncorr["tonicizedKey"])
-        scaleDegree, alteration = rn.scaleDegreeWithAlteration
-        if alteration:
-            scaleDegree = f"{alteration.modifier}{scaleDegree}"
-        else:
-            scaleDegree = f"{scaleDegree}"
-        dfdict["a_degree1"].append(str(scaleDegree))
-        secondaryDegree = rn.secondaryRomanNumeral
-        if secondaryDegree:
-            scaleDegree, alteration = secondaryDegree.scaleDegreeWithAlteration
-            if alteration:
-                scaleDegree = f"{alteration.modifier}{scaleDegree}"
-            else:
-                scaleDegree = f"{scaleDegree}"
-            dfdict["a_degree2"].append(scaleDegree)
-        else:
-            dfdict["a_degree2"].append("None")
-    df = pd.DataFrame(dfdict)
+    romanNumerals = [
+        (
+            rn.offset,
+            rn.measureNumber,
+            rn.quarterLength,
+            rn.key.tonicPitchNameWithCase,
+            rn.figure,
+        )
+        for rn in s.flat.getElementsByClass("RomanNumeral")
+    ]
+    return _romanNumeralsDataFrame(romanNumerals)
+
+
+def _fastInitialDataFrame(f):
+    """Produces the dataframe of _initialDataFrame, without music21.
+
+    The RomanText file is streamed by romantext_parser, which raises
+    UnsupportedAnnotation for the annotations that need music21.
+    """
+    return _romanNumeralsDataFrame(romantext_parser.romanNumerals(f))
+
+
+def _romanNumeralsDataFrame(romanNumerals):
+    """The dataframe of (offset, measure, duration, localKey, figure) tuples.
+
+    Each distinct (localKey, figure) is analyzed once, and the columns
+    are built from the analyses in bulk.
+    """
+    romanNumerals = list(romanNumerals)
+    analyses = {}
+    for _, _, _, localKey, figure in romanNumerals:
+        if (localKey, figure) not in analyses:
+            hackedFigure = _preprocessRomanNumeral(figure, localKey)
+            analyses[(localKey, figure)] = romanNumeralAnalysis(
+                localKey, hackedFigure, _analyzeRomanNumeral
+            )
+    analysis = [analyses[(k, f)] for _, _, _, k, f in romanNumerals]
+    rncorr = [a["corrected"] for a in analysis]
+    pitchNames = [rn["pitchNames"] for rn in rncorr]
+    dfdict = {
+        "a_offset": [round(float(x[0]), FLOATSCALE) for x in romanNumerals],
+        "a_measure": [x[1] for x in romanNumerals],
+        "a_duration": [round(float(x[2]), FLOATSCALE) for x in romanNumerals],
+        "a_annotationNumber": list(range(len(romanNumerals))),
+        "a_romanNumeral": [_removeInversion(rn["rn"]) for rn in rncorr],
+        "a_harmonicRhythm": [0] * len(romanNumerals),
+        "a_pitchNames": [tuple(p) for p in pitchNames],
+        "a_bass": [p[0] for p in pitchNames],
+        "a_tenor": [p[1] for p in pitchNames],
+        "a_alto": [p[2] for p in pitchNames],
+        "a_soprano": [
+            p[3] if len(p) == 4 else rn["root"]
+            for p, rn in zip(pitchNames, rncorr)
+        ],
+        "a_root": [rn["root"] for rn in rncorr],
+        "a_inversion": [rn["inversion"] for rn in rncorr],
+        "a_quality": [rn["quality"] for rn in rncorr],
+        "a_pcset": [rn["pcset"] for rn in rncorr],
+        "a_localKey": [rn["localKey"] for rn in rncorr],
+        "a_tonicizedKey": [rn["tonicizedKey"] for rn in rncorr],
+        "a_degree1": [a["degree1"] for a in analysis],
+        "a_degree2": [a["degree2"] for a in analysis],
+    }
+    df = pd.DataFrame(dfdict, columns=A_COLUMNS)
     df.set_index("a_offset", inplace=True)
     return df
 
@@ -148,12 +176,8 @@ def _preprocessRomanNumeral(figure, localKey):
     )
 
 
-def _extractRomanNumeralInformation(rn):
-    """Hacks and workarounds to retrieve the RomanNumeral from music21."""
-    localKey = rn.key.tonicPitchNameWithCase
-    originalpcset = rn.pitchClasses
-    originalFigure = rn.figure
-    hackedFigure = _preprocessRomanNumeral(rn.figure, localKey)
+def _parseRomanNumeral(localKey, hackedFigure):
+    """The music21 RomanNumeral of a preprocessed figure, and its data."""
     s = music21.converter.parseData(
         f"m1 {localKey.replace('-', 'b')}: {hackedFigure}", format="romantext"
     )
@@ -172,9 +196,7 @@ def _extractRomanNumeralInformation(rn):
     pitchNames = rn.pitchNames
     root = rn.root().name
     if len(pitchNames) < 3:
-        print(
-            f"{originalFigure} -> {hackedFigure}, {originalpcset} -> {newpcset}"
-        )
+        print(f"{localKey}: {hackedFigure} -> {newpcset}")
         pitchNames += [root] * 2
     inversion = rn.inversion()
     # This is a workaround before I commit to writing a mapping between
@@ -202,6 +224,28 @@ def _extractRomanNumeralInformation(rn):
     return rn, cleaned
 
 
+def _scaleDegree(rn):
+    scaleDegree, alteration = rn.scaleDegreeWithAlteration
+    if alteration:
+        return f"{alteration.modifier}{scaleDegree}"
+    return f"{scaleDegree}"
+
+
+def _analyzeRomanNumeral(localKey, hackedFigure):
+    """The corrected data and scale degrees of a preprocessed figure.
+
+    These are plain values, memoized on disk by cache.romanNumeralAnalysis,
+    so that each (localKey, figure) is parsed with music21 only once.
+    """
+    rn, rndata = _parseRomanNumeral(localKey, hackedFigure)
+    secondary = rn.secondaryRomanNumeral
+    return {
+        "corrected": _correctRomanNumeral(rndata),
+        "degree1": _scaleDegree(rn),
+        "degree2": _scaleDegree(secondary) if secondary else "None",
+    }
+
+
 def _correctRomanNumeral(rndata):
     """Trust nobody. Rewrite all Roman numerals based on chord vocabulary."""
     rn = rndata["rn"]
@@ -270,15 +314,13 @@ def _harmonicRhythmPostprocessing(a_harmonicRhythm):
     5 - a half note has passed since the last chord
     6 - a whole note has passed since the last chord"""
     template = [1, 2, 2, 3, 3, 3, 3] + ([4] * 8) + ([5] * 16) + ([6] * 32)
-    hr = a_harmonicRhythm.to_list()
-    t = 62
-    for i in range(len(a_harmonicRhythm)):
-        if hr[i] == 0:
-            t = 0
-        else:
-            hr[i] = template[min(t, 62)]
-            t += 1
-    return hr
+    template = np.array(template)
+    hr = np.asarray(a_harmonicRhythm, dtype=float)
+    steps = np.arange(len(hr))
+    # The steps elapsed since the last chord, saturated before the first
+    lastChord = np.maximum.accumulate(np.where(hr == 0, steps, -1))
+    elapsed = np.where(lastChord >= 0, steps - lastChord - 1, 62)
+    return np.where(hr == 0, 0, template[np.minimum(elapsed, 62)])
 
 
 def _reindexDataFrame(df, fixedOffset=FIXEDOFFSET):
@@ -292,30 +334,44 @@ def _reindexDataFrame(df, fixedOffset=FIXEDOFFSET):
     for example, a sixteenth note. This reindex function does
     exactly that.
     """
-    firstRow = df.head(1)
-    lastRow = df.tail(1)
-    minOffset = firstRow.index.to_numpy()[0]
-    maxOffset = (lastRow.index + lastRow.a_duration).to_numpy()[0]
-    newIndex = np.arange(minOffset, maxOffset, fixedOffset)
-    # All operations done over the full index, i.e., fixed-timesteps
-    # plus original onsets. Later, original onsets (e.g., triplets)
-    # are removed and just the fixed-timesteps are kept
-    df = df.reindex(index=df.index.union(newIndex))
+    newIndex = fixedGrid(df, df.a_duration, fixedOffset)
+    resampled = resample(df, newIndex)
     # the harmonic rhythm is postprocessed to reduce class imbalance
-    harmRhythm = _harmonicRhythmPostprocessing(df.a_harmonicRhythm)
-    df["a_harmonicRhythm"] = harmRhythm
-    df.fillna(method="ffill", inplace=True)
-    df = df.reindex(index=newIndex)
-    return df
-
-
-def parseAnnotation(f, fixedOffset=FIXEDOFFSET, eventBased=False):
+    # It counts the steps of the full index, i.e., fixed-timesteps plus
+    # original onsets (e.g., triplets), which are not in newIndex
+    offsets = df.index.to_numpy()
+    fullIndex = np.union1d(offsets, newIndex)
+    harmRhythm = np.full(len(fullIndex), np.nan)
+    harmRhythm[np.searchsorted(fullIndex, offsets)] = df.a_harmonicRhythm
+    harmRhythm = _harmonicRhythmPostprocessing(harmRhythm)
+    harmRhythm = harmRhythm[np.searchsorted(fullIndex, newIndex)]
+    dtype = resampled.a_harmonicRhythm.dtype
+    resampled["a_harmonicRhythm"] = harmRhythm.astype(dtype)
+    return resampled
+
+
+def parseAnnotation(
+    f, fixedOffset=FIXEDOFFSET, eventBased=False, fastParser=False
+):
     """Generates the DataFrame from a RomanText file.
 
     Parses the file using music21. Creates an initial DataFrame
     with every onset event of the music21 stream. Finally,
     does the sampling at symbolically regular durations fixedOffset.
+
+    If fastParser=True, the file is read by the streaming
+    romantext_parser instead, falling back to music21 for the
+    annotations that it does not support.
     """
+    if fastParser:
+        try:
+            df = _fastInitialDataFrame(f)
+        except romantext_parser.UnsupportedAnnotation:
+            pass
+        else:
+            if not eventBased:
+                df = _reindexDataFrame(df, fixedOffset=fixedOffset)
+            return df
     # Step 0: Use music21 to parse the score
     s = _m21Parse(f)
     # Step 1: Parse and produce a salami-sliced dataset
@@ -0,0 +1,108 @@
+"""Transposition data augmentation of encoded sequences, at batch time.
+
+Instead of storing every transposition of a piece, the dataset stores the
+untransposed sequences and, for each, the transpositions that are valid
+for its piece. Each training batch is then transposed to a random valid
+interval per sequence, through the transposition tables of the input and
+output representations.
+"""
+
+import numpy as np
+
+from .feature_representation import INTERVALCLASSES
+from .input_representations import (
+    available_representations as availableInputs,
+)
+from .output_representations import (
+    available_representations as availableOutputs,
+)
+
+TRANSPOSITIONSARRAY = "training_transpositions"
+
+# The fallback of the sequences without any valid transposition
+P1 = INTERVALCLASSES.index("P1")
+
+
+def validTranspositions(intervals):
+    """The mask of INTERVALCLASSES included in intervals."""
+    return np.isin(INTERVALCLASSES, intervals)
+
+
+def transposableClasses(representation, classes):
+    """The mask of intervals that keep all classes within the classList."""
+    table = availableOutputs[representation].transpositionTable()
+    return (table[np.unique(classes)] >= 0).all(axis=0)
+
+
+def sampleTranspositions(masks, rng=np.random):
+    """A random valid transposition (index of INTERVALCLASSES) per row.
+
+    Rows without any valid transposition are not transposed (P1).
+    """
+    # The argmax of uniform noise over the valid entries is uniform
+    noise = rng.random_sample(masks.shape) + 1
+    sampled = np.argmax(noise * (masks > 0), axis=1)
+    return np.where((masks > 0).any(axis=1), sampled, P1)
+
+
+def transposeInputs(array, table, transpositions, padding):
+    """Transposes the (sequence, frame, feature) array of an input.
+
+    Every sequence is transposed by its own interval. Features without a
+    transposed feature in the table are dropped, padding frames are kept.
+    """
+    sequences, frames, features = array.shape
+    targets = table[:, transpositions].T
+    # Dropped features go to an extra column, discarded afterwards
+    targets = np.where(targets < 0, features, targets)
+    targets = np.broadcast_to(targets[:, np.newaxis], array.shape)
+    transposed = np.zeros((sequences, frames, features + 1), array.dtype)
+    np.put_along_axis(transposed, targets, array, axis=-1)
+    transposed = transposed[..., :features]
+    transposed[padding] = -1
+    return transposed
+
+
+def transposeOutputs(array, table, transpositions, padding):
+    """Transposes the (sequence, frame, 1) class array of an output."""
+    transposed = table[array[..., 0], transpositions[:, np.newaxis]]
+    transposed = np.where(padding, array[..., 0], transposed)
+    return transposed[..., np.newaxis].astype(array.dtype)
+
+
+class BatchTransposer(object):
+    """Transposes batches of untransposed sequences to valid intervals.
+
+    The transpositions array has the mask of valid transpositions of
+    every training sequence. The intervals are drawn from a generator
+    seeded with seed, so that the augmentation can be reproduced.
+    """
+
+    def __init__(self, inputs, outputs, transpositions, seed=None):
+        self.inputTables = [
+            availableInputs[name].transpositionTable() for name in inputs
+        ]
+        self.outputTables = [
+            availableOutputs[name].transpositionTable() for name in outputs
+        ]
+        self.transpositions = transpositions
+        self.rng = np.random.RandomState(seed)
+
+    def __call__(self, indices, xs, ys):
+        masks = np.asarray(self.transpositions[indices])
+        transpositions = sampleTranspositions(masks, self.rng)
+        # The padding frames are -1 in every feature
+        padding = (xs[0] == -1).all(axis=-1)
+        xs = [
+            transposeInputs(x, table, transpositions, padding)
+            for x, table in zip(xs, self.inputTables)
+        ]
+        transposedYs = []
+        for y, table in zip(ys, self.outputTables):
+            # Some models (e.g., Micchi2020) predict fewer frames
+            stride = padding.shape[1] // y.shape[1]
+            yPadding = padding[:, ::stride]
+            transposedYs.append(
+                transposeOutputs(y, table, transpositions, yPadding)
+            )
+        return xs, transposedYs
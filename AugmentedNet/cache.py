@@ -1,10 +1,31 @@
-"""Several cached music21 objects and functions for performance."""
+"""Several cached music21 objects and functions for performance.
 
+The tables of plain values (strings and tuples) are also persisted to disk,
+so that new processes skip the music21 warm-up. The file lives in
+~/.cache/AugmentedNet by default. Set AUGMENTEDNET_CACHE to a different
+path, or to an empty string to disable the persistent cache.
+
+The file is read on the first cache miss, and only written by the
+command-line scripts, which call saveCacheAtExit(). A change to the
+package source or to the music21 version invalidates the file.
+"""
+
+import atexit
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+
+import music21
+import numpy as np
 from music21.key import Key
 from music21.pitch import Pitch
 from music21.interval import Interval
-from .keydistance import weberEuclidean as _we
+from music21.roman import RomanNumeral
+from .keydistance import WEBERDISTANCES, WEBERINDEX
 from .keydistance import getTonicizationScaleDegree as _gtsd
+from . import __version__
 
 _transposeKey = {}
 _transposePitch = {}
@@ -12,18 +33,133 @@ _transposePcSet = {}
 _pitchObj = {}
 _keyObj = {}
 _intervalObj = {}
-_weberEuclidean = {}
 _getTonicizationScaleDegree = {}
+_romanNumeralPitchClasses = {}
+# (localKey, figure) -> the analysis of annotation_parser._analyzeRomanNumeral
+_romanNumeralAnalysis = {}
+
+# The tables saved to disk; music21 objects are rebuilt on demand
+PERSISTENT_TABLES = {
+    "transposeKey": _transposeKey,
+    "transposePitch": _transposePitch,
+    "transposePcSet": _transposePcSet,
+    "getTonicizationScaleDegree": _getTonicizationScaleDegree,
+    "romanNumeralPitchClasses": _romanNumeralPitchClasses,
+    "romanNumeralAnalysis": _romanNumeralAnalysis,
+}
+
+_loaded = False
+_loadedSize = 0
+
+
+def cachePath():
+    """The path of the persistent cache, or None if it is disabled."""
+    path = os.environ.get("AUGMENTEDNET_CACHE")
+    if path is None:
+        cacheHome = os.environ.get("XDG_CACHE_HOME", "~/.cache")
+        path = os.path.join(cacheHome, "AugmentedNet", "cache.pkl")
+    if not path:
+        return None
+    return os.path.expanduser(path)
+
+
+@functools.lru_cache(maxsize=None)
+def _sourceDigest():
+    """A digest of the package source, so that code changes invalidate."""
+    digest = hashlib.sha256()
+    package = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(package)):
+        if name.endswith(".py"):
+            with open(os.path.join(package, name), "rb") as fd:
+                digest.update(fd.read())
+    return digest.hexdigest()
+
+
+def _cacheVersion():
+    return (__version__, music21.__version__, _sourceDigest())
+
+
+def _isPrivate(path):
+    """Whether only the current user could have written the file."""
+    stat = os.stat(path)
+    if hasattr(os, "getuid") and stat.st_uid != os.getuid():
+        return False
+    return not stat.st_mode & 0o022
+
+
+def _readCache(path):
+    try:
+        # Unpickling runs code, so a file others can write is ignored
+        if not _isPrivate(path):
+            return {}
+        with open(path, "rb") as fd:
+            version, tables = pickle.load(fd)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        return {}
+    if version != _cacheVersion():
+        return {}
+    return tables
+
+
+def _tablesSize():
+    return sum(len(table) for table in PERSISTENT_TABLES.values())
+
+
+def loadCache(path=None):
+    """Fills the persistent tables with the entries stored on disk."""
+    global _loaded, _loadedSize
+    _loaded = True
+    path = path or cachePath()
+    if not path:
+        return
+    for name, entries in _readCache(path).items():
+        if name in PERSISTENT_TABLES:
+            PERSISTENT_TABLES[name].update(entries)
+    _loadedSize = _tablesSize()
+
+
+def saveCache(path=None):
+    """Merges the persistent tables into the file stored on disk."""
+    global _loadedSize
+    if path is None:
+        path = cachePath()
+        # Nothing new since the cache was loaded
+        if not path or _tablesSize() == _loadedSize:
+            return
+    tables = _readCache(path)
+    for name, table in PERSISTENT_TABLES.items():
+        tables.setdefault(name, {}).update(table)
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((_cacheVersion(), tables), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Could not save the cache to {path}: {e}")
+        return
+    _loadedSize = _tablesSize()
+
+
+def saveCacheAtExit():
+    """Saves the persistent tables when the (main) process exits."""
+    atexit.register(saveCache)
+
+
+def _cached(table, key, compute):
+    """Computes a missing entry, unless the file on disk already has it."""
+    if not _loaded:
+        loadCache()
+        if key in table:
+            return table[key]
+    value = compute()
+    table[key] = value
+    return value
 
 
 def weberEuclidean(k1, k2):
-    """A cached version of keydistance.weberEuclidean."""
-    duple = (k1, k2)
-    if duple in _weberEuclidean:
-        return _weberEuclidean[duple]
-    distance = _we(k1, k2)
-    _weberEuclidean[duple] = distance
-    return distance
+    """A lookup in the precomputed keydistance.WEBERDISTANCES table."""
+    return WEBERDISTANCES[WEBERINDEX[k1], WEBERINDEX[k2]]
 
 
 def getTonicizationScaleDegree(localKey, tonicizedKey):
@@ -31,28 +167,57 @@ def getTonicizationScaleDegree(localKey, tonicizedKey):
     duple = (localKey, tonicizedKey)
     if duple in _getTonicizationScaleDegree:
         return _getTonicizationScaleDegree[duple]
-    degree = _gtsd(localKey, tonicizedKey)
-    _getTonicizationScaleDegree[duple] = degree
-    return degree
+    return _cached(
+        _getTonicizationScaleDegree,
+        duple,
+        lambda: _gtsd(localKey, tonicizedKey),
+    )
+
+
+def romanNumeralPitchClasses(figure, key):
+    """The pitch classes of a cached Roman numeral, e.g., ('V7', 'c#')."""
+    duple = (figure, key)
+    if duple in _romanNumeralPitchClasses:
+        return _romanNumeralPitchClasses[duple]
+    return _cached(
+        _romanNumeralPitchClasses,
+        duple,
+        lambda: tuple(RomanNumeral(figure, key).pitchClasses),
+    )
+
+
+def romanNumeralAnalysis(localKey, figure, analyze):
+    """A cached analysis of a Roman numeral figure in a local key.
+
+    The analysis is computed by analyze(localKey, figure). It is persisted,
+    and any change to the package source invalidates the persisted copy.
+    """
+    duple = (localKey, figure)
+    if duple in _romanNumeralAnalysis:
+        return _romanNumeralAnalysis[duple]
+    return _cached(
+        _romanNumeralAnalysis, duple, lambda: analyze(localKey, figure)
+    )
 
 
 def forceTonicization(localKey, candidateKeys):
     """Forces a tonicization of candidateKey that exist in vocabulary."""
-    tonicizationDistance = 1337
-    tonicization = ""
-    for candidateKey in candidateKeys:
-        distance = weberEuclidean(localKey, candidateKey)
-        # print(f"\t{localKey} -> {candidateKey} = {distance}")
-        scaleDegree = getTonicizationScaleDegree(localKey, candidateKey)
-        if scaleDegree not in ["i", "III"]:
-            # Slight preference for parallel minor and relative major
-            distance *= 1.05
-        if scaleDegree not in ["i", "I", "III", "iv", "IV", "v", "V"]:
-            distance *= 1.05
-        if distance < tonicizationDistance:
-            tonicization = candidateKey
-            tonicizationDistance = distance
-    return tonicization
+    if not candidateKeys:
+        return ""
+    candidates = [WEBERINDEX[k] for k in candidateKeys]
+    distances = WEBERDISTANCES[WEBERINDEX[localKey], candidates]
+    scaleDegrees = [
+        getTonicizationScaleDegree(localKey, k) for k in candidateKeys
+    ]
+    # Slight preference for parallel minor and relative major
+    notParallel = [sd not in ["i", "III"] for sd in scaleDegrees]
+    distances = distances * np.where(notParallel, 1.05, 1.0)
+    notDiatonic = [
+        sd not in ["i", "I", "III", "iv", "IV", "v", "V"]
+        for sd in scaleDegrees
+    ]
+    distances = distances * np.where(notDiatonic, 1.05, 1.0)
+    return candidateKeys[np.argmin(distances)]
 
 
 def TransposeKey(key, interval):
@@ -60,10 +225,11 @@ def TransposeKey(key, interval):
     duple = (key, interval)
     if duple in _transposeKey:
         return _transposeKey[duple]
-    keyObj = m21Key(key)
-    transposed = keyObj.transpose(interval).tonicPitchNameWithCase
-    _transposeKey[duple] = transposed
-    return transposed
+    return _cached(
+        _transposeKey,
+        duple,
+        lambda: m21Key(key).transpose(interval).tonicPitchNameWithCase,
+    )
 
 
 def TransposePitch(pitch, interval):
@@ -71,10 +237,11 @@ def TransposePitch(pitch, interval):
     duple = (pitch, interval)
     if duple in _transposePitch:
         return _transposePitch[duple]
-    pitchObj = m21Pitch(pitch)
-    transposed = pitchObj.transpose(interval).nameWithOctave
-    _transposePitch[duple] = transposed
-    return transposed
+    return _cached(
+        _transposePitch,
+        duple,
+        lambda: m21Pitch(pitch).transpose(interval).nameWithOctave,
+    )
 
 
 def TransposePcSet(pcset, interval):
@@ -82,11 +249,12 @@ def TransposePcSet(pcset, interval):
     duple = (pcset, interval)
     if duple in _transposePcSet:
         return _transposePcSet[duple]
-    semitones = m21IntervalStr(interval).semitones
-    transposed = [(x + semitones) % 12 for x in pcset]
-    transposed = tuple(sorted(transposed))
-    _transposePcSet[duple] = transposed
-    return transposed
+
+    def transpose():
+        semitones = m21IntervalStr(interval).semitones
+        return tuple(sorted((x + semitones) % 12 for x in pcset))
+
+    return _cached(_transposePcSet, duple, transpose)
 
 
 def m21IntervalStr(interval):
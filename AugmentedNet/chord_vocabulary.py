@@ -19,17 +19,24 @@ def closestPcSet(pcset):
     v1 = np.zeros(12)
     for pc in pcset:
         v1[pc] = 1
-    mostSimilarScore = -2
-    closestPcSet = []
-    for pcs in frompcset:
-        v2 = np.zeros(12)
-        for p in pcs:
-            v2[p] = 1
-        similarity = cosineSimilarity(v1, v2)
-        if similarity > mostSimilarScore:
-            closestPcSet = pcs
-            mostSimilarScore = similarity
-    return closestPcSet
+    if not v1.any():
+        return []
+    return closestPcSets(v1)[0]
+
+
+def closestPcSets(vectors):
+    """Get the closest matching pcset for each of many pitch-class vectors.
+
+    The vectors are the rows of a (n, 12) array. Their cosine similarity
+    against every pcset in the vocabulary is computed with a single matrix
+    product. Ties are solved in favor of the first pcset in the vocabulary.
+    """
+    vectors = np.atleast_2d(vectors)
+    norms = norm(vectors, axis=1).reshape(-1, 1)
+    similarities = dot(vectors, VOCABULARYVECTORS.T) / (
+        norms * VOCABULARYNORMS
+    )
+    return [VOCABULARYPCSETS[i] for i in np.argmax(similarities, axis=1)]
 
 
 frompcset = {
@@ -1879,3 +1886,11 @@ frompcset = {
         "g-": {"chord": ["F", "A-", "C-"], "quality": "dim", "rn": "viio"},
     },
 }
+
+# The vocabulary as a matrix of pitch-class vectors (pcsets x 12), and the
+# norms of those vectors, computed once for all cosine similarity lookups
+VOCABULARYPCSETS = tuple(frompcset.keys())
+VOCABULARYVECTORS = np.zeros((len(VOCABULARYPCSETS), 12))
+for _row, _pcset in enumerate(VOCABULARYPCSETS):
+    VOCABULARYVECTORS[_row, list(_pcset)] = 1
+VOCABULARYNORMS = norm(VOCABULARYVECTORS, axis=1)
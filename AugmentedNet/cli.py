@@ -24,6 +24,9 @@ class DefaultArguments(object):
     tsv = {
         "synthesize": False,
         "texturize": False,
+        "fastScoreParser": False,
+        "fastAnnotationParser": False,
+        "cacheDataFrames": False,
     }
     npz = {
         "synthetic": False,
@@ -57,6 +60,9 @@ class DefaultArguments(object):
         "testSetOn": False,
         "npzOutput": "dataset",
         "transpositionKeys": TRANSPOSITIONKEYS,
+        "jobs": 1,
+        "datasetFormat": "npz",
+        "onTheFlyTransposition": False,
     }
     train = {
         "nogpu": False,
@@ -69,11 +75,17 @@ class DefaultArguments(object):
         "batchsize": 16,
         "transferLearningFrom": "",
         "transferLearningFreeze": False,
+        "tfdata": False,
+        "shuffleBuffer": 0,
+        "readers": 4,
+        "seed": None,
     }
     inference = {
         "modelPath": "AugmentedNet.hdf5",
         "dir": False,
         "useGpu": False,
+        "batchSize": 64,
+        "workers": 1,
     }
 
 
@@ -104,6 +116,21 @@ def tsv():
         action="store_true",
         help="If synthesizing a score, apply texturization to it.",
     )
+    parser.add_argument(
+        "--fastScoreParser",
+        action="store_true",
+        help="Read MusicXML scores without music21, when supported.",
+    )
+    parser.add_argument(
+        "--fastAnnotationParser",
+        action="store_true",
+        help="Read RomanText annotations without music21, when supported.",
+    )
+    parser.add_argument(
+        "--cacheDataFrames",
+        action="store_true",
+        help="Reuse the DataFrames parsed by earlier runs, from disk.",
+    )
     parser.set_defaults(**DefaultArguments.tsv)
     return parser
 
@@ -178,6 +205,21 @@ def npz(is_parent_parser=False):
         nargs="+",
         help="Constraint the keys for transposition (data augmentation).",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="The number of processes encoding the tsv files in parallel.",
+    )
+    parser.add_argument(
+        "--datasetFormat",
+        choices=["npz", "npy"],
+        help="Save a compressed .npz, or a memory-mappable .npy directory.",
+    )
+    parser.add_argument(
+        "--onTheFlyTransposition",
+        action="store_true",
+        help="Save untransposed sequences, transpose them during training.",
+    )
     parser.set_defaults(**DefaultArguments.npz)
     return parser
 
@@ -253,6 +295,27 @@ def train():
         action="store_true",
         help="If transfer learning, freeze all but the classification layers.",
     )
+    parser.add_argument(
+        "--tfdata",
+        action="store_true",
+        help="Stream the training batches from disk with a tf.data pipeline. "
+        "Implies --datasetFormat npy, the memory-mappable format.",
+    )
+    parser.add_argument(
+        "--shuffleBuffer",
+        type=int,
+        help="With --tfdata, the shuffle buffer size (0 shuffles them all).",
+    )
+    parser.add_argument(
+        "--readers",
+        type=int,
+        help="With --tfdata, the number of batches read in parallel.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="The seed of the on-the-fly transpositions, for reproducibility.",
+    )
     parser.set_defaults(**DefaultArguments.train)
     return parser
 
@@ -276,5 +339,15 @@ def inference():
         action="store_true",
         help="Use GPU if available.",
     )
+    parser.add_argument(
+        "--batchSize",
+        type=int,
+        help="Number of sequences, shared across scores, per model call.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of processes parsing and encoding scores in parallel.",
+    )
     parser.set_defaults(**DefaultArguments.inference)
     return parser
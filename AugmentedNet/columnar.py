@@ -0,0 +1,154 @@
+"""A binary, columnar storage for DataFrames with list-typed columns.
+
+Every column is saved as plain numpy arrays inside an uncompressed npz
+file, so that loading a DataFrame needs neither pickle nor eval.
+
+- Numeric and boolean columns are saved as they are.
+- String columns are saved as integer codes and their categories.
+- Columns of mixed types are saved as the reprs of their values, which
+  are read back with ast.literal_eval.
+- List-typed columns are saved as a flat array with the values of every
+  row, and the offsets where each row starts. Missing rows (e.g., the
+  rests of a score) are saved as a mask.
+"""
+
+import ast
+import json
+
+import numpy as np
+import pandas as pd
+
+FORMATVERSION = 1
+
+
+def _isMissing(value):
+    return isinstance(value, float) and np.isnan(value)
+
+
+def _scalarKind(values):
+    """The kind of array that can store these scalars."""
+    if all(isinstance(v, str) or _isMissing(v) for v in values):
+        return "category"
+    if all(isinstance(v, (bool, np.bool_)) for v in values):
+        return "bool"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return "int"
+    if all(isinstance(v, float) for v in values):
+        return "float"
+    return "literal"
+
+
+def _encodeScalars(values, kind):
+    if kind == "bool":
+        return {"values": np.array(values, dtype=bool)}
+    if kind == "int":
+        return {"values": np.array(values, dtype=np.int64)}
+    if kind == "float":
+        return {"values": np.array(values, dtype=np.float64)}
+    if kind == "literal":
+        # Missing values keep code -1, as in the category kind
+        values = [v if _isMissing(v) else repr(v) for v in values]
+    codes, categories = pd.factorize(pd.Series(values, dtype=object))
+    categories = np.array(list(categories), dtype=str)
+    return {"codes": codes.astype(np.int32), "categories": categories}
+
+
+def _decodeScalars(arrays, kind):
+    if kind in ("bool", "int", "float"):
+        return arrays["values"].tolist()
+    categories = arrays["categories"].tolist()
+    if kind == "literal":
+        categories = [ast.literal_eval(c) for c in categories]
+    # Code -1 stands for a missing value
+    categories = np.array(categories + [np.nan], dtype=object)
+    return categories[arrays["codes"]].tolist()
+
+
+def _columnKind(column):
+    if column.dtype != object:
+        return "array"
+    cells = [v for v in column if not _isMissing(v)]
+    if not cells:
+        return "scalar"
+    if all(isinstance(v, list) for v in cells):
+        return "list"
+    if all(isinstance(v, tuple) for v in cells):
+        return "tuple"
+    return "scalar"
+
+
+def save(df, path):
+    """Saves a DataFrame as a columnar npz file."""
+    arrays = {"index": df.index.to_numpy()}
+    columns = []
+    for i, name in enumerate(df.columns):
+        column = df[name]
+        kind = _columnKind(column)
+        valuesKind = None
+        if kind == "array":
+            encoded = {"values": column.to_numpy()}
+        elif kind == "scalar":
+            valuesKind = _scalarKind(column.tolist())
+            encoded = _encodeScalars(column.tolist(), valuesKind)
+        else:
+            missing = np.array([_isMissing(cell) for cell in column])
+            cells = [[] if _isMissing(cell) else cell for cell in column]
+            lengths = [len(cell) for cell in cells]
+            flat = [value for cell in cells for value in cell]
+            valuesKind = _scalarKind(flat)
+            encoded = _encodeScalars(flat, valuesKind)
+            offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            encoded["offsets"] = offsets
+            if missing.any():
+                encoded["missing"] = missing
+        for arrayName, array in encoded.items():
+            arrays[f"{i}_{arrayName}"] = array
+        columns.append({"name": name, "kind": kind, "values": valuesKind})
+    metadata = {
+        "version": FORMATVERSION,
+        "index": df.index.name,
+        "columns": columns,
+    }
+    arrays["metadata"] = np.array(json.dumps(metadata))
+    np.savez(path, **arrays)
+
+
+def load(path):
+    """Loads a DataFrame saved as a columnar npz file."""
+    with np.load(path) as npz:
+        metadata = json.loads(str(npz["metadata"]))
+        if metadata["version"] != FORMATVERSION:
+            raise ValueError(f"Unsupported columnar format in {path}.")
+        data = {}
+        for i, column in enumerate(metadata["columns"]):
+            prefix = f"{i}_"
+            arrays = {
+                k[len(prefix) :]: npz[k]
+                for k in npz.files
+                if k.startswith(prefix)
+            }
+            kind, valuesKind = column["kind"], column["values"]
+            if kind == "array":
+                values = arrays["values"]
+            elif kind == "scalar":
+                values = _decodeScalars(arrays, valuesKind)
+            else:
+                flat = _decodeScalars(arrays, valuesKind)
+                offsets = arrays["offsets"].tolist()
+                values = [
+                    flat[start:end]
+                    for start, end in zip(offsets[:-1], offsets[1:])
+                ]
+                if kind == "tuple":
+                    values = [tuple(v) for v in values]
+                for row in np.flatnonzero(arrays.get("missing", [])):
+                    values[row] = np.nan
+            if kind != "array":
+                # Keep the lists/tuples as the cells of an object column
+                cells = np.empty(len(values), dtype=object)
+                cells[:] = values
+                values = cells
+            data[column["name"]] = values
+        index = pd.Index(npz["index"], name=metadata["index"])
+    return pd.DataFrame(data, index=index, columns=list(data))
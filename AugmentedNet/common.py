@@ -11,4 +11,7 @@ FIXEDOFFSET = round(4.0 / FRAMEBASENOTE, FLOATSCALE)
 
 DATASETSUMMARYFILE = "dataset_summary.tsv"
 
+# The index of the arrays in an (uncompressed) npy dataset directory
+DATASETMANIFESTFILE = "manifest.json"
+
 ANNOTATIONSCOREDUPLES, DATASPLITS = getAnnotationScoreDataset()
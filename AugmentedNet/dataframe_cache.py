@@ -0,0 +1,146 @@
+"""A persistent cache of the DataFrames parsed from scores and annotations.
+
+The DataFrames are saved as columnar files, keyed by the content of the
+parsed files, the options of the parser, and the versions of AugmentedNet
+and music21. Repeated runs over the same files skip music21 entirely.
+The cache is opt-in: dataset_tsv_generator uses it with --cacheDataFrames,
+and the misc scripts that reparse the same files wrap their parsers with
+it. Inference needs the music21 streams of the score, so it is not cached.
+
+The cache lives next to the persistent cache of cache.py, so it is also
+disabled by setting AUGMENTEDNET_CACHE to an empty string. Beyond
+MAXCACHESIZE bytes, the least recently used DataFrames are evicted.
+"""
+
+import functools
+import hashlib
+import inspect
+import os
+import tempfile
+import zipfile
+
+import music21
+import pandas as pd
+
+from . import __version__, columnar
+from .cache import _sourceDigest, cachePath
+
+MAXCACHESIZE = 2**30
+
+
+def cacheDir():
+    """The directory of the cached DataFrames, or None if it is disabled."""
+    path = cachePath()
+    if not path:
+        return None
+    return os.path.join(os.path.dirname(path), "dataframes")
+
+
+def _fileDigest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cacheKey(name, files, options):
+    """The key of a parser call, based on the content of its files."""
+    versions = (
+        __version__,
+        music21.__version__,
+        columnar.FORMATVERSION,
+        _sourceDigest(),
+    )
+    # The extension of a file decides the format music21 parses it with
+    extensions = [os.path.splitext(f)[1].lower() for f in files]
+    digest = hashlib.sha256()
+    digest.update(repr((name, versions, extensions, options)).encode())
+    for f in files:
+        digest.update(_fileDigest(f).encode())
+    return digest.hexdigest()
+
+
+def load(key, directory):
+    """The cached DataFrame of a key, or None if there is none."""
+    path = os.path.join(directory, f"{key}.npz")
+    try:
+        df = columnar.load(path)
+        # The modification time tracks the least recently used entries
+        os.utime(path)
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+    return df
+
+
+def save(df, key, directory, maxSize=MAXCACHESIZE):
+    """Caches the DataFrame of a key, evicting the least recently used."""
+    path = os.path.join(directory, f"{key}.npz")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            columnar.save(df, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Could not save the DataFrame to {path}: {e}")
+        return
+    evict(directory, maxSize)
+
+
+def evict(directory, maxSize=MAXCACHESIZE):
+    """Removes the least recently used DataFrames beyond maxSize bytes."""
+    entries = []
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".npz"):
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= maxSize:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+
+def cachedDataFrame(*fileArguments):
+    """Caches the DataFrames that a parser returns, across runs.
+
+    fileArguments are the names of the arguments with the paths of the
+    parsed files. Every other argument is part of the key. Calls with
+    inputs that are not files, or that do not return a DataFrame (e.g.,
+    parseScore(returnStreams=True)) are not cached.
+    """
+
+    def decorator(parser):
+        signature = inspect.signature(parser)
+        name = f"{parser.__module__}.{parser.__qualname__}"
+
+        @functools.wraps(parser)
+        def wrapper(*args, **kwargs):
+            directory = cacheDir()
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            options = dict(bound.arguments)
+            files = [options.pop(argument) for argument in fileArguments]
+            isFile = [isinstance(f, str) and os.path.isfile(f) for f in files]
+            if not directory or not all(isFile):
+                return parser(*args, **kwargs)
+            key = cacheKey(name, files, sorted(options.items()))
+            df = load(key, directory)
+            if df is None:
+                df = parser(*args, **kwargs)
+                if isinstance(df, pd.DataFrame):
+                    save(df, key, directory)
+            return df
+
+        return wrapper
+
+    return decorator
@@ -1,35 +1,46 @@
 """Generate pkl files for every tsv training example."""
 
+import json
+import multiprocessing
 import os
+import shutil
+import tempfile
+import zipfile
 import pandas as pd
 import numpy as np
 import tensorflow as tf
 
-from . import cli
 from . import joint_parser
-from .cache import TransposeKey
-from .common import DATASETSUMMARYFILE
-from .feature_representation import TRANSPOSITIONKEYS, INTERVALCLASSES
+from .augmentation import (
+    TRANSPOSITIONSARRAY,
+    transposableClasses,
+    validTranspositions,
+)
+from .common import DATASETMANIFESTFILE, DATASETSUMMARYFILE
+from .feature_representation import (
+    EncodingContext,
+    INTERVALCLASSES,
+    TRANSPOSITIONKEYS,
+)
 from .input_representations import (
     available_representations as availableInputs,
 )
 from .output_representations import (
     available_representations as availableOutputs,
 )
+from .transposition import KEYINDEX, transposeKeys
 from .utils import padToSequenceLength, DynamicArray
 
 
 def _getTranspositions(df, transpositionKeys=TRANSPOSITIONKEYS):
     tonicizedKeys = df.a_localKey.to_list() + df.a_tonicizedKey.to_list()
     tonicizedKeys = set(tonicizedKeys)
-    ret = []
-    for interval in INTERVALCLASSES:
-        transposed = [TransposeKey(k, interval) for k in tonicizedKeys]
-        # Transpose to this interval if every modulation lies within
-        # the set of KEY classes that we can classify
-        if set(transposed).issubset(set(transpositionKeys)):
-            ret.append(interval)
-    return ret
+    transposed = transposeKeys(tonicizedKeys, INTERVALCLASSES)
+    # Transpose to this interval if every modulation lies within
+    # the set of KEY classes that we can classify
+    allowed = [KEYINDEX[k] for k in transpositionKeys if k in KEYINDEX]
+    valid = np.isin(transposed, allowed).all(axis=0)
+    return [interval for interval, v in zip(INTERVALCLASSES, valid) if v]
 
 
 def initializeArrays(inputRepresentations, outputRepresentations):
@@ -65,6 +76,202 @@ def correctSplit(split, testSetOn):
     return split
 
 
+def _encodeFile(
+    tsvlocation,
+    split,
+    synthetic,
+    texturizeEachTransposition,
+    noTransposition,
+    inputRepresentations,
+    outputRepresentations,
+    sequenceLength,
+    scrutinizeData,
+    transpositionKeys,
+    onTheFlyTransposition=False,
+):
+    """Encodes every transposition of a tsv file.
+
+    Returns a dict with the sequences of each npz array, shaped as
+    (sequences, sequenceLength, features), in the order they are saved.
+    With onTheFlyTransposition, the training sequences are only encoded
+    untransposed, and saved along with the mask of their valid
+    transpositions, to be transposed at training time.
+    """
+    encoded = {}
+    df = joint_parser.from_dataset(tsvlocation)
+    if scrutinizeData and split == "training":
+        df = scrutinize(df)
+    if noTransposition or split != "training":
+        transpositions = ["P1"]
+    else:
+        transpositions = _getTranspositions(df, transpositionKeys)
+        print("\t", transpositions)
+    onTheFly = onTheFlyTransposition and split == "training"
+    if onTheFly:
+        valid = validTranspositions(transpositions)
+        transpositions = ["P1"] if transpositions else []
+    if synthetic and texturizeEachTransposition:
+        # once per transposition
+        dfsynth = df.copy()
+        batches = (
+            (joint_parser.retexturizeSynthetic(dfsynth), [transposition])
+            for transposition in transpositions
+        )
+    elif synthetic:
+        # once per file
+        batches = [(joint_parser.retexturizeSynthetic(df), transpositions)]
+    else:
+        batches = [(df, transpositions)]
+    for df, intervals in batches:
+        if not intervals:
+            continue
+        # Shares the encoded primitive blocks among all representations
+        context = EncodingContext(df)
+        for inputRepresentation in inputRepresentations:
+            inputLayer = context.representation(
+                availableInputs[inputRepresentation]
+            )
+            Xi = inputLayer.runTranspositions(intervals)
+            Xi = padToSequenceLength(Xi, sequenceLength, value=-1)
+            # Every transposition, one after the other
+            Xi = Xi.reshape(-1, *Xi.shape[2:]).astype("int8", copy=False)
+            npzfile = f"{split}_X_{inputRepresentation}"
+            encoded.setdefault(npzfile, []).append(Xi)
+        for outputRepresentation in outputRepresentations:
+            outputLayer = context.representation(
+                availableOutputs[outputRepresentation]
+            )
+            yi = outputLayer.runTranspositions(intervals)
+            if onTheFly:
+                valid &= transposableClasses(outputRepresentation, yi)
+            if outputRepresentation == "HarmonicRhythm7":
+                yi = padToSequenceLength(yi, sequenceLength, value=6)
+            else:
+                yi = padToSequenceLength(yi, sequenceLength)
+            yi = yi.reshape(-1, *yi.shape[2:]).astype("int8", copy=False)
+            npzfile = f"{split}_y_{outputRepresentation}"
+            encoded.setdefault(npzfile, []).append(yi)
+    if onTheFly and encoded:
+        sequences = sum(len(xi) for xi in next(iter(encoded.values())))
+        masks = np.tile(valid.astype("int8"), (sequences, 1))
+        encoded[TRANSPOSITIONSARRAY] = [masks]
+    return {k: np.concatenate(v) for k, v in encoded.items()}
+
+
+def _datasetFiles(df, datasetDir, testSetOn):
+    """Yields the location and split of every tsv file in the summary."""
+    for row in df.itertuples():
+        split = correctSplit(row.split, testSetOn)
+        if split == "test":
+            # Preemptive measure just to avoid a potential disaster
+            continue
+        print(f"{row.split} -used-as-> {split}", row.file)
+        tsvlocation = os.path.join(datasetDir, row.split, f"{row.file}.tsv")
+        yield tsvlocation, split
+
+
+def _encodeShard(job):
+    """Encodes a tsv file in a worker process, saving it as a shard."""
+    shardPath, kwargs = job
+    np.savez(shardPath, **_encodeFile(**kwargs))
+    return shardPath
+
+
+def _encodeFiles(jobs, workers=1, tmpdir="."):
+    """Yields the encoded files in order, using several workers if asked.
+
+    The workers pass their encoded files through shards in tmpdir.
+    """
+    if workers <= 1:
+        for kwargs in jobs:
+            yield _encodeFile(**kwargs)
+        return
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix=".npzshards", dir=tmpdir) as tmp:
+        shards = (
+            (os.path.join(tmp, f"{i}.npz"), kwargs)
+            for i, kwargs in enumerate(jobs)
+        )
+        with context.Pool(workers) as pool:
+            # imap returns the shards in summary order, as they finish
+            for shardPath in pool.imap(_encodeShard, shards):
+                with np.load(shardPath) as shard:
+                    encoded = {k: shard[k] for k in shard.files}
+                os.remove(shardPath)
+                yield encoded
+
+
+def datasetLocation(npzOutput, synthetic=False, datasetFormat="npz"):
+    """The npz file, or the npy directory, where a dataset is saved."""
+    # drop the extension, we'll overwrite it
+    filename, _ = os.path.splitext(npzOutput)
+    filename = f"{filename}-synth" if synthetic else filename
+    return f"{filename}-npy" if datasetFormat == "npy" else f"{filename}.npz"
+
+
+def datasetExists(location):
+    """Whether a complete npz file, or npy directory, is in location."""
+    if os.path.isdir(location):
+        return os.path.isfile(os.path.join(location, DATASETMANIFESTFILE))
+    return os.path.isfile(location)
+
+
+def _startNpy(location):
+    """Creates the npy directory, without the manifest of a previous one."""
+    os.makedirs(location, exist_ok=True)
+    manifestPath = os.path.join(location, DATASETMANIFESTFILE)
+    if os.path.isfile(manifestPath):
+        os.remove(manifestPath)
+
+
+def _saveManifest(location, arrays):
+    """Saves the manifest of the .npy files in an npy directory."""
+    manifest = {"arrays": []}
+    for name, array in arrays.items():
+        manifest["arrays"].append(
+            {
+                "name": name,
+                "file": f"{name}.npy",
+                "shape": list(array.shape),
+                "dtype": str(array.dtype),
+            }
+        )
+    # Written last, a directory without a manifest is incomplete
+    with open(os.path.join(location, DATASETMANIFESTFILE), "w") as fd:
+        json.dump(manifest, fd, indent=2)
+
+
+def _saveNpz(location, arrays):
+    """Saves a compressed npz, streaming the .npy file of each array."""
+    with zipfile.ZipFile(
+        location, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True
+    ) as npz:
+        for name, array in arrays.items():
+            with open(array.path, "rb") as src, npz.open(
+                f"{name}.npy", "w", force_zip64=True
+            ) as dst:
+                shutil.copyfileobj(src, dst, 1 << 24)
+
+
+class NpyDataset(object):
+    """A dataset saved as a directory of .npy files.
+
+    Mimics the interface of a loaded npz file. The manifest lists the
+    arrays, in order, with their shape; the arrays are memory-mapped
+    lazily, the first time they are accessed.
+    """
+
+    def __init__(self, location):
+        self.location = location
+        with open(os.path.join(location, DATASETMANIFESTFILE)) as fd:
+            self.manifest = {a["name"]: a for a in json.load(fd)["arrays"]}
+        self.files = list(self.manifest.keys())
+
+    def __getitem__(self, name):
+        path = os.path.join(self.location, self.manifest[name]["file"])
+        return np.load(path, mmap_mode="r")
+
+
 def generateDataset(
     synthetic,
     texturizeEachTransposition,
@@ -79,6 +286,9 @@ def generateDataset(
     tsvDir,
     npzOutput,
     transpositionKeys,
+    jobs=1,
+    datasetFormat="npz",
+    onTheFlyTransposition=False,
 ):
     outputArrays = {}
     training = ["training", "validation"] if testSetOn else ["training"]
@@ -98,64 +308,63 @@ def generateDataset(
         & (datasetSummary.split.isin(validation))
     ]
     df = pd.concat([trainingdf, validationdf])
-    for row in df.itertuples():
-        split = correctSplit(row.split, testSetOn)
-        if split == "test":
-            # Preemptive measure just to avoid a potential disaster
-            continue
-        print(f"{row.split} -used-as-> {split}", row.file)
-        tsvlocation = os.path.join(datasetDir, row.split, f"{row.file}.tsv")
-        df = joint_parser.from_tsv(tsvlocation)
-        if scrutinizeData and split == "training":
-            df = scrutinize(df)
-        if noTransposition or split != "training":
-            transpositions = ["P1"]
-        else:
-            transpositions = _getTranspositions(df, transpositionKeys)
-            print("\t", transpositions)
-        if synthetic:
-            if not texturizeEachTransposition:
-                # once per file
-                df = joint_parser.retexturizeSynthetic(df)
-            else:
-                # once per transposition
-                dfsynth = df.copy()
-        for transposition in transpositions:
-            if synthetic and texturizeEachTransposition:
-                df = joint_parser.retexturizeSynthetic(dfsynth)
-            for inputRepresentation in inputRepresentations:
-                inputLayer = availableInputs[inputRepresentation](df)
-                Xi = inputLayer.run(transposition=transposition)
-                Xi = padToSequenceLength(Xi, sequenceLength, value=-1)
-                npzfile = f"{split}_X_{inputRepresentation}"
-                if npzfile not in outputArrays:
-                    outputArrays[npzfile] = DynamicArray(
-                        shape=Xi.shape, dtype="int8", memmap=f".{npzfile}.mmap"
-                    )
-                for sequence in Xi:
-                    outputArrays[npzfile].update(sequence)
-            for outputRepresentation in outputRepresentations:
-                outputLayer = availableOutputs[outputRepresentation](df)
-                yi = outputLayer.run(transposition=transposition)
-                if outputRepresentation == "HarmonicRhythm7":
-                    yi = padToSequenceLength(yi, sequenceLength, value=6)
-                else:
-                    yi = padToSequenceLength(yi, sequenceLength)
-                npzfile = f"{split}_y_{outputRepresentation}"
+    encodingArgs = {
+        "synthetic": synthetic,
+        "texturizeEachTransposition": texturizeEachTransposition,
+        "noTransposition": noTransposition,
+        "inputRepresentations": inputRepresentations,
+        "outputRepresentations": outputRepresentations,
+        "sequenceLength": sequenceLength,
+        "scrutinizeData": scrutinizeData,
+        "transpositionKeys": transpositionKeys,
+        "onTheFlyTransposition": onTheFlyTransposition,
+    }
+    files = _datasetFiles(df, datasetDir, testSetOn)
+    files = (
+        {"tsvlocation": tsvlocation, "split": split, **encodingArgs}
+        for tsvlocation, split in files
+    )
+    outputFile = datasetLocation(npzOutput, synthetic, datasetFormat)
+    if datasetFormat == "npy":
+        # The arrays are written straight into the npy directory
+        _startNpy(outputFile)
+        tmpdir = outputFile
+    else:
+        tmpdir = os.path.dirname(outputFile) or "."
+    try:
+        encodedFiles = _encodeFiles(files, workers=jobs, tmpdir=tmpdir)
+        for done, encoded in enumerate(encodedFiles, start=1):
+            for npzfile, sequences in encoded.items():
                 if npzfile not in outputArrays:
+                    path = ""
+                    if datasetFormat == "npy":
+                        path = os.path.join(outputFile, f"{npzfile}.npy")
                     outputArrays[npzfile] = DynamicArray(
-                        shape=yi.shape, dtype="int8", memmap=f".{npzfile}.mmap"
+                        shape=sequences.shape,
+                        dtype="int8",
+                        path=path,
+                        tmpdir=tmpdir,
                     )
-                for sequence in yi:
-                    outputArrays[npzfile].update(sequence)
-    # drop the extension, we'll overwrite it to .npz
-    filename, _ = os.path.splitext(npzOutput)
-    outputFile = f"{filename}-synth" if synthetic else filename
-    outputArrays = {k: v.finalize() for k, v in outputArrays.items()}
-    np.savez_compressed(outputFile, **outputArrays)
+                array = outputArrays[npzfile]
+                array.extend(sequences)
+                # Extrapolated from the files encoded so far
+                array.reserve(array.size * len(df.index) // done)
+        arrays = {k: v.finalize() for k, v in outputArrays.items()}
+        if datasetFormat == "npy":
+            _saveManifest(outputFile, arrays)
+        else:
+            _saveNpz(outputFile, outputArrays)
+    finally:
+        for array in outputArrays.values():
+            array.close()
 
 
 if __name__ == "__main__":
+    # Imported here, spawned workers cannot import cli (circular import)
+    from . import cli
+    from .cache import saveCacheAtExit
+
+    saveCacheAtExit()
     parser = cli.npz()
     args = parser.parse_args()
     generateDataset(**vars(args))
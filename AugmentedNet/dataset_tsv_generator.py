@@ -5,18 +5,30 @@ import pandas as pd
 from pathlib import Path
 
 from . import cli
+from .cache import saveCacheAtExit
 from .common import (
     ANNOTATIONSCOREDUPLES,
     DATASPLITS,
     DATASETSUMMARYFILE,
 )
+from .dataframe_cache import cachedDataFrame
 from .joint_parser import (
+    columnarPath,
+    from_tsv,
     parseAnnotationAndScore,
     parseAnnotationAndAnnotation,
+    to_columnar,
 )
 
 
-def generateDataset(synthesize=False, texturize=False, tsvDir="dataset"):
+def generateDataset(
+    synthesize=False,
+    texturize=False,
+    tsvDir="dataset",
+    fastScoreParser=False,
+    fastAnnotationParser=False,
+    cacheDataFrames=False,
+):
     statsdict = {
         "file": [],
         "annotation": [],
@@ -27,6 +39,9 @@ def generateDataset(synthesize=False, texturize=False, tsvDir="dataset"):
         "qualityMean": [],
         "incongruentBassMean": [],
     }
+    parse = parseAnnotationAndScore
+    if cacheDataFrames:
+        parse = cachedDataFrame("a", "s")(parseAnnotationAndScore)
     datasetDir = f"{tsvDir}-synth" if synthesize else tsvDir
     Path(datasetDir).mkdir(exist_ok=True)
     for split, files in DATASPLITS.items():
@@ -35,13 +50,21 @@ def generateDataset(synthesize=False, texturize=False, tsvDir="dataset"):
             print(nickname)
             annotation, score = ANNOTATIONSCOREDUPLES[nickname]
             if not synthesize:
-                df = parseAnnotationAndScore(annotation, score)
+                df = parse(
+                    annotation,
+                    score,
+                    fastScoreParser=fastScoreParser,
+                    fastAnnotationParser=fastAnnotationParser,
+                )
             else:
                 df = parseAnnotationAndAnnotation(
                     annotation, texturize=texturize
                 )
             outpath = os.path.join(datasetDir, split, nickname + ".tsv")
             df.to_csv(outpath, sep="\t")
+            # The columnar copy is what dataset_npz_generator reads;
+            # it is saved from the tsv to hold exactly the same values
+            to_columnar(from_tsv(outpath), columnarPath(outpath))
             collection = nickname.split("-")[0]
             statsdict["file"].append(nickname)
             statsdict["annotation"].append(annotation)
@@ -60,6 +83,7 @@ def generateDataset(synthesize=False, texturize=False, tsvDir="dataset"):
 
 
 if __name__ == "__main__":
+    saveCacheAtExit()
     parser = cli.tsv()
     args = parser.parse_args()
     kwargs = vars(args)
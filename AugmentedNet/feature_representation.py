@@ -121,28 +121,94 @@ NOTEDURATIONS = [
 ]
 
 
+class EncodingContext(object):
+    """The encodings shared by every representation of a DataFrame.
+
+    Holds a single instance of each representation class, so composite
+    representations reuse the (memoized) encodings of their parts, and
+    a cache for intermediate results, such as the transposed notes.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.representations = {}
+        self.cache = {}
+
+    def representation(self, cls):
+        """The instance of a representation class for this DataFrame."""
+        if cls not in self.representations:
+            self.representations[cls] = cls(self.df, context=self)
+        return self.representations[cls]
+
+
 class FeatureRepresentation(object):
     features = 1
+    # Many-hot values, class indices, and the -1 padding all fit in int8,
+    # the dtype in which the datasets are stored
+    dtype = np.int8
 
-    def __init__(self, df):
+    def __init__(self, df, context=None):
         self.df = df
+        self.context = context or EncodingContext(df)
         self.frames = len(df.index)
-        self.dtype = "i8"
-        self.array = self.run()
+        self._array = None
+        self._transpositions = {}
+
+    @property
+    def array(self):
+        """The (untransposed) encoding, computed on first access."""
+        if self._array is None:
+            self._array = self.run()
+        return self._array
 
     @property
     def shape(self):
         return (self.frames, self.features)
 
-    def run(self, tranposition=None):
+    def run(self, transposition=None):
         array = np.zeros(self.shape, dtype=self.dtype)
         return array
 
+    def encodeTranspositions(self, intervals):
+        """Encodes several transpositions, stacked in one array."""
+        return np.stack([self.run(transposition=i) for i in intervals])
+
+    def runTranspositions(self, intervals):
+        """The encodings of several transpositions, stacked in one array.
+
+        Each transposition is encoded once, and memoized. The memoized
+        encodings are shared, and are not meant to be modified.
+        """
+        missing = [i for i in intervals if i not in self._transpositions]
+        missing = list(dict.fromkeys(missing))
+        if missing:
+            encoded = self.encodeTranspositions(missing)
+            self._transpositions.update(zip(missing, encoded))
+            if missing == list(intervals):
+                return encoded
+        return np.stack([self._transpositions[i] for i in intervals])
+
     def dataAugmentation(self, intervals):
         for interval in intervals:
             yield self.run(transposition=interval)
         return
 
+    @classmethod
+    def decodeBatch(cls, array):
+        """Decodes a (..., features) array into an object array of (...).
+
+        Every distinct frame is decoded once, through decode.
+        """
+        frames = np.ascontiguousarray(array.reshape(-1, cls.features))
+        # Each frame as one opaque value, faster than np.unique(axis=0)
+        rows = frames.view(np.dtype((np.void, frames.strides[0]))).ravel()
+        uniques, inverse = np.unique(rows, return_inverse=True)
+        uniques = uniques.view(frames.dtype).reshape(-1, cls.features)
+        decoded = np.empty(len(uniques), dtype=object)
+        for i, value in enumerate(cls.decode(uniques)):
+            decoded[i] = value
+        return decoded[inverse.reshape(-1)].reshape(array.shape[:-1])
+
     @classmethod
     def encodeManyHot(cls, array, timestep, index, value=1):
         if 0 <= index < cls.features:
@@ -165,7 +231,17 @@ class FeatureRepresentationTI(FeatureRepresentation):
     returning a copy of the array that was already computed.
     """
 
+    def runTranspositions(self, intervals):
+        """The encoding is computed once and broadcast (read-only)."""
+        return np.broadcast_to(self.array, (len(intervals), *self.array.shape))
+
     def dataAugmentation(self, intervals):
         for _ in intervals:
             yield np.copy(self.array)
         return
+
+    @classmethod
+    def transpositionTable(cls):
+        """(feature, interval) -> transposed feature, the identity."""
+        features = np.arange(cls.features)[:, np.newaxis]
+        return np.repeat(features, len(INTERVALCLASSES), axis=1)
@@ -1,19 +1,32 @@
 """Run the network to annotate an unseen musical input (inference)."""
 
+import multiprocessing
 import os
+import queue
+import traceback
 
 import music21
 import numpy as np
 import pandas as pd
 import re
-import tensorflow as tf
-from tensorflow import keras
 
 from . import __version__
-from . import cli
-from .chord_vocabulary import frompcset, cosineSimilarity
-from .cache import forceTonicization, getTonicizationScaleDegree
+from .chord_vocabulary import frompcset, closestPcSets
+from .cache import (
+    forceTonicization,
+    getTonicizationScaleDegree,
+    romanNumeralPitchClasses,
+    saveCacheAtExit,
+)
+from .feature_representation import (
+    COMMON_ROMAN_NUMERALS,
+    EncodingContext,
+    KEYS,
+    PCSETS,
+    SPELLINGS,
+)
 from .score_parser import parseScore
+from .input_representations import SPELLINGPITCHCLASSES
 from .input_representations import available_representations as availableInputs
 from .output_representations import (
     available_representations as availableOutputs,
@@ -36,6 +49,24 @@ inversions = {
 }
 
 
+# The pitch-class vectors of the predicted chords
+PCSETVECTORS = np.zeros((len(PCSETS), 12))
+for _row, _pcset in enumerate(PCSETS):
+    PCSETVECTORS[_row, list(_pcset)] = 1
+
+# The outputs needed to resolve a Roman numeral, in argument order
+ROMANNUMERALOUTPUTS = (
+    "Bass35",
+    "Tenor35",
+    "Alto35",
+    "Soprano35",
+    "PitchClassSet121",
+    "LocalKey38",
+    "RomanNumeral31",
+    "TonicizedKey38",
+)
+
+
 def formatChordLabel(cl):
     """Format the chord label for end-user presentation."""
     # The only change I can think of: Cmaj -> C
@@ -57,26 +88,50 @@ def solveChordSegmentation(df):
 
 
 def resolveRomanNumeralCosine(b, t, a, s, pcs, key, numerator, tonicizedKey):
-    pcsetVector = np.zeros(12)
-    chord = music21.chord.Chord(f"{b}2 {t}3 {a}4 {s}5")
-    for n in chord.pitches:
-        pcsetVector[n.pitchClass] += 1
-    for pc in pcs:
-        pcsetVector[pc] += 1
-    chordNumerator = music21.roman.RomanNumeral(
-        numerator.replace("Cad", "Cad64"), tonicizedKey
-    ).pitchClasses
-    for pc in chordNumerator:
-        pcsetVector[pc] += 1
-    smallestDistance = -2
-    for pcs in frompcset:
-        v2 = np.zeros(12)
-        for p in pcs:
-            v2[p] = 1
-        similarity = cosineSimilarity(pcsetVector, v2)
-        if similarity > smallestDistance:
-            pcset = pcs
-            smallestDistance = similarity
+    """Resolves the Roman numeral of a single chord, given its labels."""
+    [(rn, chordLabel)] = resolveRomanNumeralsCosine(
+        [SPELLINGS.index(b)],
+        [SPELLINGS.index(t)],
+        [SPELLINGS.index(a)],
+        [SPELLINGS.index(s)],
+        [PCSETS.index(pcs)],
+        [KEYS.index(key)],
+        [COMMON_ROMAN_NUMERALS.index(numerator)],
+        [KEYS.index(tonicizedKey)],
+    )
+    return rn, chordLabel
+
+
+def resolveRomanNumeralsCosine(b, t, a, s, pcs, key, numerator, tonicizedKey):
+    """Resolves the Roman numerals of many chords at once.
+
+    Every argument is an array with the predicted class index of each
+    chord, i.e., Bass35, Tenor35, Alto35, Soprano35, PitchClassSet121,
+    LocalKey38, RomanNumeral31, and TonicizedKey38. The closest chord
+    in the vocabulary is found for all of them with one matrix product.
+    """
+    b, t, a, s = (np.asarray(voice, dtype=int) for voice in (b, t, a, s))
+    chords = np.arange(len(b))
+    pcsetVectors = np.zeros((len(b), 12))
+    for voice in (b, t, a, s):
+        np.add.at(pcsetVectors, (chords, SPELLINGPITCHCLASSES[voice]), 1)
+    pcsetVectors += PCSETVECTORS[np.asarray(pcs, dtype=int)]
+    numerators = [COMMON_ROMAN_NUMERALS[n] for n in numerator]
+    tonicizedKeys = [KEYS[k] for k in tonicizedKey]
+    for chord, (n, k) in enumerate(zip(numerators, tonicizedKeys)):
+        chordNumerator = romanNumeralPitchClasses(n.replace("Cad", "Cad64"), k)
+        for pc in chordNumerator:
+            pcsetVectors[chord, pc] += 1
+    pcsets = closestPcSets(pcsetVectors)
+    keys = [KEYS[k] for k in key]
+    basses = [SPELLINGS[x] for x in b]
+    return [
+        _romanNumeralFromPcSet(*args)
+        for args in zip(basses, pcsets, keys, numerators, tonicizedKeys)
+    ]
+
+
+def _romanNumeralFromPcSet(b, pcset, key, numerator, tonicizedKey):
     if tonicizedKey not in frompcset[pcset]:
         # print("Forcing a tonicization")
         candidateKeys = list(frompcset[pcset].keys())
@@ -143,22 +198,56 @@ Analyst: AugmentedNet v{__version__} - https://github.com/napulen/AugmentedNet
     return rntxt
 
 
-def predict(model, inputPath):
-    df = parseScore(inputPath)
+def _modelSignature(model):
+    """The input names, output names, and sequence length of a model."""
     inputs = [l.name.rsplit("_")[1] for l in model.inputs]
-    encodedInputs = [availableInputs[i](df) for i in inputs]
     outputLayers = [l.name.split("/")[0] for l in model.outputs]
-    seqlen = model.inputs[0].shape[1]
+    sequenceLength = model.inputs[0].shape[1]
+    return inputs, outputLayers, sequenceLength
+
+
+def encodeScore(inputPath, inputs, sequenceLength):
+    """Parses a score and encodes it into padded network inputs.
+
+    Returns the score DataFrame, the parsed and chordified music21
+    streams (reused when writing the annotations), and one array of
+    shape (windows, sequenceLength, features) per input representation.
+    """
+    df, s, chordified = parseScore(inputPath, returnStreams=True)
+    context = EncodingContext(df)
+    encodedInputs = [
+        context.representation(availableInputs[i]) for i in inputs
+    ]
     modelInputs = [
-        padToSequenceLength(i.array, seqlen, value=-1) for i in encodedInputs
+        padToSequenceLength(i.array, sequenceLength, value=-1)
+        for i in encodedInputs
     ]
-    predictions = model.predict(modelInputs)
-    predictions = [p.reshape(1, -1, p.shape[2]) for p in predictions]
+    return df, (s, chordified), modelInputs
+
+
+def predictBatch(model, encodedScores, batchSize=64):
+    """Runs the model once over the windows of several encoded scores.
+
+    The windows of every score are packed into shared batches,
+    predicted with a single call to model.predict, and split back
+    per score. For each score, returns a list with the predicted
+    class of every frame (a flat array), one per output layer.
+    """
+    windows = [modelInputs[0].shape[0] for modelInputs in encodedScores]
+    packedInputs = [np.concatenate(x) for x in zip(*encodedScores)]
+    predictions = model.predict(packedInputs, batch_size=batchSize)
+    if not isinstance(predictions, list):
+        predictions = [predictions]
+    boundaries = np.cumsum(windows)[:-1]
+    splits = [np.split(np.argmax(p, axis=2), boundaries) for p in predictions]
+    return [[s.reshape(-1) for s in scorePreds] for scorePreds in zip(*splits)]
+
+
+def writeAnnotations(inputPath, df, streams, predictions, outputLayers):
+    """Decodes the predictions of a score and writes the annotated files."""
     dfdict = {}
     for outputRepr, pred in zip(outputLayers, predictions):
-        print(outputRepr, pred.shape)
-        predOnehot = np.argmax(pred[0], axis=1).reshape(-1, 1)
-        decoded = availableOutputs[outputRepr].decode(predOnehot)
+        decoded = availableOutputs[outputRepr].decodeBatch(pred)
         dfdict[outputRepr] = decoded
     dfout = pd.DataFrame(dfdict)
     scoreLength = len(dfout.index)
@@ -169,18 +258,24 @@ def predict(model, inputPath):
     dfout["offset"] = paddedIndex
     dfout["measure"] = paddedMeasure
     chords = solveChordSegmentation(dfout)
-    s = music21.converter.parse(inputPath, forceSource=True)
+    s, chordified = streams
     ts = {
         (ts.measureNumber, float(ts.beat)): ts.ratioString
         for ts in s.flat.getElementsByClass("TimeSignature")
     }
-    schord = s.chordify().flat.notesAndRests
+    schord = chordified.flat.notesAndRests
     schord.metadata = s.metadata
     # remove all lyrics from score
     # for note in s.recurse().notes:
     #     note.lyrics = []
+    # The Roman numerals of all chords are resolved at once
+    predicted = dict(zip(outputLayers, predictions))
+    chordFrames = chords.index.to_numpy()
+    romanNumerals = resolveRomanNumeralsCosine(
+        *[predicted[o][chordFrames] for o in ROMANNUMERALOUTPUTS]
+    )
     prevkey = ""
-    for analysis in chords.itertuples():
+    for analysis, (rn2, chordLabel) in zip(chords.itertuples(), romanNumerals):
         notes = []
         for n in schord.getElementsByOffset(analysis.offset):
             if isinstance(n, music21.note.Note):
@@ -193,19 +288,6 @@ def predict(model, inputPath):
             continue
         bass = sorted(notes, key=lambda n: n[1])[0][0]
         thiskey = analysis.LocalKey38
-        tonicizedKey = analysis.TonicizedKey38
-        pcset = analysis.PitchClassSet121
-        numerator = analysis.RomanNumeral31
-        rn2, chordLabel = resolveRomanNumeralCosine(
-            analysis.Bass35,
-            analysis.Tenor35,
-            analysis.Alto35,
-            analysis.Soprano35,
-            pcset,
-            thiskey,
-            numerator,
-            tonicizedKey,
-        )
         if thiskey != prevkey:
             rn2fig = f"{thiskey}:{rn2}"
             prevkey = thiskey
@@ -224,14 +306,14 @@ def predict(model, inputPath):
         fd.write(rntxt)
 
 
-def batch(inputPath, dir, modelPath, useGpu):
-    if useGpu:
-        tensorflowGPUHack()
-    else:
-        disableGPU()
-    model = keras.models.load_model(modelPath)
-    if not dir and not os.path.isdir(inputPath):
-        predict(model, inputPath)
+def predict(model, inputPath):
+    inputs, outputLayers, sequenceLength = _modelSignature(model)
+    df, streams, modelInputs = encodeScore(inputPath, inputs, sequenceLength)
+    predictions = predictBatch(model, [modelInputs])[0]
+    writeAnnotations(inputPath, df, streams, predictions, outputLayers)
+
+
+def _scorePaths(inputPath):
     for root, _, files in os.walk(inputPath):
         for f in files:
             name, ext = os.path.splitext(f)
@@ -240,12 +322,171 @@ def batch(inputPath, dir, modelPath, useGpu):
             if "_annotated" in name:
                 # do not recursively annotate an annotated_file
                 continue
-            filepath = os.path.join(root, f)
-            print(filepath)
-            predict(model, inputPath=filepath)
+            yield os.path.join(root, f)
+
+
+def _predictPending(model, pending, outputLayers, batchSize):
+    encodedScores = [modelInputs for _, _, _, modelInputs in pending]
+    predictions = predictBatch(model, encodedScores, batchSize=batchSize)
+    for (filepath, df, streams, _), scorePreds in zip(pending, predictions):
+        writeAnnotations(filepath, df, streams, scorePreds, outputLayers)
+
+
+def _batchSerial(model, scorePaths, batchSize):
+    inputs, outputLayers, sequenceLength = _modelSignature(model)
+    # Scores are accumulated until their windows fill a batch
+    pending = []
+    pendingWindows = 0
+    for filepath in scorePaths:
+        print(filepath)
+        encodedScore = encodeScore(filepath, inputs, sequenceLength)
+        df, streams, modelInputs = encodedScore
+        pending.append((filepath, df, streams, modelInputs))
+        pendingWindows += modelInputs[0].shape[0]
+        if pendingWindows < batchSize:
+            continue
+        _predictPending(model, pending, outputLayers, batchSize)
+        pending = []
+        pendingWindows = 0
+    if pending:
+        _predictPending(model, pending, outputLayers, batchSize)
+
+
+def _scoreWorker(
+    workerId, paths, encoded, predicted, inputs, outputLayers, sequenceLength
+):
+    """Parses and encodes scores, then writes their annotations.
+
+    The predictions come from the model-owning process, which
+    consumes the encoded scores of every worker. A score that fails
+    is sent as a RuntimeError instead, and the worker stops.
+    """
+    while True:
+        filepath = paths.get()
+        if filepath is None:
+            break
+        print(filepath)
+        try:
+            encodedScore = encodeScore(filepath, inputs, sequenceLength)
+            df, streams, modelInputs = encodedScore
+            encoded.put((workerId, modelInputs))
+            predictions = predicted.get()
+            writeAnnotations(filepath, df, streams, predictions, outputLayers)
+        except Exception:
+            error = f"FAILED! {filepath}\n{traceback.format_exc()}"
+            encoded.put((workerId, RuntimeError(error)))
+            return
+    encoded.put((workerId, None))
+
+
+def _nextEncoded(encoded, processes, block):
+    while True:
+        try:
+            return encoded.get(block=block, timeout=5 if block else None)
+        except queue.Empty:
+            if not block:
+                raise
+        crashed = [p.exitcode for p in processes if p.exitcode]
+        if crashed:
+            raise RuntimeError(f"A score worker died (exit code {crashed})")
+
+
+def _servePredictions(model, encoded, predicted, processes, batchSize):
+    """Predicts the scores encoded by the workers, until all of them end."""
+    running = len(processes)
+    pending = []
+    pendingWindows = 0
+    while running:
+        try:
+            # Only wait for more scores if there is nothing to predict
+            workerId, modelInputs = _nextEncoded(
+                encoded, processes, block=not pending
+            )
+        except queue.Empty:
+            workerId, modelInputs = None, None
+        if isinstance(modelInputs, Exception):
+            raise modelInputs
+        if workerId is not None and modelInputs is None:
+            running -= 1
+            continue
+        if modelInputs is not None:
+            pending.append((workerId, modelInputs))
+            pendingWindows += modelInputs[0].shape[0]
+            if pendingWindows < batchSize:
+                continue
+        encodedScores = [m for _, m in pending]
+        predictions = predictBatch(model, encodedScores, batchSize=batchSize)
+        for (workerId, _), scorePredictions in zip(pending, predictions):
+            predicted[workerId].put(scorePredictions)
+        pending = []
+        pendingWindows = 0
+
+
+def _batchPool(model, scorePaths, batchSize, workers):
+    inputs, outputLayers, sequenceLength = _modelSignature(model)
+    # Spawn, never fork, a process that already holds a tensorflow model
+    ctx = multiprocessing.get_context("spawn")
+    paths = ctx.Queue()
+    # A worker waits for its predictions before parsing another score,
+    # thus, the queue never holds more than one score per worker
+    encoded = ctx.Queue(maxsize=workers)
+    predicted = [ctx.Queue() for _ in range(workers)]
+    for filepath in scorePaths:
+        paths.put(filepath)
+    for _ in range(workers):
+        paths.put(None)
+    processes = [
+        ctx.Process(
+            target=_scoreWorker,
+            args=(
+                workerId,
+                paths,
+                encoded,
+                predicted[workerId],
+                inputs,
+                outputLayers,
+                sequenceLength,
+            ),
+        )
+        for workerId in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    try:
+        _servePredictions(model, encoded, predicted, processes, batchSize)
+    except BaseException:
+        # The remaining workers may be waiting for predictions forever
+        for p in processes:
+            p.terminate()
+        raise
+    finally:
+        for p in processes:
+            p.join()
+
+
+def batch(inputPath, dir, modelPath, useGpu, batchSize, workers):
+    if useGpu:
+        tensorflowGPUHack()
+    else:
+        disableGPU()
+    # Imported here, so that the score workers do not start tensorflow
+    from tensorflow import keras
+
+    model = keras.models.load_model(modelPath)
+    if not dir and not os.path.isdir(inputPath):
+        scorePaths = [inputPath]
+    else:
+        scorePaths = _scorePaths(inputPath)
+    if workers > 1:
+        _batchPool(model, scorePaths, batchSize, workers)
+    else:
+        _batchSerial(model, scorePaths, batchSize)
 
 
 if __name__ == "__main__":
+    from . import cli
+
+    saveCacheAtExit()
     parser = cli.inference()
     args = parser.parse_args()
     kwargs = vars(args)
@@ -1,6 +1,7 @@
 """Tonal representations used as inputs to the network."""
 
 import numpy as np
+import pandas as pd
 import re
 
 from .cache import (
@@ -17,6 +18,134 @@ from .feature_representation import (
     FeatureRepresentation,
     FeatureRepresentationTI,
 )
+from .transposition import (
+    INTERVALINDEX,
+    SPELLINGINDEX,
+    TRANSPOSEDLETTERS,
+    TRANSPOSEDPITCHCLASSES,
+    TRANSPOSEDSPELLINGS,
+    transposeSpellings,
+)
+
+SPELLINGPITCHCLASSES = np.array([m21Pitch(p).pitchClass for p in SPELLINGS])
+
+SPELLINGLETTERS = np.array([NOTENAMES.index(p[0]) for p in SPELLINGS])
+
+
+def _internColumn(column):
+    """Flattens a column of lists into integer codes of its unique values.
+
+    Returns the frame of every element, the index of the first element
+    of every frame, the codes of every element, and the unique values.
+    """
+    lengths = np.array([len(values) for values in column], dtype=int)
+    frames = np.repeat(np.arange(len(lengths)), lengths)
+    firsts = np.cumsum(lengths) - lengths
+    if (lengths == 0).any():
+        # A frame without elements has no first element
+        firsts[lengths == 0] = -1
+    flat = [value for values in column for value in values]
+    codes, uniques = pd.factorize(pd.Series(flat, dtype=object))
+    return frames, firsts, codes, list(uniques)
+
+
+def _transposedNotes(notes, transpositions):
+    """The transposed notes of every frame, interned into integer arrays.
+
+    Returns the frame of every note, the index of the bass note of every
+    frame, and the pitch class, letter, and spelling (-1 if it is not in
+    SPELLINGS) of every note, with shape (transpositions, notes).
+    """
+    frames, firsts, codes, uniques = _internColumn(notes)
+    names = [re.sub(r"\d", "", note) for note in uniques]
+    spellings = transposeSpellings(names, transpositions).astype(int)
+    spellings = spellings.reshape(len(uniques), len(transpositions))
+    pitchClasses = SPELLINGPITCHCLASSES[spellings]
+    letters = SPELLINGLETTERS[spellings]
+    for u, t in zip(*np.nonzero(spellings < 0)):
+        # Outside of the tables, music21 knows better
+        transposed = TransposePitch(uniques[u], transpositions[t])
+        pitchObj = m21Pitch(transposed)
+        pitchClasses[u, t] = pitchObj.pitchClass
+        letters[u, t] = NOTENAMES.index(pitchObj.step)
+        spellings[u, t] = SPELLINGINDEX.get(pitchObj.name, -1)
+    return (
+        frames,
+        firsts,
+        pitchClasses[codes].T,
+        letters[codes].T,
+        spellings[codes].T,
+    )
+
+
+def _contextNotes(context, intervals):
+    """The transposed notes of the context, computed once per interval."""
+    cache = context.cache.setdefault("notes", {})
+    missing = [i for i in dict.fromkeys(intervals) if i not in cache]
+    if missing:
+        notes = _transposedNotes(context.df.s_notes, missing)
+        frames, firsts, *features = notes
+        context.cache["noteFrames"] = (frames, firsts)
+        for t, interval in enumerate(missing):
+            cache[interval] = [feature[t] for feature in features]
+    frames, firsts = context.cache["noteFrames"]
+    features = zip(*(cache[interval] for interval in intervals))
+    return (frames, firsts, *(np.stack(feature) for feature in features))
+
+
+def _bass(firsts, features):
+    """The features of the bass note of every frame."""
+    if (firsts < 0).any():
+        raise IndexError("list index out of range")
+    return features[:, firsts]
+
+
+def _manyHot(shape, dtype, frames, features):
+    """Sets the (transposition, frame, feature) entries of a stacked array.
+
+    Features of -1 are not set.
+    """
+    array = np.zeros(shape, dtype=dtype)
+    transpositions, elements = np.nonzero(features >= 0)
+    frames = frames[elements]
+    array[transpositions, frames, features[transpositions, elements]] = 1
+    return array
+
+
+def _patternIndex(resets):
+    """The frames elapsed since the last reset, as used by the patterns."""
+    frames = np.arange(len(resets))
+    resets = np.asarray(resets, dtype=bool).copy()
+    resets[:1] = True
+    lastReset = np.maximum.accumulate(np.where(resets, frames, 0))
+    return frames - lastReset
+
+
+def _concatenateTables(*representations):
+    """The transposition table of concatenated representations."""
+    tables, offset = [], 0
+    for representation in representations:
+        table = representation.transpositionTable()
+        tables.append(np.where(table >= 0, table + offset, -1))
+        offset += representation.features
+    return np.concatenate(tables)
+
+
+class PitchRepresentation(FeatureRepresentation):
+    """A representation encoded for several transpositions at once."""
+
+    transposedFeatures = None
+
+    def run(self, transposition="P1"):
+        return self.runTranspositions([transposition])[0]
+
+    def stackedShape(self, intervals):
+        return (len(intervals), self.frames, self.features)
+
+    @classmethod
+    def transpositionTable(cls):
+        """(feature, interval) -> transposed feature (-1 if none)."""
+        return cls.transposedFeatures
 
 
 class MeasureOnset7(FeatureRepresentationTI):
@@ -26,17 +155,11 @@ class MeasureOnset7(FeatureRepresentationTI):
     pattern[0][0] = 1
 
     def run(self, transposition=None):
-        array = np.zeros(self.shape, dtype=self.dtype)
-        prev_measure = -1
-        idx = 0
-        for frame, measure in enumerate(self.df.s_measure):
-            if measure != prev_measure:
-                idx = 0
-                prev_measure = measure
-            pattern = self.pattern[idx]
-            array[frame] = pattern
-            idx = min(idx + 1, len(self.pattern) - 1)
-        return array
+        measures = self.df.s_measure.to_numpy()
+        resets = measures != np.roll(measures, 1)
+        idx = _patternIndex(resets)
+        idx = np.minimum(idx, len(self.pattern) - 1)
+        return np.array(self.pattern, dtype=self.dtype)[idx]
 
     @classmethod
     def decode(cls, array):
@@ -51,15 +174,10 @@ class MeasureOnset7(FeatureRepresentationTI):
 
 class NoteOnset7(MeasureOnset7):
     def run(self, transposition=None):
-        array = np.zeros(self.shape, dtype=self.dtype)
-        idx = 0
-        for frame, onset in enumerate(self.df.s_isOnset):
-            if sum(onset) > 0:
-                idx = 0
-            pattern = self.pattern[idx]
-            array[frame] = pattern
-            idx = min(idx + 1, len(self.pattern) - 1)
-        return array
+        resets = [sum(onset) > 0 for onset in self.df.s_isOnset]
+        idx = _patternIndex(resets)
+        idx = np.minimum(idx, len(self.pattern) - 1)
+        return np.array(self.pattern, dtype=self.dtype)[idx]
 
     @classmethod
     def decode(cls, array):
@@ -77,8 +195,10 @@ class MeasureNoteOnset14(FeatureRepresentationTI):
     pattern = MeasureOnset7.pattern
 
     def run(self, transposition=None):
-        self.measure7 = MeasureOnset7(self.df).run(transposition)
-        self.note7 = NoteOnset7(self.df).run(transposition)
+        self.measure7 = self.context.representation(MeasureOnset7).run(
+            transposition
+        )
+        self.note7 = self.context.representation(NoteOnset7).run(transposition)
         array = np.concatenate((self.measure7, self.note7), axis=1)
         return array
 
@@ -89,18 +209,17 @@ class MeasureNoteOnset14(FeatureRepresentationTI):
         return [(tuple(mm), tuple(n)) for mm, n in zip(measure7, note7)]
 
 
-class Bass12(FeatureRepresentation):
+class Bass12(PitchRepresentation):
     features = len(PITCHCLASSES)
+    transposedFeatures = TRANSPOSEDPITCHCLASSES
 
-    def run(self, transposition="P1"):
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, notes in enumerate(self.df.s_notes):
-            bass = notes[0]
-            transposed = TransposePitch(bass, transposition)
-            pitchObj = m21Pitch(transposed)
-            pitchClass = pitchObj.pitchClass
-            array[frame, pitchClass] = 1
-        return array
+    def encodeTranspositions(self, intervals):
+        notes = _contextNotes(self.context, intervals)
+        _, firsts, pitchClasses, _, _ = notes
+        shape = self.stackedShape(intervals)
+        frames = np.arange(self.frames)
+        bass = _bass(firsts, pitchClasses)
+        return _manyHot(shape, self.dtype, frames, bass)
 
     @classmethod
     def decode(cls, array):
@@ -113,19 +232,16 @@ class Bass12(FeatureRepresentation):
         return ret
 
 
-class Bass7(FeatureRepresentation):
+class Bass7(PitchRepresentation):
     features = len(NOTENAMES)
+    transposedFeatures = TRANSPOSEDLETTERS
 
-    def run(self, transposition="P1"):
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, notes in enumerate(self.df.s_notes):
-            bass = notes[0]
-            transposed = TransposePitch(bass, transposition)
-            pitchObj = m21Pitch(transposed)
-            pitchLetter = pitchObj.step
-            pitchLetterIndex = NOTENAMES.index(pitchLetter)
-            array[frame, pitchLetterIndex] = 1
-        return array
+    def encodeTranspositions(self, intervals):
+        notes = _contextNotes(self.context, intervals)
+        _, firsts, _, letters, _ = notes
+        shape = self.stackedShape(intervals)
+        frames = np.arange(self.frames)
+        return _manyHot(shape, self.dtype, frames, _bass(firsts, letters))
 
     @classmethod
     def decode(cls, array):
@@ -138,14 +254,19 @@ class Bass7(FeatureRepresentation):
         return ret
 
 
-class Bass19(FeatureRepresentation):
+class Bass19(PitchRepresentation):
     features = Bass12.features + Bass7.features
 
-    def run(self, transposition="P1"):
-        array = np.zeros(self.shape, dtype=self.dtype)
-        self.letter = Bass7(self.df).run(transposition)
-        self.pc = Bass12(self.df).run(transposition)
-        array = np.concatenate((self.letter, self.pc), axis=1)
+    @classmethod
+    def transpositionTable(cls):
+        return _concatenateTables(Bass7, Bass12)
+
+    def encodeTranspositions(self, intervals):
+        letter = self.context.representation(Bass7).runTranspositions(
+            intervals
+        )
+        pc = self.context.representation(Bass12).runTranspositions(intervals)
+        array = np.concatenate((letter, pc), axis=-1)
         return array
 
     @classmethod
@@ -155,18 +276,15 @@ class Bass19(FeatureRepresentation):
         return [(l, pc) for l, pc in zip(letters, pcs)]
 
 
-class Chromagram12(FeatureRepresentation):
+class Chromagram12(PitchRepresentation):
     features = len(PITCHCLASSES)
+    transposedFeatures = TRANSPOSEDPITCHCLASSES
 
-    def run(self, transposition="P1"):
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, notes in enumerate(self.df.s_notes):
-            for note in notes:
-                transposedNote = TransposePitch(note, transposition)
-                pitchObj = m21Pitch(transposedNote)
-                pitchClass = pitchObj.pitchClass
-                array[frame, pitchClass] = 1
-        return array
+    def encodeTranspositions(self, intervals):
+        notes = _contextNotes(self.context, intervals)
+        frames, _, pitchClasses, _, _ = notes
+        shape = self.stackedShape(intervals)
+        return _manyHot(shape, self.dtype, frames, pitchClasses)
 
     @classmethod
     def decode(cls, array):
@@ -179,19 +297,15 @@ class Chromagram12(FeatureRepresentation):
         return ret
 
 
-class Chromagram7(FeatureRepresentation):
+class Chromagram7(PitchRepresentation):
     features = len(NOTENAMES)
+    transposedFeatures = TRANSPOSEDLETTERS
 
-    def run(self, transposition="P1"):
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, notes in enumerate(self.df.s_notes):
-            for note in notes:
-                transposedNote = TransposePitch(note, transposition)
-                pitchObj = m21Pitch(transposedNote)
-                pitchLetter = pitchObj.step
-                pitchLetterIndex = NOTENAMES.index(pitchLetter)
-                array[frame, pitchLetterIndex] = 1
-        return array
+    def encodeTranspositions(self, intervals):
+        notes = _contextNotes(self.context, intervals)
+        frames, _, _, letters, _ = notes
+        shape = self.stackedShape(intervals)
+        return _manyHot(shape, self.dtype, frames, letters)
 
     @classmethod
     def decode(cls, array):
@@ -204,14 +318,21 @@ class Chromagram7(FeatureRepresentation):
         return ret
 
 
-class Chromagram19(FeatureRepresentation):
+class Chromagram19(PitchRepresentation):
     features = Chromagram12.features + Chromagram7.features
 
-    def run(self, transposition="P1"):
-        array = np.zeros(self.shape, dtype=self.dtype)
-        self.letter = Chromagram7(self.df).run(transposition)
-        self.pc = Chromagram12(self.df).run(transposition)
-        array = np.concatenate((self.letter, self.pc), axis=1)
+    @classmethod
+    def transpositionTable(cls):
+        return _concatenateTables(Chromagram7, Chromagram12)
+
+    def encodeTranspositions(self, intervals):
+        letter = self.context.representation(Chromagram7).runTranspositions(
+            intervals
+        )
+        pc = self.context.representation(Chromagram12).runTranspositions(
+            intervals
+        )
+        array = np.concatenate((letter, pc), axis=-1)
         return array
 
     @classmethod
@@ -226,13 +347,13 @@ class Intervals19(FeatureRepresentationTI):
 
     def run(self):
         array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, intervals in enumerate(self.df.s_intervals):
-            for interval in intervals:
-                intervalObj = m21IntervalStr(interval)
-                chromatic = intervalObj.chromatic.mod12
-                genericClass = intervalObj.generic.simpleUndirected - 1
-                array[frame, genericClass] = 1
-                array[frame, chromatic + len(NOTENAMES)] = 1
+        frames, _, codes, uniques = _internColumn(self.df.s_intervals)
+        intervalObjs = [m21IntervalStr(interval) for interval in uniques]
+        generics = [i.generic.simpleUndirected - 1 for i in intervalObjs]
+        chromatics = [i.chromatic.mod12 for i in intervalObjs]
+        array[frames, np.array(generics, dtype=int)[codes]] = 1
+        chromatics = np.array(chromatics, dtype=int) + len(NOTENAMES)
+        array[frames, chromatics[codes]] = 1
         return array
 
     @classmethod
@@ -252,10 +373,12 @@ class Intervals39(FeatureRepresentationTI):
 
     def run(self):
         array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, intervals in enumerate(self.df.s_intervals):
-            for interval in intervals:
-                intervalIndex = INTERVALCLASSES.index(interval)
-                array[frame, intervalIndex] = 1
+        frames, _, codes, uniques = _internColumn(self.df.s_intervals)
+        indices = [INTERVALINDEX.get(interval) for interval in uniques]
+        if None in indices:
+            missing = uniques[indices.index(None)]
+            raise ValueError(f"'{missing}' is not in list")
+        array[frames, np.array(indices, dtype=int)[codes]] = 1
         return array
 
     @classmethod
@@ -269,18 +392,16 @@ class Intervals39(FeatureRepresentationTI):
         return ret
 
 
-class Bass35(FeatureRepresentation):
+class Bass35(PitchRepresentation):
     features = len(SPELLINGS)
+    transposedFeatures = TRANSPOSEDSPELLINGS
 
-    def run(self, transposition="P1"):
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, notes in enumerate(self.df.s_notes):
-            bass = re.sub(r"\d", "", notes[0])
-            transposed = TransposePitch(bass, transposition)
-            if transposed in SPELLINGS:
-                spellingIndex = SPELLINGS.index(transposed)
-                array[frame, spellingIndex] = 1
-        return array
+    def encodeTranspositions(self, intervals):
+        notes = _contextNotes(self.context, intervals)
+        _, firsts, _, _, spellings = notes
+        shape = self.stackedShape(intervals)
+        frames = np.arange(self.frames)
+        return _manyHot(shape, self.dtype, frames, _bass(firsts, spellings))
 
     @classmethod
     def decode(cls, array):
@@ -289,19 +410,15 @@ class Bass35(FeatureRepresentation):
         return [SPELLINGS[np.argmax(onehot)] for onehot in array]
 
 
-class Chromagram35(FeatureRepresentation):
+class Chromagram35(PitchRepresentation):
     features = len(SPELLINGS)
+    transposedFeatures = TRANSPOSEDSPELLINGS
 
-    def run(self, transposition="P1"):
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, notes in enumerate(self.df.s_notes):
-            notes = [re.sub(r"\d", "", n) for n in notes]
-            for note in notes:
-                transposed = TransposePitch(note, transposition)
-                if transposed in SPELLINGS:
-                    spellingIndex = SPELLINGS.index(transposed)
-                    array[frame, spellingIndex] = 1
-        return array
+    def encodeTranspositions(self, intervals):
+        notes = _contextNotes(self.context, intervals)
+        frames, _, _, _, spellings = notes
+        shape = self.stackedShape(intervals)
+        return _manyHot(shape, self.dtype, frames, spellings)
 
     @classmethod
     def decode(cls, array):
@@ -314,13 +431,21 @@ class Chromagram35(FeatureRepresentation):
         return ret
 
 
-class BassChromagram70(FeatureRepresentation):
+class BassChromagram70(PitchRepresentation):
     features = Bass35.features + Chromagram35.features
 
-    def run(self, transposition="P1"):
-        self.bass35 = Bass35(self.df).run(transposition)
-        self.chromagram35 = Chromagram35(self.df).run(transposition)
-        array = np.concatenate((self.bass35, self.chromagram35), axis=1)
+    @classmethod
+    def transpositionTable(cls):
+        return _concatenateTables(Bass35, Chromagram35)
+
+    def encodeTranspositions(self, intervals):
+        bass35 = self.context.representation(Bass35).runTranspositions(
+            intervals
+        )
+        chromagram35 = self.context.representation(
+            Chromagram35
+        ).runTranspositions(intervals)
+        array = np.concatenate((bass35, chromagram35), axis=-1)
         return array
 
     @classmethod
@@ -330,14 +455,21 @@ class BassChromagram70(FeatureRepresentation):
         return [(b, ch) for b, ch in zip(bass35, chromagram35)]
 
 
-class BassChromagram38(FeatureRepresentation):
+class BassChromagram38(PitchRepresentation):
     features = Bass19.features + Chromagram19.features
 
-    def run(self, transposition="P1"):
-        # super().__init__(df)
-        self.bass19 = Bass19(self.df).run(transposition)
-        self.chromagram19 = Chromagram19(self.df).run(transposition)
-        array = np.concatenate((self.bass19, self.chromagram19), axis=1)
+    @classmethod
+    def transpositionTable(cls):
+        return _concatenateTables(Bass19, Chromagram19)
+
+    def encodeTranspositions(self, intervals):
+        bass19 = self.context.representation(Bass19).runTranspositions(
+            intervals
+        )
+        chromagram19 = self.context.representation(
+            Chromagram19
+        ).runTranspositions(intervals)
+        array = np.concatenate((bass19, chromagram19), axis=-1)
         return array
 
     @classmethod
@@ -347,13 +479,21 @@ class BassChromagram38(FeatureRepresentation):
         return [(b[0], b[1], c[0], c[1]) for b, c in zip(bass19, chromagram19)]
 
 
-class BassIntervals58(FeatureRepresentation):
+class BassIntervals58(PitchRepresentation):
     features = Bass19.features + Intervals39.features
 
-    def run(self, transposition="P1"):
-        self.bass19 = Bass19(self.df).run(transposition)
-        self.intervals39 = Intervals39(self.df).run()
-        array = np.concatenate((self.bass19, self.intervals39), axis=1)
+    @classmethod
+    def transpositionTable(cls):
+        return _concatenateTables(Bass19, Intervals39)
+
+    def encodeTranspositions(self, intervals):
+        bass19 = self.context.representation(Bass19).runTranspositions(
+            intervals
+        )
+        intervals39 = self.context.representation(
+            Intervals39
+        ).runTranspositions(intervals)
+        array = np.concatenate((bass19, intervals39), axis=-1)
         return array
 
     @classmethod
@@ -363,13 +503,21 @@ class BassIntervals58(FeatureRepresentation):
         return [(b[0], b[1], i) for b, i in zip(bass19, intervals39)]
 
 
-class BassChromagramIntervals77(FeatureRepresentation):
+class BassChromagramIntervals77(PitchRepresentation):
     features = BassChromagram38.features + Intervals39.features
 
-    def run(self, transposition="P1"):
-        self.bassChroma38 = BassChromagram38(self.df).run(transposition)
-        self.intervals39 = Intervals39(self.df).run()
-        array = np.concatenate((self.bassChroma38, self.intervals39), axis=1)
+    @classmethod
+    def transpositionTable(cls):
+        return _concatenateTables(BassChromagram38, Intervals39)
+
+    def encodeTranspositions(self, intervals):
+        bassChroma38 = self.context.representation(
+            BassChromagram38
+        ).runTranspositions(intervals)
+        intervals39 = self.context.representation(
+            Intervals39
+        ).runTranspositions(intervals)
+        array = np.concatenate((bassChroma38, intervals39), axis=-1)
         return array
 
     @classmethod
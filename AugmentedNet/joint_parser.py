@@ -1,11 +1,13 @@
 """Turns a (score, annotation) pair into a joint pandas DataFrame."""
 
+import os
 import re
 
 import numpy as np
 import pandas as pd
 
 from . import annotation_parser
+from . import columnar
 from . import score_parser
 from .common import FIXEDOFFSET
 
@@ -40,6 +42,32 @@ def from_tsv(tsv, sep="\t"):
     return df
 
 
+def from_columnar(path):
+    """Loads a joint DataFrame saved with `to_columnar`."""
+    return columnar.load(path)
+
+
+def to_columnar(df, path):
+    """Saves a joint DataFrame in the binary columnar format."""
+    columnar.save(df, path)
+
+
+def columnarPath(tsv):
+    """The location of the columnar copy of a joint tsv file."""
+    return os.path.splitext(tsv)[0] + ".npz"
+
+
+def from_dataset(tsv):
+    """Loads a joint tsv file, preferring its up-to-date columnar copy."""
+    path = columnarPath(tsv)
+    if os.path.isfile(path) and (
+        not os.path.isfile(tsv)
+        or os.path.getmtime(path) >= os.path.getmtime(tsv)
+    ):
+        return from_columnar(path)
+    return from_tsv(tsv)
+
+
 def _qualityMetric(df):
     df["qualityScoreNotes"] = np.nan
     df["qualityNonChordTones"] = np.nan
@@ -104,7 +132,12 @@ def _inversionMetric(df):
 
 
 def parseAnnotationAndScore(
-    a, s, qualityAssessment=True, fixedOffset=FIXEDOFFSET
+    a,
+    s,
+    qualityAssessment=True,
+    fixedOffset=FIXEDOFFSET,
+    fastScoreParser=False,
+    fastAnnotationParser=False,
 ):
     """Process a RomanText and score files simultaneously.
 
@@ -114,8 +147,12 @@ def parseAnnotationAndScore(
     Create the dataframes of both. Generate a new, joint, one.
     """
     # Parse each file
-    adf = annotation_parser.parseAnnotation(a, fixedOffset=fixedOffset)
-    sdf = score_parser.parseScore(s, fixedOffset=fixedOffset)
+    adf = annotation_parser.parseAnnotation(
+        a, fixedOffset=fixedOffset, fastParser=fastAnnotationParser
+    )
+    sdf = score_parser.parseScore(
+        s, fixedOffset=fixedOffset, fastParser=fastScoreParser
+    )
     # Create the joint dataframe
     jointdf = pd.concat([sdf, adf], axis=1)
     jointdf.index.name = "j_offset"
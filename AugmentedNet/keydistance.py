@@ -53,20 +53,28 @@ WEBERDIAGONAL = [
 TRANSPOSITION = np.array((2, 3))
 
 
+def _weberDistances():
+    """Computes the Weber distance between every pair of keys at once."""
+    indices = np.arange(len(WEBERDIAGONAL))
+    # Only the number of steps between both keys on the diagonal matters
+    steps = np.abs(indices[:, np.newaxis] - indices[np.newaxis, :])
+    trans = np.arange(len(WEBERDIAGONAL) // 2)[:, np.newaxis] * TRANSPOSITION
+    # (key1, key2, transposition, coordinate)
+    coords = steps[:, :, np.newaxis, np.newaxis] - trans
+    distances = np.sqrt(np.sum(coords.astype(float) ** 2, axis=-1))
+    return distances.min(axis=-1)
+
+
+# The index of each key in WEBERDIAGONAL
+WEBERINDEX = {key: i for i, key in enumerate(WEBERDIAGONAL)}
+
+# The Weber distance between all pairs of keys, indexed by WEBERINDEX
+WEBERDISTANCES = _weberDistances()
+
+
 def weberEuclidean(k1, k2):
     """A measurement of key distance based on the Weber tonal chart."""
-    i1, i2 = WEBERDIAGONAL.index(k1), WEBERDIAGONAL.index(k2)
-    flatterkey, sharperkey = sorted((i1, i2))
-    coord1 = np.array((flatterkey, flatterkey))
-    coord2 = np.array((sharperkey, sharperkey))
-    smallerdistance = 1337
-    for i in range(len(WEBERDIAGONAL) // 2):
-        trans = TRANSPOSITION * i
-        newcoord1 = trans + coord1
-        distance = np.linalg.norm(coord2 - newcoord1)
-        if distance < smallerdistance:
-            smallerdistance = distance
-    return smallerdistance
+    return WEBERDISTANCES[WEBERINDEX[k1], WEBERINDEX[k2]]
 
 
 def getTonicizationScaleDegree(localKey, tonicizedKey):
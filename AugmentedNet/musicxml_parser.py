@@ -0,0 +1,529 @@
+"""A streaming MusicXML reader that computes the salami slices of a score.
+
+It reproduces, without building any music21 stream, what score_parser
+gets from `s.chordify().flat.notesAndRests`: the offset, duration, and
+measure number of every slice, with its notes, intervals, and onsets.
+The score is read measure by measure with an incremental XML parser,
+so even long scores are never held in memory as an element tree.
+
+Scores using features that the reader does not model (e.g., a
+transposing first part, or chord symbols) raise UnsupportedScore, and are
+meant to be parsed with music21 instead.
+"""
+
+import zipfile
+from fractions import Fraction
+from xml.etree.ElementTree import iterparse
+
+from .cache import m21Interval
+
+MUSICXMLEXTENSIONS = (".mxl", ".musicxml", ".xml")
+
+# The quarterLength of each MusicXML note type
+TYPEDURATIONS = {
+    "maxima": Fraction(32),
+    "long": Fraction(16),
+    "breve": Fraction(8),
+    "whole": Fraction(4),
+    "half": Fraction(2),
+    "quarter": Fraction(1),
+    "eighth": Fraction(1, 2),
+    "16th": Fraction(1, 4),
+    "32nd": Fraction(1, 8),
+    "32th": Fraction(1, 8),
+    "64th": Fraction(1, 16),
+    "128th": Fraction(1, 32),
+    "256th": Fraction(1, 64),
+    "512th": Fraction(1, 128),
+    "1024th": Fraction(1, 256),
+    "2048th": Fraction(1, 512),
+}
+
+STEPSEMITONES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+# The alteration of the <accidental>s that music21 spells as the pitch name
+ACCIDENTALALTERS = {
+    "natural": 0,
+    "sharp": 1,
+    "flat": -1,
+    "double-sharp": 2,
+    "sharp-sharp": 2,
+    "flat-flat": -2,
+    "double-flat": -2,
+}
+
+UNSUPPORTED = ("harmony", "unpitched")
+
+# The <direction-type>s that music21 inserts in the measure (not spanners)
+INSERTEDDIRECTIONS = (
+    "dynamics",
+    "segno",
+    "coda",
+    "metronome",
+    "rehearsal",
+    "words",
+)
+
+
+class UnsupportedScore(ValueError):
+    """The score uses a feature that the streaming reader does not model."""
+
+
+def isMusicXML(path):
+    """Whether a path looks like a (compressed) MusicXML file."""
+    return isinstance(path, str) and path.lower().endswith(MUSICXMLEXTENSIONS)
+
+
+def _openScore(path):
+    """A binary file object with the MusicXML of a .mxl or plain file."""
+    if not path.lower().endswith(".mxl"):
+        return open(path, "rb")
+    with zipfile.ZipFile(path) as mxl:
+        names = mxl.namelist()
+        rootfile = None
+        if "META-INF/container.xml" in names:
+            with mxl.open("META-INF/container.xml") as container:
+                for _, elem in iterparse(container):
+                    if _tag(elem) == "rootfile":
+                        rootfile = elem.get("full-path")
+                        break
+        if rootfile is None:
+            rootfile = next(
+                n
+                for n in names
+                if not n.startswith("META-INF")
+                and n.lower().endswith((".xml", ".musicxml"))
+            )
+        return mxl.open(rootfile)
+
+
+def _tag(elem):
+    """The tag of an element, without any namespace."""
+    return elem.tag.rsplit("}", 1)[-1]
+
+
+def _text(elem, path, default=None):
+    child = elem.find(path)
+    if child is None or child.text is None:
+        return default
+    return child.text.strip()
+
+
+def _measureNumber(raw, lastNumber):
+    """The measure number music21 reads from the number attribute."""
+    raw = raw or ""
+    digits = "".join(c for c in raw if c.isdigit())
+    suffix = "".join(c for c in raw if not c.isdigit())
+    number = int(digits) if digits else 0
+    # Finale calls unnumbered measures X1, X2, etc.
+    if lastNumber is not None and suffix == "X" and number != lastNumber + 1:
+        number = lastNumber
+    return number
+
+
+def _pitch(mxNote):
+    """The nameWithOctave and (diatonicNoteNum, ps) height of a <note>.
+
+    Like music21, a displayed <accidental> spells the name of the pitch,
+    and the <alter> (if any) decides its pitch space value.
+    """
+    mxPitch = mxNote.find("pitch")
+    step = _text(mxPitch, "step")
+    octave = int(_text(mxPitch, "octave"))
+    alter = float(_text(mxPitch, "alter", "0"))
+    if not alter.is_integer():
+        raise UnsupportedScore("Microtonal pitches are not supported.")
+    alter = int(alter)
+    nameAlter = alter
+    accidental = _text(mxNote, "accidental")
+    if accidental:
+        if accidental.lower() not in ACCIDENTALALTERS:
+            raise UnsupportedScore(f"Unsupported accidental {accidental}.")
+        nameAlter = ACCIDENTALALTERS[accidental.lower()]
+        if mxPitch.find("alter") is None:
+            alter = nameAlter
+    accidental = "#" * nameAlter if nameAlter > 0 else "-" * -nameAlter
+    ps = (octave + 1) * 12 + STEPSEMITONES[step] + alter
+    diatonicNoteNum = octave * 7 + "CDEFGAB".index(step) + 1
+    return f"{step}{accidental}{octave}", (diatonicNoteNum, ps)
+
+
+def _tie(mxNote):
+    """The music21 tie type of a <note>, or None."""
+    types = [t.get("type") for t in mxNote.findall("tie")]
+    types = [t for t in types if t is not None]
+    if not types:
+        return None
+    if len(types) == 1:
+        return types[0]
+    if "start" in types and "stop" in types:
+        return "continue"
+    return "start"
+
+
+def _duration(mxNote, divisions):
+    """The quarterLength of a <note>, as music21 computes it."""
+    if mxNote.find("grace") is not None:
+        return Fraction(0)
+    noteType = _text(mxNote, "type")
+    if not noteType:
+        raw = _text(mxNote, "duration")
+        if raw is None:
+            raise UnsupportedScore("A note without a duration or type.")
+        quarterLength = Fraction(raw) / divisions
+        # music21 rounds the raw durations it cannot split into components
+        shortest = min(TYPEDURATIONS.values())
+        if (quarterLength / shortest).denominator != 1:
+            raise UnsupportedScore("An untyped note of an irregular duration.")
+        return quarterLength
+    if noteType not in TYPEDURATIONS:
+        raise UnsupportedScore(f"Unknown note type {noteType}.")
+    quarterLength = TYPEDURATIONS[noteType]
+    dots = len(mxNote.findall("dot"))
+    quarterLength *= 2 - Fraction(1, 2**dots)
+    modification = mxNote.find("time-modification")
+    if modification is not None:
+        normalType = _text(modification, "normal-type", noteType)
+        normalDots = len(modification.findall("normal-dot"))
+        if normalType != noteType or normalDots:
+            raise UnsupportedScore("Unsupported tuplet notation.")
+        actual = int(_text(modification, "actual-notes"))
+        normal = int(_text(modification, "normal-notes"))
+        quarterLength *= Fraction(normal, actual)
+    return quarterLength
+
+
+class _Event(object):
+    """A note, chord, or rest of a measure, relative to the measure."""
+
+    __slots__ = ("offset", "duration", "notes", "restType")
+
+    def __init__(self, offset, duration, notes=None, restType=None):
+        self.offset = offset
+        self.duration = duration
+        # (nameWithOctave, height, tie) of every note of a chord, or None
+        self.notes = notes
+        # The type of an undotted, non-tuplet rest
+        self.restType = restType
+
+    @property
+    def end(self):
+        return self.offset + self.duration
+
+
+class _Measure(object):
+    __slots__ = ("number", "events", "padded", "barDuration")
+
+    def __init__(self, number, events, padded, barDuration):
+        self.number = number
+        self.events = events
+        self.padded = padded
+        self.barDuration = barDuration
+
+
+class _PartReader(object):
+    """Reads the measures of a <part>, one at a time.
+
+    Keeps the state carried from one measure to the next, and computes
+    the offset (and anacrusis padding) of every measure like music21.
+    """
+
+    def __init__(self):
+        self.divisions = Fraction(1)
+        self.barDuration = None
+        self.lastNumber = None
+        self.measureOffset = Fraction(0)
+        self.lastMeasureWasShort = False
+        self.isPercussion = False
+        self.isTransposing = False
+        # (offset, _Measure) of every measure
+        self.measures = []
+
+    def read(self, mxMeasure):
+        number = _measureNumber(mxMeasure.get("number"), self.lastNumber)
+        self.lastNumber = number
+        events = []
+        offset = Fraction(0)
+        # The latest offset of the directions inserted in the measure
+        directionsTime = Fraction(0)
+        voices = set()
+        fullMeasureRest = False
+        for mxObj in mxMeasure:
+            tag = _tag(mxObj)
+            if tag in UNSUPPORTED:
+                raise UnsupportedScore(f"<{tag}> is not supported.")
+            if tag == "attributes":
+                self._attributes(mxObj)
+            elif tag == "backup":
+                offset -= Fraction(_text(mxObj, "duration")) / self.divisions
+            elif tag == "forward":
+                offset += Fraction(_text(mxObj, "duration")) / self.divisions
+            elif tag == "direction":
+                directionsTime = max(
+                    directionsTime, self._direction(mxObj, offset)
+                )
+            elif tag == "note":
+                event = self._note(mxObj, offset, events)
+                if mxObj.find("chord") is None:
+                    events.append(event)
+                    offset += event.duration
+                voices.add(_text(mxObj, "voice"))
+                mxRest = mxObj.find("rest")
+                if mxRest is not None and mxRest.get("measure") == "yes":
+                    fullMeasureRest = True
+        # Like music21, count the rests and the notes outside of chords
+        rests = sum(1 for e in events if e.notes is None)
+        notes = sum(1 for e in events if e.notes and len(e.notes) == 1)
+        if self.barDuration is None:
+            self.barDuration = Fraction(4)
+        if fullMeasureRest or (rests == 1 and notes == 0):
+            self._fillMeasureRest(events)
+        highestTime = max([directionsTime] + [e.end for e in events])
+        padded = False
+        if highestTime >= self.barDuration:
+            shift = highestTime
+        elif highestTime == 0 and not events:
+            events.append(_Event(Fraction(0), self.barDuration))
+            shift = self.barDuration
+        else:
+            shift = highestTime
+            if self.measureOffset == 0:
+                padded = True
+            elif self.lastMeasureWasShort:
+                padded = True
+                self.lastMeasureWasShort = False
+            else:
+                self.lastMeasureWasShort = True
+        if len(voices - {None}) > 1:
+            # music21 fills each voice with hidden rests up to the end
+            events.append(_Event(highestTime, Fraction(0)))
+        measure = _Measure(number, events, padded, self.barDuration)
+        self.measures.append((self.measureOffset, measure))
+        self.measureOffset += shift
+
+    def _direction(self, mxDirection, offset):
+        """The offset of the elements that a <direction> inserts."""
+        inserted = any(
+            _tag(child) in INSERTEDDIRECTIONS
+            for mxType in mxDirection
+            if _tag(mxType) == "direction-type"
+            for child in mxType
+        )
+        if not inserted:
+            return offset
+        shift = Fraction(_text(mxDirection, "offset", "0")) / self.divisions
+        return offset + shift
+
+    def _note(self, mxNote, offset, events):
+        """The event of a <note>, or the chord it is added to."""
+        for child in mxNote:
+            if _tag(child) in UNSUPPORTED:
+                raise UnsupportedScore(f"<{_tag(child)}> is not supported.")
+        if mxNote.find("chord") is not None:
+            if not events or events[-1].notes is None:
+                raise UnsupportedScore("A chord without a first note.")
+            event = events[-1]
+        else:
+            duration = _duration(mxNote, self.divisions)
+            event = _Event(offset, duration, notes=[])
+        if mxNote.find("rest") is not None:
+            if event.notes:
+                raise UnsupportedScore("A rest within a chord.")
+            event.notes = None
+            event.restType = _restType(mxNote, event.duration)
+            return event
+        name, height = _pitch(mxNote)
+        event.notes.append((name, height, _tie(mxNote)))
+        return event
+
+    def _fillMeasureRest(self, events):
+        """Stretches a whole (or breve) measure rest to the whole measure."""
+        rests = [e for e in events if e.notes is None]
+        if not rests:
+            return
+        rest = min(rests, key=lambda e: e.offset)
+        if rest.duration != self.barDuration and rest.restType in (
+            "whole",
+            "breve",
+        ):
+            rest.duration = self.barDuration
+
+    def _attributes(self, mxAttributes):
+        divisions = _text(mxAttributes, "divisions")
+        if divisions is not None:
+            self.divisions = Fraction(divisions)
+        if mxAttributes.find("transpose") is not None:
+            self.isTransposing = True
+        for mxTime in mxAttributes.findall("time"):
+            if mxTime.find("senza-misura") is not None:
+                raise UnsupportedScore("Unmeasured time signatures.")
+            beats = _text(mxTime, "beats")
+            beatType = _text(mxTime, "beat-type")
+            if beats is None or beatType is None:
+                raise UnsupportedScore("Unsupported time signature.")
+            numerator = sum(Fraction(b) for b in beats.split("+"))
+            self.barDuration = numerator * 4 / Fraction(beatType)
+        for mxClef in mxAttributes.findall("clef"):
+            if _text(mxClef, "sign") == "percussion":
+                self.isPercussion = True
+
+
+def _restType(mxNote, duration):
+    """The type of an undotted, non-tuplet rest (None otherwise)."""
+    if mxNote.find("dot") is not None:
+        return None
+    if mxNote.find("time-modification") is not None:
+        return None
+    noteType = _text(mxNote, "type")
+    if noteType:
+        return noteType
+    # music21 infers the type of the rests without one
+    return {Fraction(4): "whole", Fraction(8): "breve"}.get(duration)
+
+
+def _readParts(f):
+    """The measures of every part, streaming through the MusicXML file."""
+    parts = []
+    reader = None
+    with f:
+        context = iterparse(f, events=("start", "end"))
+        for event, elem in context:
+            tag = _tag(elem)
+            if event == "start":
+                if tag == "score-timewise":
+                    raise UnsupportedScore("Timewise scores.")
+                if tag == "part" and reader is None:
+                    reader = _PartReader()
+                continue
+            if tag == "measure" and reader is not None:
+                reader.read(elem)
+                elem.clear()
+            elif tag == "part" and reader is not None:
+                parts.append(reader)
+                reader = None
+                elem.clear()
+    parts = [p for p in parts if not p.isPercussion]
+    if parts and parts[0].isTransposing:
+        # music21 only chordifies at sounding pitch if the first part
+        # is not at sounding pitch
+        raise UnsupportedScore("Transposing instruments.")
+    return parts
+
+
+def _sliceTie(original, sliceOffset, sliceEnd, event):
+    """The tie of a note within a slice, as music21 chordify assigns it."""
+    if sliceOffset == event.offset and event.end <= sliceEnd:
+        added = None
+    elif sliceOffset > event.offset:
+        added = "continue" if event.end > sliceEnd else "stop"
+    else:
+        added = "start"
+    if original is not None and {original, added} == {"start", "stop"}:
+        return "continue"
+    if original == "continue":
+        return original
+    if added is None:
+        return original
+    return added
+
+
+def _mergeTies(old, new):
+    """The tie of a pitch sounding in several notes of a slice."""
+    if old == "continue" or new is None:
+        return old
+    if old is None or new == "continue":
+        return new
+    if {old, new} == {"start", "stop"}:
+        return "continue"
+    return old
+
+
+def _chordifyMeasure(events):
+    """The (offset, duration, notes) slices of the events of a measure.
+
+    The notes are (nameWithOctave, isOnset) pairs, None for rests.
+    """
+    timePoints = sorted(
+        {e.offset for e in events} | {e.end for e in events} | {Fraction(0)}
+    )
+    slices = []
+    for offset, end in zip(timePoints, timePoints[1:]):
+        sounding = {}
+        # Like music21 verticalities, the starting events come first
+        starting = [e for e in events if e.offset == offset]
+        overlapping = [e for e in events if e.offset < offset < e.end]
+        for event in starting + overlapping:
+            if event.notes is None:
+                continue
+            for name, height, tie in event.notes:
+                tie = _sliceTie(tie, offset, end, event)
+                if name in sounding:
+                    tie = _mergeTies(sounding[name][1], tie)
+                    sounding[name] = (sounding[name][0], tie)
+                else:
+                    sounding[name] = (height, tie)
+        if not sounding:
+            if slices and slices[-1][2] is None:
+                # Consecutive rests are consolidated
+                lastOffset, _, _ = slices[-1]
+                slices[-1] = (lastOffset, end - lastOffset, None)
+            else:
+                slices.append((offset, end - offset, None))
+            continue
+        # music21 chords sort diatonically, so A#4 comes before B-4
+        notes = sorted(sounding.items(), key=lambda item: item[1][0])
+        notes = [(name, tie in (None, "start")) for name, (_, tie) in notes]
+        slices.append((offset, end - offset, notes))
+    return slices
+
+
+def salamiSlices(path):
+    """The salami slices of a MusicXML score, and where the score ends.
+
+    Returns a dictionary with the s_offset, s_duration, s_measure,
+    s_notes, s_intervals, and s_isOnset lists of every slice, and the
+    offset where the last measure ends.
+    """
+    parts = _readParts(_openScore(path))
+    if not parts:
+        raise UnsupportedScore("A score without pitched parts.")
+    template = parts[0].measures
+    numberShift = 0
+    firstMeasures = [m for _, m in template if m.number in (0, 1)]
+    if firstMeasures:
+        first = next(
+            (m for m in firstMeasures if m.number == 0), firstMeasures[0]
+        )
+        if first.padded and first.number == 1:
+            numberShift = -1
+    dfdict = {
+        "s_offset": [],
+        "s_duration": [],
+        "s_measure": [],
+        "s_notes": [],
+        "s_intervals": [],
+        "s_isOnset": [],
+    }
+    for i, (measureOffset, measure) in enumerate(template):
+        events = []
+        for part in parts:
+            if i < len(part.measures):
+                events.extend(part.measures[i][1].events)
+        for offset, duration, notes in _chordifyMeasure(events):
+            dfdict["s_offset"].append(measureOffset + offset)
+            dfdict["s_duration"].append(duration)
+            dfdict["s_measure"].append(measure.number + numberShift)
+            if notes is None:
+                dfdict["s_notes"].append(None)
+                dfdict["s_intervals"].append(None)
+                dfdict["s_isOnset"].append(None)
+                continue
+            names = [name for name, _ in notes]
+            intervals = [
+                m21Interval(names[0], n).simpleName for n in names[1:]
+            ]
+            dfdict["s_notes"].append(names)
+            dfdict["s_intervals"].append(intervals)
+            dfdict["s_isOnset"].append([onset for _, onset in notes])
+    lastOffset, lastMeasure = template[-1]
+    return dfdict, lastOffset + lastMeasure.barDuration
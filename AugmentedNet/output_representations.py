@@ -1,6 +1,7 @@
 """The output tonal representations learned through multitask learning."""
 
 import numpy as np
+import pandas as pd
 
 from .cache import (
     TransposeKey,
@@ -13,11 +14,59 @@ from .feature_representation import (
     CHORD_QUALITIES,
     COMMON_ROMAN_NUMERALS,
     DEGREES,
+    INTERVALCLASSES,
     NOTEDURATIONS,
     KEYS,
     PCSETS,
     SPELLINGS,
 )
+from .transposition import (
+    TONALITYINDEX,
+    TRANSPOSEDKEYS,
+    TRANSPOSEDPCSETS,
+    TRANSPOSEDSPELLINGS,
+    transposeClasses,
+)
+
+# (key, interval) -> index of the transposed key, with the rows of KEYS
+KEYTRANSPOSITIONS = TRANSPOSEDKEYS[[TONALITYINDEX[k] for k in KEYS]]
+
+
+def _classIndex(cls):
+    """The index of every class in the classList, built once per class."""
+    if "_classes" not in cls.__dict__:
+        index = {}
+        for i, label in enumerate(cls.classList):
+            index.setdefault(label, i)
+        cls._classes = index
+    return cls._classes
+
+
+def _classArray(cls):
+    """The classList as an object array, built once per class."""
+    if "_classArray" not in cls.__dict__:
+        classes = np.empty(len(cls.classList), dtype=object)
+        for i, label in enumerate(cls.classList):
+            classes[i] = label
+        cls._classArray = classes
+    return cls._classArray
+
+
+def _encodeColumn(column, encodeUniques):
+    """Encodes a column, computing the classes of its unique values only.
+
+    encodeUniques maps the list of unique values to their (uniques,
+    transpositions) class indices, -1 if outside of the classList. Returns
+    a (transpositions, frames, 1) array.
+    """
+    codes, uniques = pd.factorize(column, sort=False)
+    uniques = list(uniques)
+    if (codes < 0).any():
+        raise ValueError(f"Missing values in {column.name}.")
+    classes = encodeUniques(uniques)
+    for u in np.nonzero((classes < 0).any(axis=1))[0]:
+        raise ValueError(f"{uniques[u]!r} in {column.name} has no class.")
+    return classes[codes].T[..., np.newaxis]
 
 
 class OutputRepresentation(FeatureRepresentation):
@@ -29,28 +78,50 @@ class OutputRepresentation(FeatureRepresentation):
     classList = []
     dfFeature = ""
     transpositionFn = None
+    transposedClasses = None
 
     def run(self, transposition="P1"):
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, dfFeature in enumerate(self.df[self.dfFeature]):
-            transposed = self.transpositionFn(dfFeature, transposition)
-            rnIndex = self.classList.index(transposed)
-            array[frame] = rnIndex
-        return array
+        return self.encodeTranspositions([transposition])[0]
+
+    def encodeTranspositions(self, intervals):
+        index = _classIndex(type(self))
+
+        def transpose(uniques):
+            return transposeClasses(
+                uniques,
+                intervals,
+                self.transposedClasses,
+                index,
+                index,
+                self.transpositionFn,
+            )
+
+        array = _encodeColumn(self.df[self.dfFeature], transpose)
+        return array.astype(self.dtype)
 
     @classmethod
     def classesNumber(cls):
         return len(cls.classList)
 
+    @classmethod
+    def transpositionTable(cls):
+        """(class, interval) -> transposed class (-1 if outside classList)."""
+        return cls.transposedClasses
+
     @classmethod
     def decode(cls, array):
-        return [cls.classList[index] for index in array.reshape(-1)]
+        return cls.decodeBatch(array).reshape(-1).tolist()
+
+    @classmethod
+    def decodeBatch(cls, array):
+        """The classes of an array of class indices, of any shape."""
+        return np.take(_classArray(cls), array)
 
     @classmethod
     def decodeOneHot(cls, array):
         if len(array.shape) != 2 or array.shape[1] != len(cls.classList):
             raise IndexError("Strange array shape.")
-        return [cls.classList[np.argmax(onehot)] for onehot in array]
+        return cls.decode(np.argmax(array, axis=1))
 
 
 class OutputRepresentationTI(FeatureRepresentationTI):
@@ -63,49 +134,67 @@ class OutputRepresentationTI(FeatureRepresentationTI):
     dfFeature = ""
 
     def run(self, transposition="P1"):
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, dfFeature in enumerate(self.df[self.dfFeature]):
-            rnIndex = self.classList.index(dfFeature)
-            array[frame] = rnIndex
-        return array
+        index = _classIndex(type(self))
+
+        def classes(uniques):
+            indices = [index.get(label, -1) for label in uniques]
+            return np.array(indices, dtype=int)[:, np.newaxis]
+
+        array = _encodeColumn(self.df[self.dfFeature], classes)
+        return array[0].astype(self.dtype)
 
     @classmethod
     def classesNumber(cls):
         return len(cls.classList)
 
+    @classmethod
+    def transpositionTable(cls):
+        """(class, interval) -> transposed class, the identity."""
+        classes = np.arange(cls.classesNumber())[:, np.newaxis]
+        return np.repeat(classes, len(INTERVALCLASSES), axis=1)
+
     @classmethod
     def decode(cls, array):
-        return [cls.classList[index] for index in array.reshape(-1)]
+        return cls.decodeBatch(array).reshape(-1).tolist()
+
+    @classmethod
+    def decodeBatch(cls, array):
+        """The classes of an array of class indices, of any shape."""
+        return np.take(_classArray(cls), array)
 
     @classmethod
     def decodeOneHot(cls, array):
         if len(array.shape) != 2 or array.shape[1] != len(cls.classList):
             raise IndexError("Strange array shape.")
-        return [cls.classList[np.argmax(onehot)] for onehot in array]
+        return cls.decode(np.argmax(array, axis=1))
 
 
 class Bass35(OutputRepresentation):
     classList = SPELLINGS
     dfFeature = "a_bass"
     transpositionFn = staticmethod(TransposePitch)
+    transposedClasses = TRANSPOSEDSPELLINGS
 
 
 class Tenor35(OutputRepresentation):
     classList = SPELLINGS
     dfFeature = "a_tenor"
     transpositionFn = staticmethod(TransposePitch)
+    transposedClasses = TRANSPOSEDSPELLINGS
 
 
 class Alto35(OutputRepresentation):
     classList = SPELLINGS
     dfFeature = "a_alto"
     transpositionFn = staticmethod(TransposePitch)
+    transposedClasses = TRANSPOSEDSPELLINGS
 
 
 class Soprano35(OutputRepresentation):
     classList = SPELLINGS
     dfFeature = "a_soprano"
     transpositionFn = staticmethod(TransposePitch)
+    transposedClasses = TRANSPOSEDSPELLINGS
 
 
 class Inversion4(OutputRepresentationTI):
@@ -146,18 +235,21 @@ class LocalKey38(OutputRepresentation):
     classList = KEYS
     dfFeature = "a_localKey"
     transpositionFn = staticmethod(TransposeKey)
+    transposedClasses = KEYTRANSPOSITIONS
 
 
 class TonicizedKey38(OutputRepresentation):
     classList = KEYS
     dfFeature = "a_tonicizedKey"
     transpositionFn = staticmethod(TransposeKey)
+    transposedClasses = KEYTRANSPOSITIONS
 
 
 class ChordRoot35(OutputRepresentation):
     classList = SPELLINGS
     dfFeature = "a_root"
     transpositionFn = staticmethod(TransposePitch)
+    transposedClasses = TRANSPOSEDSPELLINGS
 
 
 class ChordQuality11(OutputRepresentationTI):
@@ -169,6 +261,7 @@ class PitchClassSet121(OutputRepresentation):
     classList = PCSETS
     dfFeature = "a_pcset"
     transpositionFn = staticmethod(TransposePcSet)
+    transposedClasses = TRANSPOSEDPCSETS
 
 
 available_representations = {
@@ -0,0 +1,62 @@
+"""Resampling of event-based DataFrames onto a grid of fixed offsets.
+
+Every point of the grid takes the values of the last event that starts
+at or before it. Instead of reindexing (and filling) the columns over the
+union of both indices, each grid point is mapped to its event with
+np.searchsorted, and the columns are gathered by integer position.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def fixedGrid(df, durations, fixedOffset):
+    """The offsets from the first event to the end of the last one."""
+    offsets = df.index.to_numpy()
+    end = offsets[-1] + durations.to_numpy()[-1]
+    return np.arange(offsets[0], end, fixedOffset)
+
+
+def sourceEvents(offsets, grid):
+    """The event of each grid point, and whether the point is its onset."""
+    events = np.searchsorted(offsets, grid, side="right") - 1
+    return events, offsets[events] == grid
+
+
+def filledPositions(missing, backward=False):
+    """The position of the value that fills each position of a column.
+
+    Missing values are filled forward, like fillna(method="ffill"), and
+    then backward if backward=True. Positions without a value are -1.
+    """
+    positions = np.arange(len(missing))
+    filled = np.maximum.accumulate(np.where(missing, -1, positions))
+    if backward:
+        following = np.where(missing, len(missing), positions)
+        following = np.minimum.accumulate(following[::-1])[::-1]
+        following[following == len(missing)] = -1
+        filled = np.where(filled < 0, following, filled)
+    return filled
+
+
+def resample(df, grid, backward=False):
+    """The DataFrame of the events sounding at each point of the grid.
+
+    The result is the same as reindexing over the union of the event and
+    grid offsets, filling the missing values, and keeping the grid.
+    """
+    events, onsets = sourceEvents(df.index.to_numpy(), grid)
+    columns = {}
+    for name in df.columns:
+        values = df[name].to_numpy()
+        missing = pd.isna(values)
+        if missing.any():
+            # Position -1 (nothing to fill with) takes this trailing nan
+            values = np.append(values, np.nan)
+        values = values[filledPositions(missing, backward)[events]]
+        # The grid points between the events upcast integers, like a reindex
+        if values.dtype.kind in "iu" and not onsets.all():
+            values = values.astype(np.float64)
+        columns[name] = values
+    index = pd.Index(grid, name=df.index.name)
+    return pd.DataFrame(columns, index=index, columns=df.columns)
@@ -0,0 +1,382 @@
+"""A streaming RomanText reader that yields the chords of an annotation.
+
+It reproduces, without building any music21 stream, what annotation_parser
+gets from `s.flat.getElementsByClass("RomanNumeral")`: the offset, measure
+number, duration, local key, and figure of every Roman numeral. The file is
+read line by line, following the rules of music21's RomanText translator
+for time signatures, pickup measures, key changes, pivot chords, chords
+held across barlines, skipped and copied measures, and no-chord tokens.
+
+Annotations using features that the reader does not model (e.g., unusual
+measure numbers, or copies of missing measures) raise UnsupportedAnnotation,
+and are meant to be parsed with music21 instead.
+"""
+
+import re
+from fractions import Fraction
+
+from music21.exceptions21 import Music21Exception
+from music21.meter import TimeSignature
+from music21.romanText.rtObjects import RTBeat
+
+# The same patterns music21 uses to tokenize a RomanText file
+MEASURETAG = re.compile(r"m[0-9]+[a-b]*-*[0-9]*[a-b]*")
+VARIANT = re.compile(r"var[0-9]+|var[A-Z]+")
+OPTIONALKEYOPEN = re.compile(r"\?\([A-Ga-g]+[b#]*:")
+OPTIONALKEYCLOSE = re.compile(r"\?\)[A-Ga-g]+[b#]*:?")
+KEY = re.compile(r"[A-Ga-g]+[b#]*;:")
+ANALYTICKEY = re.compile(r"[A-Ga-g]+[b#]*:")
+KEYSIGNATURE = re.compile(r"KS-?[0-7]")
+BEAT = re.compile(r"b[1-9.]+")
+REPEATSTART = re.compile(r"\|\|:")
+REPEATSTOP = re.compile(r":\|\|")
+NOCHORD = re.compile(r"(NC|N.C.|nc)")
+SECONDARY = re.compile(r"(.*?)/([#a-np-zA-NP-Z].*)")
+
+# The kinds of the words of a measure, in the order music21 checks them
+ATOMKINDS = (
+    ("beat", BEAT),
+    ("optionalKey", OPTIONALKEYOPEN),
+    ("optionalKey", OPTIONALKEYCLOSE),
+    ("key", KEY),
+    ("key", ANALYTICKEY),
+    ("keySignature", KEYSIGNATURE),
+    ("repeat", REPEATSTART),
+    ("repeat", REPEATSTOP),
+    ("noChord", NOCHORD),
+)
+
+TIMESIGNATURETAGS = ("timesignature", "time signature")
+KEYSIGNATURETAGS = ("keysignature", "key signature")
+
+# time signature -> bar duration; (time signature, beat) -> offset
+_barDurations = {}
+_beatOffsets = {}
+
+
+class UnsupportedAnnotation(ValueError):
+    """The annotation uses a feature that the reader does not model."""
+
+
+def _barDuration(timeSignature):
+    if timeSignature not in _barDurations:
+        try:
+            ts = TimeSignature(timeSignature)
+        except Music21Exception:
+            raise UnsupportedAnnotation(f"Time signature {timeSignature}.")
+        _barDurations[timeSignature] = Fraction(ts.barDuration.quarterLength)
+    return _barDurations[timeSignature]
+
+
+def _beatOffset(timeSignature, beat):
+    """The offset of a beat token (e.g., 'b2.5') in the measure."""
+    duple = (timeSignature, beat)
+    if duple not in _beatOffsets:
+        try:
+            offset = RTBeat(beat).getOffset(TimeSignature(timeSignature))
+        except (Music21Exception, ValueError):
+            raise UnsupportedAnnotation(f"Beat {beat} in {timeSignature}.")
+        _beatOffsets[duple] = Fraction(offset)
+    return _beatOffsets[duple]
+
+
+def _localKey(token):
+    """The tonicPitchNameWithCase of a key token (e.g., 'Bb:' -> 'B-')."""
+    key = token.rstrip(";:")
+    # The same conversion as music21.key.convertKeyStringToMusic21KeyString
+    if key == "bb":
+        key = "b-"
+    elif key == "Bb":
+        key = "B-"
+    elif key.endswith("b") and not key.startswith("b"):
+        key = key.rstrip("b") + "-"
+    if not re.fullmatch(r"[A-Ga-g][#-]*", key):
+        raise UnsupportedAnnotation(f"Key {token}.")
+    return key
+
+
+def _figure(token):
+    """The figure of a chord token, with the fixes of music21."""
+    return token.replace("0", "o").replace("/o", "ø")
+
+
+def _measureNumbers(tag):
+    """The measure number, or the first and last of a range (e.g., m3-4)."""
+    numbers = []
+    for number in tag.split("-"):
+        digits = "".join(c for c in number if c.isdigit())
+        if not digits:
+            raise UnsupportedAnnotation(f"Measure numbers {tag}.")
+        numbers.append(int(digits))
+    if len(numbers) > 2:
+        raise UnsupportedAnnotation(f"Measure numbers {tag}.")
+    return numbers
+
+
+def _atoms(data):
+    """The (kind, word) of the words of a measure.
+
+    The phrase markers, optional keys, key signatures, and repeat signs
+    do not change the chords, nor their offsets, so they are skipped.
+    """
+    for word in data.split(" "):
+        word = word.strip()
+        if word == "=":
+            break
+        if word in ("", "||", "(", ")"):
+            continue
+        kind = next((k for k, p in ATOMKINDS if p.match(word)), "chord")
+        if kind in ("beat", "key", "noChord", "chord"):
+            yield kind, word
+
+
+class _Chord(object):
+    __slots__ = (
+        "offset",
+        "duration",
+        "localKey",
+        "figure",
+        "followsKeyChange",
+        "pivotKey",
+    )
+
+    def __init__(self, offset, localKey, figure, duration=Fraction(1)):
+        self.offset = offset
+        self.duration = duration
+        self.localKey = localKey
+        self.figure = figure
+        # What music21 uses to recompute the keys of copied measures
+        self.followsKeyChange = False
+        self.pivotKey = None
+
+    def copy(self, offset=None, duration=None):
+        chord = _Chord(self.offset, self.localKey, self.figure, self.duration)
+        chord.followsKeyChange = self.followsKeyChange
+        chord.pivotKey = self.pivotKey
+        if offset is not None:
+            chord.offset = offset
+        if duration is not None:
+            chord.duration = duration
+        return chord
+
+    @property
+    def end(self):
+        return self.offset + self.duration
+
+
+class _Translator(object):
+    """Translates the measures of a RomanText file, one at a time.
+
+    Keeps the state carried from one measure to the next, like the
+    PartTranslator of music21.
+    """
+
+    def __init__(self):
+        self.timeSignature = "4/4"
+        self.timeSignatureOfLastChord = self.timeSignature
+        self.localKey = "C"
+        self.lastMeasureNumber = 0
+        self.previousChord = None
+        # The (number, chords) of every measure so far, to copy them
+        self.history = []
+
+    def tag(self, line):
+        """Reads a tagged line (e.g., 'Time Signature: 3/4')."""
+        if ":" not in line:
+            return
+        tag, data = line.split(":", 1)
+        tag, data = tag.strip().lower(), data.strip()
+        if tag in TIMESIGNATURETAGS:
+            _barDuration(data)
+            self.timeSignature = data
+        elif tag in KEYSIGNATURETAGS and data not in ("", "Bb"):
+            try:
+                int(data)
+            except ValueError:
+                raise UnsupportedAnnotation(f"Key signature {data}.")
+
+    def measures(self, line):
+        """The (number, chords) of the measures defined by a measure line.
+
+        Measures skipped since the previous line are filled with the
+        chord that was sounding, like music21 does. As in music21, copied
+        measures keep the number of the measure they were copied from.
+        """
+        match = MEASURETAG.match(line)
+        numbers = _measureNumbers(match.group(0))
+        data = line[match.end() :].strip()
+        if VARIANT.match(data):
+            # music21 ignores the variants
+            return []
+        measures = []
+        if numbers[0] > self.lastMeasureNumber + 1 and self.previousChord:
+            barDuration = _barDuration(self.timeSignatureOfLastChord)
+            for fillNumber in range(self.lastMeasureNumber + 1, numbers[0]):
+                self.previousChord = self._heldChord(barDuration)
+                measures.append((fillNumber, fillNumber, [self.previousChord]))
+        if len(numbers) > 1 or data.startswith("="):
+            measures.extend(self._copiedMeasures(numbers, data))
+        else:
+            chords = self._measure(data)
+            measures.append((numbers[0], numbers[0], chords))
+            self.lastMeasureNumber = numbers[0]
+        self.history.extend((n, chords) for n, _, chords in measures)
+        return [(number, chords) for _, number, chords in measures]
+
+    def _heldChord(self, duration):
+        """A copy of the previous chord, held at the start of a measure."""
+        return self.previousChord.copy(offset=Fraction(0), duration=duration)
+
+    @staticmethod
+    def _endPreviousChord(chords, offset):
+        """Ends the previous chord of the measure where the next begins."""
+        if chords:
+            chords[-1].duration = offset - chords[-1].offset
+            if chords[-1].duration <= 0:
+                raise UnsupportedAnnotation("Overlapping chords.")
+
+    def _copiedMeasures(self, numbers, data):
+        """The measures copied by a line such as m5-6 = m1-2."""
+        targets = _measureNumbers(data.replace("=", "").strip())
+        if len(targets) != len(numbers):
+            raise UnsupportedAnnotation("Copies of a different length.")
+        if targets[-1] - targets[0] != numbers[-1] - numbers[0]:
+            raise UnsupportedAnnotation("Copies of a different length.")
+        if len(numbers) > 1 and numbers[0] < targets[-1]:
+            raise UnsupportedAnnotation("Overlapping copies.")
+        measures = []
+        for number, chords in self.history:
+            if targets[0] <= number <= targets[-1]:
+                chords = [self._copiedChord(chord) for chord in chords]
+                copiedNumber = numbers[0] + number - targets[0]
+                measures.append((copiedNumber, number, chords))
+            if number == targets[-1]:
+                break
+        if not measures:
+            raise UnsupportedAnnotation("Copies of missing measures.")
+        self.lastMeasureNumber, _, chords = measures[-1]
+        romanNumerals = [c for c in chords if c.figure is not None]
+        if romanNumerals:
+            self.previousChord = romanNumerals[-1]
+        return measures
+
+    def _copiedChord(self, chord):
+        """A copy of a chord, in the key music21 gives to copied chords."""
+        copied = chord.copy()
+        if chord.figure is None:
+            return copied
+        if chord.followsKeyChange:
+            self.localKey = chord.localKey
+        elif chord.pivotKey is not None:
+            self.localKey = chord.pivotKey
+        else:
+            copied.localKey = self.localKey
+        if SECONDARY.match(chord.figure):
+            # music21 replaces these by new Roman numerals, in the key
+            copied = _Chord(chord.offset, self.localKey, chord.figure)
+            copied.duration = chord.duration
+        return copied
+
+    def _measure(self, data):
+        chords = []
+        offset = Fraction(0)
+        pivotChordPossible = False
+        keyChange = False
+        for kind, word in _atoms(data):
+            if kind == "beat":
+                offset = _beatOffset(self.timeSignature, word)
+                if not chords and self.previousChord and offset > 0:
+                    # The previous chord is held until the first beat
+                    self.previousChord = self._heldChord(offset)
+                    chords.append(self.previousChord)
+                pivotChordPossible = False
+            elif kind == "key":
+                self.localKey = _localKey(word)
+                keyChange = True
+            elif kind == "noChord":
+                self.timeSignatureOfLastChord = self.timeSignature
+                if pivotChordPossible:
+                    continue
+                # A rest, which holds time but is not a Roman numeral
+                self._endPreviousChord(chords, offset)
+                self.previousChord = _Chord(offset, self.localKey, None)
+                chords.append(self.previousChord)
+            elif pivotChordPossible:
+                # The second reading of a pivot chord is not a new chord
+                self.timeSignatureOfLastChord = self.timeSignature
+                chords[-1].pivotKey = self.localKey
+                pivotChordPossible = False
+                keyChange = False
+            else:
+                self.timeSignatureOfLastChord = self.timeSignature
+                self._endPreviousChord(chords, offset)
+                figure = _figure(word)
+                self.previousChord = _Chord(offset, self.localKey, figure)
+                self.previousChord.followsKeyChange = keyChange
+                chords.append(self.previousChord)
+                pivotChordPossible = True
+                keyChange = False
+        if self.previousChord is None:
+            raise UnsupportedAnnotation("A first measure without chords.")
+        # The last chord lasts until the end of the measure. In a measure
+        # without chords, that is the chord of a previous measure
+        barDuration = _barDuration(self.timeSignature)
+        self.previousChord.duration = barDuration - offset
+        if self.previousChord.duration <= 0:
+            raise UnsupportedAnnotation("Chords beyond the barline.")
+        return chords
+
+
+def _lines(path):
+    try:
+        with open(path, encoding="utf-8") as fd:
+            for line in fd:
+                yield line.strip()
+    except UnicodeDecodeError:
+        raise UnsupportedAnnotation("The file is not utf-8.")
+
+
+def _rows(chords):
+    for measureOffset, number, chord in chords:
+        if chord.figure is None:
+            continue
+        offset = measureOffset + chord.offset
+        key, figure = chord.localKey, chord.figure
+        yield offset, number, chord.duration, key, figure
+
+
+def romanNumerals(path):
+    """Yields the Roman numerals of a RomanText file, in order.
+
+    Each Roman numeral is an (offset, measure, duration, localKey, figure)
+    tuple. The offsets and durations are Fractions, and the local key is
+    the tonicPitchNameWithCase of the key (e.g., 'E-' or 'f#').
+    """
+    translator = _Translator()
+    measureOffset = Fraction(0)
+    padding = None
+    # The chords of the last measure, which a measure without chords
+    # may still extend (but music21 does not move the next measures)
+    pending = []
+    for line in _lines(path):
+        if not line:
+            continue
+        if not MEASURETAG.match(line):
+            translator.tag(line)
+            continue
+        for number, chords in translator.measures(line):
+            if not chords:
+                continue
+            if padding is None:
+                # A pickup measure 0 starts at its first chord
+                padding = chords[0].offset if number == 0 else Fraction(0)
+            elif number == 0:
+                raise UnsupportedAnnotation(
+                    "A measure 0 after other measures."
+                )
+            yield from _rows(pending)
+            pending = [(measureOffset - padding, number, c) for c in chords]
+            measureOffset += max(chord.end for chord in chords)
+    if padding is None:
+        raise UnsupportedAnnotation("A file without measures.")
+    yield from _rows(pending)
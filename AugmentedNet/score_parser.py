@@ -13,8 +13,10 @@ from music21.meter import TimeSignature
 import numpy as np
 import pandas as pd
 
+from . import musicxml_parser
 from .cache import m21Interval
 from .common import FIXEDOFFSET, FLOATSCALE
+from .resampling import fixedGrid, resample, sourceEvents
 from .texturizers import (
     applyTextureTemplate,
     available_durations,
@@ -75,16 +77,20 @@ def _lastOffset(m21Score):
     return lastOffset
 
 
-def _initialDataFrame(s, fmt=None):
+def _initialDataFrame(s, fmt=None, chordified=None):
     """Parses a score and produces a pandas dataframe.
 
     The features obtained are the note names, their position in the score,
     measure number, and their ties (in case something fancy needs to be done,
     with the tie information).
+
+    If the score has been chordified already, that stream can be reused.
     """
     dfdict = {col: [] for col in S_COLUMNS}
     measureNumberShift = _measureNumberShift(s)
-    for c in s.chordify().flat.notesAndRests:
+    if chordified is None:
+        chordified = s.chordify()
+    for c in chordified.flat.notesAndRests:
         dfdict["s_offset"].append(round(float(c.offset), FLOATSCALE))
         dfdict["s_duration"].append(round(float(c.quarterLength), FLOATSCALE))
         dfdict["s_measure"].append(c.measureNumber + measureNumberShift)
@@ -100,11 +106,31 @@ def _initialDataFrame(s, fmt=None):
         dfdict["s_intervals"].append(intervs)
         onsets = [(not n.tie or n.tie.type == "start") for n in c]
         dfdict["s_isOnset"].append(onsets)
+    return _slicesDataFrame(dfdict, _lastOffset(s))
+
+
+def _fastInitialDataFrame(f):
+    """Produces the dataframe of _initialDataFrame, without music21.
+
+    The MusicXML file is streamed by musicxml_parser, which raises
+    UnsupportedScore for the scores that need music21.
+    """
+    dfdict, lastOffset = musicxml_parser.salamiSlices(f)
+    for col in ["s_offset", "s_duration"]:
+        dfdict[col] = [round(float(x), FLOATSCALE) for x in dfdict[col]]
+    for col in S_LISTTYPE_COLUMNS:
+        # Rests have dummy entries
+        dfdict[col] = [np.nan if x is None else x for x in dfdict[col]]
+    return _slicesDataFrame(dfdict, lastOffset)
+
+
+def _slicesDataFrame(dfdict, lastOffset):
+    """The dataframe of the salami slices of a score ending at lastOffset."""
     df = pd.DataFrame(dfdict)
     currentLastOffset = float(df.tail(1).s_offset) + float(
         df.tail(1).s_duration
     )
-    deltaDuration = _lastOffset(s) - currentLastOffset
+    deltaDuration = lastOffset - currentLastOffset
     df.loc[len(df) - 1, "s_duration"] += deltaDuration
     df.set_index("s_offset", inplace=True)
     df = df[~df.index.duplicated()]
@@ -122,27 +148,19 @@ def _reindexDataFrame(df, fixedOffset=FIXEDOFFSET):
     for example, a sixteenth note. This reindex function does
     exactly that.
     """
-    firstRow = df.head(1)
-    lastRow = df.tail(1)
-    minOffset = firstRow.index.to_numpy()[0]
-    maxOffset = (lastRow.index + lastRow.s_duration).to_numpy()[0]
-    newIndex = np.arange(minOffset, maxOffset, fixedOffset)
-    # All operations done over the full index, i.e., fixed-timesteps
-    # plus original onsets. Later, original onsets (e.g., triplets)
-    # are removed and just the fixed-timesteps are kept
-    df = df.reindex(index=df.index.union(newIndex))
-    df.s_notes.fillna(method="ffill", inplace=True)
-    df.s_notes.fillna(method="bfill", inplace=True)
+    newIndex = fixedGrid(df, df.s_duration, fixedOffset)
+    # Rests take the notes of the previous (or, at the start, next) slice
+    resampled = resample(df, newIndex, backward=True)
     # the "isOnset" column is hard to generate in fixed-timesteps
     # however, it allows us to encode a "hold" symbol if we wanted to
-    newCol = pd.Series(
-        [[False] * n for n in df.s_notes.str.len().to_list()], index=df.index
-    )
-    df.s_isOnset.fillna(value=newCol, inplace=True)
-    df.fillna(method="ffill", inplace=True)
-    df.fillna(method="bfill", inplace=True)
-    df = df.reindex(index=newIndex)
-    return df
+    events, onsets = sourceEvents(df.index.to_numpy(), newIndex)
+    isOnset = df.s_isOnset.to_numpy()[events]
+    held = ~onsets | df.s_isOnset.isna().to_numpy()[events]
+    resampled["s_isOnset"] = [
+        [False] * len(notes) if hold else onset
+        for hold, onset, notes in zip(held, isOnset, resampled.s_notes)
+    ]
+    return resampled
 
 
 def _engraveScore(df, timeSignatures=None):
@@ -199,14 +217,43 @@ def _texturizeAnnotationScore(df, duration, numberOfNotes):
     return outputdf
 
 
-def parseScore(f, fmt=None, fixedOffset=FIXEDOFFSET, eventBased=False):
+def parseScore(
+    f,
+    fmt=None,
+    fixedOffset=FIXEDOFFSET,
+    eventBased=False,
+    returnStreams=False,
+    fastParser=False,
+):
+    """Generates the DataFrame from a score.
+
+    If returnStreams=True, the parsed music21 score and its chordified
+    version are returned as well, as (df, score, chordified). This lets
+    the caller reuse them instead of parsing the file again.
+
+    If fastParser=True, MusicXML files are read by the streaming
+    musicxml_parser instead, falling back to music21 for the scores
+    (or formats) that it does not support.
+    """
+    if fastParser and not returnStreams and musicxml_parser.isMusicXML(f):
+        try:
+            df = _fastInitialDataFrame(f)
+        except musicxml_parser.UnsupportedScore:
+            pass
+        else:
+            if not eventBased:
+                df = _reindexDataFrame(df, fixedOffset=fixedOffset)
+            return df
     # Step 0: Use music21 to parse the score
     s = _m21Parse(f, fmt)
+    chordified = s.chordify()
     # Step 1: Parse and produce a salami-sliced dataset
-    df = _initialDataFrame(s, fmt)
+    df = _initialDataFrame(s, fmt, chordified=chordified)
     # Step 2: Turn salami-slice into fixed-duration steps
     if not eventBased:
         df = _reindexDataFrame(df, fixedOffset=fixedOffset)
+    if returnStreams:
+        return df, s, chordified
     return df
 
 
@@ -15,7 +15,13 @@ from tensorflow.keras import optimizers
 
 from . import cli
 from . import models
-from .dataset_npz_generator import generateDataset
+from .dataset_npz_generator import (
+    NpyDataset,
+    datasetExists,
+    datasetLocation,
+    generateDataset,
+)
+from .augmentation import TRANSPOSITIONSARRAY, BatchTransposer
 from .input_representations import (
     available_representations as availableInputs,
 )
@@ -41,9 +47,17 @@ class InputOutput(object):
         return str(self)
 
 
-def _loadNpz(npzPath, synthetic=False):
-    datasetFile = f"{npzPath}-synth.npz" if synthetic else f"{npzPath}.npz"
-    dataset = np.load(datasetFile, mmap_mode="r")
+def _openDataset(npzPath, synthetic=False, datasetFormat="npz"):
+    datasetFile = datasetLocation(npzPath, synthetic, datasetFormat)
+    if datasetFormat == "npy":
+        # Only the manifest is read, the arrays are memory-mapped
+        return NpyDataset(datasetFile)
+    # Compressed npz members are decompressed into memory
+    return np.load(datasetFile, mmap_mode="r")
+
+
+def _loadNpz(npzPath, synthetic=False, datasetFormat="npz"):
+    dataset = _openDataset(npzPath, synthetic, datasetFormat)
     X_train, y_train = [], []
     X_test, y_test = [], []
     for name in dataset.files:
@@ -59,21 +73,28 @@ def _loadNpz(npzPath, synthetic=False):
     return (X_train, y_train), (X_test, y_test)
 
 
-def loadData(npzPath, syntheticDataStrategy=None, modelName="AugmentedNet"):
+def loadData(
+    npzPath,
+    syntheticDataStrategy=None,
+    modelName="AugmentedNet",
+    datasetFormat="npz",
+):
     if not syntheticDataStrategy:
         (X_train, y_train), (X_test, y_test) = _loadNpz(
-            npzPath, synthetic=False
+            npzPath, synthetic=False, datasetFormat=datasetFormat
         )
     elif syntheticDataStrategy == "syntheticOnly":
         (X_train, y_train), (X_test, y_test) = _loadNpz(
-            npzPath, synthetic=True
+            npzPath, synthetic=True, datasetFormat=datasetFormat
         )
     elif syntheticDataStrategy == "concatenate":
         (X_train, y_train), (X_test, y_test) = _loadNpz(
-            npzPath, synthetic=False
+            npzPath, synthetic=False, datasetFormat=datasetFormat
         )
         # Test portion of synthetic data is NEVER used in this case
-        (Xs_train, ys_train), (_, _) = _loadNpz(npzPath, synthetic=True)
+        (Xs_train, ys_train), (_, _) = _loadNpz(
+            npzPath, synthetic=True, datasetFormat=datasetFormat
+        )
         for x, xs in zip(X_train, Xs_train):
             x.array = np.concatenate((x.array, xs.array))
         for y, ys in zip(y_train, ys_train):
@@ -87,6 +108,25 @@ def loadData(npzPath, syntheticDataStrategy=None, modelName="AugmentedNet"):
     return (X_train, y_train), (X_test, y_test)
 
 
+def loadTranspositions(
+    npzPath, syntheticDataStrategy=None, datasetFormat="npz"
+):
+    """The valid transpositions of each training sequence.
+
+    Only present in datasets generated with --onTheFlyTransposition.
+    """
+    synthetic = syntheticDataStrategy == "syntheticOnly"
+    dataset = _openDataset(npzPath, synthetic, datasetFormat)
+    transpositions = dataset[TRANSPOSITIONSARRAY]
+    if syntheticDataStrategy == "concatenate":
+        dataset = _openDataset(npzPath, True, datasetFormat)
+        syntheticTranspositions = dataset[TRANSPOSITIONSARRAY]
+        transpositions = np.concatenate(
+            (transpositions, syntheticTranspositions)
+        )
+    return transpositions
+
+
 def printTrainingExample(x, y):
     pd.set_option("display.max_rows", 640)
     ret = {}
@@ -102,6 +142,55 @@ def printTrainingExample(x, y):
     print(df)
 
 
+def streamDataset(
+    x,
+    y,
+    batchsize,
+    shuffleBuffer=0,
+    readers=1,
+    shuffle=True,
+    augmentation=None,
+):
+    """A tf.data pipeline streaming batches of (x, y) sequences.
+
+    Only the indices of the sequences go through the shuffle buffer
+    (all of them, if shuffleBuffer is 0). Each batch is gathered from the
+    arrays by one of `readers` parallel calls. The memory used only stays
+    independent of the size of the dataset if the arrays are memory-mapped,
+    i.e., read from the npy dataset format.
+    The augmentation, if any, is called with the indices, inputs, and
+    outputs of each batch, and returns the new inputs and outputs.
+    """
+    arrays = x + y
+    sequences = arrays[0].shape[0]
+    dataset = tf.data.Dataset.range(sequences)
+    if shuffle:
+        dataset = dataset.shuffle(shuffleBuffer or sequences)
+    dataset = dataset.batch(batchsize)
+
+    def gather(indices):
+        # Sorted indices read the memory-mapped arrays sequentially
+        indices = np.sort(indices)
+        batch = [np.asarray(array[indices]) for array in arrays]
+        if augmentation:
+            xs, ys = augmentation(indices, batch[: len(x)], batch[len(x) :])
+            batch = xs + ys
+        return tuple(batch)
+
+    def load(indices):
+        dtypes = [tf.as_dtype(array.dtype) for array in arrays]
+        tensors = tf.numpy_function(gather, [indices], dtypes)
+        for tensor, array in zip(tensors, arrays):
+            tensor.set_shape((None, *array.shape[1:]))
+        xs, ys = tuple(tensors[: len(x)]), tuple(tensors[len(x) :])
+        xs = xs if len(xs) > 1 else xs[0]
+        ys = ys if len(ys) > 1 else ys[0]
+        return xs, ys
+
+    dataset = dataset.map(load, num_parallel_calls=readers)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
 def findBestModel(checkpointPath=".model_checkpoint/"):
     models = [f for f in os.listdir(checkpointPath)]
     accuracies = [f.replace(".hdf5", "").split("-")[-1] for f in models]
@@ -145,16 +234,13 @@ def evaluate(modelHdf5, X_test, y_true):
     for y, ypred in zip(y_true, y_preds):
         name = y.name.replace("validation_y_", "")
         features.append(name)
-        dfdict[f"true_{name}"] = []
-        dfdict[f"pred_{name}"] = []
         true = y.array.reshape(-1, 1)[~padding]
         ypred = ypred.reshape(-1, ypred.shape[2])
         predsCategorical = np.argmax(ypred, axis=1).reshape(-1, 1)
         predsCategorical = predsCategorical[~padding]
-        decodedTrue = availableOutputs[name].decode(true)
-        dfdict[f"true_{name}"].extend(decodedTrue)
-        decodedPreds = availableOutputs[name].decode(predsCategorical)
-        dfdict[f"pred_{name}"].extend(decodedPreds)
+        outputLayer = availableOutputs[name]
+        dfdict[f"true_{name}"] = outputLayer.decodeBatch(true)
+        dfdict[f"pred_{name}"] = outputLayer.decodeBatch(predsCategorical)
     df = pd.DataFrame(dfdict)
     for feature in features:
         df[feature] = df[f"true_{feature}"] == df[f"pred_{feature}"]
@@ -224,6 +310,11 @@ def train(
     batchsize=16,
     transferLearningFrom="",
     transferLearningFreeze=True,
+    tfdata=False,
+    shuffleBuffer=0,
+    readers=1,
+    transpositions=None,
+    seed=None,
 ):
     # printTrainingExample(X_train, y_train)
     if transferLearningFrom:
@@ -253,12 +344,36 @@ def train(
     # Unpacking the numpy arrays inside the input and output representations
     x = [xi.array for xi in X_train]
     y = [yi.array for yi in y_train]
-    x = x if len(x) > 1 else x[0]
-    y = y if len(y) > 1 else y[0]
     xv = [xi.array for xi in X_test]
     yv = [yi.array for yi in y_test]
-    xv = xv if len(xv) > 1 else xv[0]
-    yv = yv if len(yv) > 1 else yv[0]
+    augmentation = None
+    if transpositions is not None:
+        # Transposed at batch time, which needs the tf.data pipeline
+        inputs = [xi.name.split("_")[-1] for xi in X_train]
+        outputs = [yi.name.split("_")[-1] for yi in y_train]
+        augmentation = BatchTransposer(
+            inputs, outputs, transpositions, seed=seed
+        )
+    if tfdata or augmentation:
+        trainingData = streamDataset(
+            x, y, batchsize, shuffleBuffer, readers, augmentation=augmentation
+        )
+        validationData = streamDataset(
+            xv, yv, batchsize, readers=readers, shuffle=False
+        )
+        fitArgs = {"x": trainingData, "validation_data": validationData}
+    else:
+        x = x if len(x) > 1 else x[0]
+        y = y if len(y) > 1 else y[0]
+        xv = xv if len(xv) > 1 else xv[0]
+        yv = yv if len(yv) > 1 else yv[0]
+        fitArgs = {
+            "x": x,
+            "y": y,
+            "shuffle": True,
+            "batch_size": batchsize,
+            "validation_data": (xv, yv),
+        }
 
     modelNameSuffix = (
         "{epoch:02d}"
@@ -271,12 +386,8 @@ def train(
     X_train = y_train = X_test = y_test = []
     gc.collect()
     model.fit(
-        x,
-        y,
+        **fitArgs,
         epochs=epochs,
-        shuffle=True,
-        batch_size=batchsize,
-        validation_data=(xv, yv),
         callbacks=[
             ModdedModelCheckpoint(
                 checkpointPath + modelNameSuffix,
@@ -303,6 +414,10 @@ def run_experiment(
     batchsize,
     transferLearningFrom,
     transferLearningFreeze,
+    tfdata,
+    shuffleBuffer,
+    readers,
+    seed,
     **kwargs,
 ):
     if nogpu:
@@ -310,6 +425,10 @@ def run_experiment(
     else:
         # Ideally, this shouldn't be necessary; but this is not an ideal world
         tensorflowGPUHack()
+    if tfdata and kwargs["datasetFormat"] == "npz":
+        # Compressed npz arrays would be decompressed into memory anyway
+        print("--tfdata implies --datasetFormat npy (memory-mapped)")
+        kwargs["datasetFormat"] = "npy"
     mlflow.tensorflow.autolog()
     mlflow.set_experiment(experiment_name)
     mlflow.start_run(run_name=run_name)
@@ -318,12 +437,15 @@ def run_experiment(
     timestamp = datetime.datetime.now().strftime("%y%m%dT%H%M%S")
     checkpoint = f".model_checkpoint/{experiment_name}/{run_name}-{timestamp}/"
     npzNoExt, _ = os.path.splitext(kwargs["npzOutput"])
-    if not useExistingNpz or not os.path.isfile(f"{npzNoExt}.npz"):
+    datasetFormat = kwargs["datasetFormat"]
+    dataset = datasetLocation(npzNoExt, False, datasetFormat)
+    syntheticDataset = datasetLocation(npzNoExt, True, datasetFormat)
+    if not useExistingNpz or not datasetExists(dataset):
         kwargs["synthetic"] = False
         generateDataset(**kwargs)
         # log_artifacts(DATASETDIR, artifact_path="dataset")
     if syntheticDataStrategy:
-        if not useExistingNpz or not os.path.isfile(f"{npzNoExt}-synth.npz"):
+        if not useExistingNpz or not datasetExists(syntheticDataset):
             kwargs["synthetic"] = True
             generateDataset(**kwargs)
             # log_artifacts(SYNTHDATASETDIR, artifact_path="dataset-synth")
@@ -331,7 +453,13 @@ def run_experiment(
         npzPath=npzNoExt,
         syntheticDataStrategy=syntheticDataStrategy,
         modelName=model,
+        datasetFormat=datasetFormat,
     )
+    transpositions = None
+    if kwargs["onTheFlyTransposition"]:
+        transpositions = loadTranspositions(
+            npzNoExt, syntheticDataStrategy, datasetFormat
+        )
     bestmodel = train(
         X_train,
         y_train,
@@ -345,6 +473,11 @@ def run_experiment(
         batchsize=batchsize,
         transferLearningFrom=transferLearningFrom,
         transferLearningFreeze=transferLearningFreeze,
+        tfdata=tfdata,
+        shuffleBuffer=shuffleBuffer,
+        readers=readers,
+        transpositions=transpositions,
+        seed=seed,
     )
     modelpath = os.path.join(checkpoint, bestmodel)
     results, summary = evaluate(modelpath, X_test, y_test)
@@ -0,0 +1,197 @@
+"""Table-driven transposition of spellings, keys, and pitch-class sets.
+
+Spellings and intervals are placed on the line of fifths, where a
+transposition becomes an integer addition. Every transposition between
+the closed sets of SPELLINGS, KEYS, PCSETS, NOTENAMES, PITCHCLASSES, and
+INTERVALCLASSES is precomputed into int16 tables. The tables hold the index
+of the transposed class, or -1 if it falls outside of the vocabulary.
+"""
+
+import numpy as np
+
+from .cache import TransposeKey, TransposePcSet, TransposePitch
+from .feature_representation import (
+    ACCIDENTALS,
+    INTERVALCLASSES,
+    KEYS,
+    NOTENAMES,
+    PCSETS,
+    PITCHCLASSES,
+    SPELLINGS,
+)
+
+# The letters, sorted by their position in the line of fifths
+FIFTHSLETTERS = "FCGDAEB"
+
+# The position of each letter in the line of fifths, relative to C
+LETTERFIFTHS = {
+    letter: i - FIFTHSLETTERS.index("C")
+    for i, letter in enumerate(FIFTHSLETTERS)
+}
+
+# Every sharp moves a spelling seven fifths up
+ACCIDENTALFIFTHS = {"--": -14, "-": -7, "": 0, "#": 7, "##": 14}
+
+# The position of the perfect and major intervals in the line of fifths
+GENERICFIFTHS = {1: 0, 2: 2, 3: 4, 4: -1, 5: 1, 6: 3, 7: 5}
+
+PERFECTQUALITIES = {"dd": -14, "d": -7, "P": 0, "A": 7, "AA": 14}
+
+MAJORQUALITIES = {"dd": -21, "d": -14, "m": -7, "M": 0, "A": 7, "AA": 14}
+
+# All the keys with a tonic in SPELLINGS, a superset of KEYS
+TONALITIES = tuple(
+    SPELLINGS
+    + [
+        f"{letter.lower()}{accidental}"
+        for letter in NOTENAMES
+        for accidental in ACCIDENTALS
+    ]
+)
+
+SPELLINGINDEX = {spelling: i for i, spelling in enumerate(SPELLINGS)}
+KEYINDEX = {key: i for i, key in enumerate(KEYS)}
+PCSETINDEX = {pcset: i for i, pcset in enumerate(PCSETS)}
+INTERVALINDEX = {interval: i for i, interval in enumerate(INTERVALCLASSES)}
+
+
+def spellingFifths(spelling):
+    """The position of a spelling (e.g., 'C#') in the line of fifths."""
+    letter, accidental = spelling[0].upper(), spelling[1:]
+    return LETTERFIFTHS[letter] + ACCIDENTALFIFTHS[accidental]
+
+
+def fifthsSpelling(fifths):
+    """The spelling at a position in the line of fifths (e.g., 7 -> 'C#')."""
+    letter = FIFTHSLETTERS[(fifths + 1) % 7]
+    sharps = (fifths + 1) // 7
+    accidental = "#" * sharps if sharps > 0 else "-" * -sharps
+    return f"{letter}{accidental}"
+
+
+def intervalFifths(interval):
+    """The position of an interval (e.g., 'm3') in the line of fifths."""
+    quality, generic = interval[:-1], int(interval[-1])
+    if generic in (1, 4, 5):
+        return GENERICFIFTHS[generic] + PERFECTQUALITIES[quality]
+    return GENERICFIFTHS[generic] + MAJORQUALITIES[quality]
+
+
+SPELLINGFIFTHS = np.array([spellingFifths(s) for s in SPELLINGS])
+INTERVALFIFTHS = np.array([intervalFifths(i) for i in INTERVALCLASSES])
+INTERVALSEMITONES = INTERVALFIFTHS * 7 % 12
+INTERVALSTEPS = np.array([int(i[-1]) - 1 for i in INTERVALCLASSES])
+
+
+def _spellingTable():
+    lowest, highest = SPELLINGFIFTHS.min(), SPELLINGFIFTHS.max()
+    # SPELLINGS covers a contiguous stretch of the line of fifths
+    lookup = np.empty(highest - lowest + 1, dtype=np.int16)
+    lookup[SPELLINGFIFTHS - lowest] = np.arange(len(SPELLINGS))
+    fifths = SPELLINGFIFTHS[:, np.newaxis] + INTERVALFIFTHS
+    inRange = (fifths >= lowest) & (fifths <= highest)
+    table = lookup[np.clip(fifths, lowest, highest) - lowest]
+    return np.where(inRange, table, -1).astype(np.int16)
+
+
+def _keyTable():
+    table = np.full((len(TONALITIES), len(INTERVALCLASSES)), -1, np.int16)
+    for row, key in enumerate(TONALITIES):
+        fifths = spellingFifths(key) + INTERVALFIFTHS
+        for col, f in enumerate(fifths):
+            tonic = fifthsSpelling(int(f))
+            transposed = tonic.lower() if key.islower() else tonic
+            table[row, col] = KEYINDEX.get(transposed, -1)
+    return table
+
+
+def _pcsetTable():
+    table = np.full((len(PCSETS), len(INTERVALCLASSES)), -1, np.int16)
+    for row, pcset in enumerate(PCSETS):
+        for col, semitones in enumerate(INTERVALSEMITONES):
+            transposed = tuple(sorted((pc + semitones) % 12 for pc in pcset))
+            table[row, col] = PCSETINDEX.get(transposed, -1)
+    return table
+
+
+# (spelling, interval) -> index of the transposed spelling in SPELLINGS
+TRANSPOSEDSPELLINGS = _spellingTable()
+
+# (key, interval) -> index of the transposed key in KEYS
+# The rows follow TONALITIES, so keys outside of KEYS can be transposed
+TRANSPOSEDKEYS = _keyTable()
+TONALITYINDEX = {key: i for i, key in enumerate(TONALITIES)}
+
+# (pcset, interval) -> index of the transposed pcset in PCSETS
+TRANSPOSEDPCSETS = _pcsetTable()
+
+# (letter, interval) -> index of the transposed letter in NOTENAMES
+TRANSPOSEDLETTERS = (
+    np.arange(len(NOTENAMES))[:, np.newaxis] + INTERVALSTEPS
+) % len(NOTENAMES)
+TRANSPOSEDLETTERS = TRANSPOSEDLETTERS.astype(np.int16)
+
+# (pitch class, interval) -> the transposed pitch class
+TRANSPOSEDPITCHCLASSES = (
+    np.arange(len(PITCHCLASSES))[:, np.newaxis] + INTERVALSEMITONES
+) % len(PITCHCLASSES)
+TRANSPOSEDPITCHCLASSES = TRANSPOSEDPITCHCLASSES.astype(np.int16)
+
+
+def transposeClasses(labels, intervals, table, index, classIndex, fallback):
+    """Transposes a sequence of labels with a single fancy-index op.
+
+    The table rows follow index, and its values index classIndex. Labels
+    that are not rows of the table are transposed with the (slower)
+    music21-based fallback.
+    """
+    labels = list(labels)
+    scalar = isinstance(intervals, str)
+    intervals = [intervals] if scalar else list(intervals)
+    cols = [INTERVALINDEX[interval] for interval in intervals]
+    uniques = list(dict.fromkeys(labels))
+    rows = np.array([index.get(label, -1) for label in uniques], dtype=int)
+    transposed = table[rows][:, cols]
+    for u in np.nonzero(rows < 0)[0]:
+        for c, interval in enumerate(intervals):
+            label = fallback(uniques[u], interval)
+            transposed[u, c] = classIndex.get(label, -1)
+    inverse = {label: u for u, label in enumerate(uniques)}
+    ret = transposed[[inverse[label] for label in labels]]
+    return ret[:, 0] if scalar else ret
+
+
+def transposeSpellings(spellings, intervals):
+    """The indices in SPELLINGS of the transposed spellings.
+
+    Takes a single interval, returning an (n,) int16 array, or a list of
+    intervals, returning an (n, intervals) int16 array. Spellings that
+    fall outside of SPELLINGS after the transposition become -1.
+    """
+    return transposeClasses(
+        spellings,
+        intervals,
+        TRANSPOSEDSPELLINGS,
+        SPELLINGINDEX,
+        SPELLINGINDEX,
+        TransposePitch,
+    )
+
+
+def transposeKeys(keys, intervals):
+    """The indices in KEYS of the transposed keys (-1 if outside KEYS)."""
+    return transposeClasses(
+        keys, intervals, TRANSPOSEDKEYS, TONALITYINDEX, KEYINDEX, TransposeKey
+    )
+
+
+def transposePcSets(pcsets, intervals):
+    """The indices in PCSETS of the transposed pcsets (-1 if outside)."""
+    return transposeClasses(
+        pcsets,
+        intervals,
+        TRANSPOSEDPCSETS,
+        PCSETINDEX,
+        PCSETINDEX,
+        TransposePcSet,
+    )
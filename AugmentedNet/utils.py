@@ -1,13 +1,17 @@
 """Various utilities used throughout the other modules."""
 
 import os
+import struct
+import tempfile
+import weakref
 
 import numpy as np
-import tensorflow as tf
 
 
 def tensorflowGPUHack():
     # https://github.com/tensorflow/tensorflow/issues/37942
+    import tensorflow as tf
+
     gpu_devices = tf.config.experimental.list_physical_devices("GPU")
     for device in gpu_devices:
         tf.config.experimental.set_memory_growth(device, True)
@@ -19,59 +23,131 @@ def disableGPU():
 
 
 def padToSequenceLength(arr, sequenceLength, value=0):
-    frames, features = arr.shape
-    featuresPerSequence = sequenceLength * features
-    featuresInExample = frames * features
-    padding = featuresPerSequence - (featuresInExample % featuresPerSequence)
-    paddingTimesteps = int(padding / features)
-    arr = np.pad(arr, ((0, paddingTimesteps), (0, 0)), constant_values=value)
-    arr = arr.reshape(-1, sequenceLength, features)
+    """Pads the frames and splits them into sequences of sequenceLength.
+
+    The frames are the second to last axis, any leading axes are kept.
+    An array of shape (..., frames, features) becomes one of shape
+    (..., sequences, sequenceLength, features).
+    """
+    *leading, frames, features = arr.shape
+    paddingTimesteps = sequenceLength - (frames % sequenceLength)
+    padding = [(0, 0)] * len(leading) + [(0, paddingTimesteps), (0, 0)]
+    arr = np.pad(arr, padding, constant_values=value)
+    arr = arr.reshape(*leading, -1, sequenceLength, features)
     return arr
 
 
+def _npyHeader(dtype, shape, length):
+    """An .npy (version 1.0) header, padded with spaces to length bytes."""
+    header = {
+        "descr": np.lib.format.dtype_to_descr(dtype),
+        "fortran_order": False,
+        "shape": tuple(shape),
+    }
+    magic = np.lib.format.magic(1, 0)
+    header = repr(header).ljust(length - len(magic) - 2 - 1) + "\n"
+    return magic + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def _removeFile(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
 class DynamicArray:
+    """An appendable array, written in chunks to an .npy file.
+
+    Rows are appended in bulk with `extend` and buffered in a chunk of
+    chunkRows. Each full chunk (or larger batch) is written at the end
+    of the .npy file in path, whose header gets the final number of rows
+    in `finalize`. Without a path, the file is temporary, and it is
+    removed on `close` (or when the array is garbage collected).
+    """
+
+    # Room in the header for any number of rows
+    MAXROWS = 10**18
+
     def __init__(
-        self,
-        shape=(0,),
-        dtype=float,
-        initial_capacity=1000,
-        growth_factor=2,
-        memmap="",
+        self, shape=(0,), dtype=float, path="", chunkRows=1024, tmpdir="."
     ):
         """First item of shape is ignored, the rest defines the shape."""
-        self.shape = shape
-        if memmap:
-            self.data = np.memmap(
-                memmap,
-                mode="w+",
-                shape=(initial_capacity, *shape[1:]),
-                dtype=dtype,
-            )
-        else:
-            self.data = np.zeros((initial_capacity, *shape[1:]), dtype=dtype)
-        self.capacity = initial_capacity
-        self.growth_factor = growth_factor
-        self.memmap = memmap
+        self.rowShape = tuple(shape[1:])
+        self.dtype = np.dtype(dtype)
+        self.rowBytes = self.dtype.itemsize * int(np.prod(self.rowShape))
+        self.temporary = not path
+        if self.temporary:
+            fd, path = tempfile.mkstemp(suffix=".npy", prefix=".", dir=tmpdir)
+            os.close(fd)
+            self._cleanup = weakref.finalize(self, _removeFile, path)
+        self.path = path
         self.size = 0
-        self.dtype = dtype
+        self.file = open(path, "wb", buffering=0)
+        header = _npyHeader(self.dtype, (self.MAXROWS, *self.rowShape), 0)
+        self.headerLength = -(-len(header) // 64) * 64
+        self.file.write(self._header())
+        self.chunk = np.empty((chunkRows, *self.rowShape), dtype=self.dtype)
+        self.buffered = 0
+
+    def _header(self):
+        shape = (self.size, *self.rowShape)
+        return _npyHeader(self.dtype, shape, self.headerLength)
+
+    def _flush(self):
+        if self.buffered:
+            self.chunk[: self.buffered].tofile(self.file)
+            self.buffered = 0
+
+    def reserve(self, rows):
+        """Preallocates the file for an estimated total number of rows."""
+        length = self.headerLength + rows * self.rowBytes
+        try:
+            os.posix_fallocate(self.file.fileno(), 0, length)
+        except (AttributeError, OSError):
+            # Only a hint, not every platform/filesystem supports it
+            pass
+
+    def extend(self, batch):
+        """Appends a batch of rows, shaped (rows, *shape[1:])."""
+        batch = np.asarray(batch, dtype=self.dtype)
+        if batch.shape[1:] != self.rowShape:
+            raise ValueError(f"Rows of shape {batch.shape[1:]} expected.")
+        rows = len(batch)
+        if self.buffered + rows > len(self.chunk):
+            self._flush()
+        if rows >= len(self.chunk):
+            np.ascontiguousarray(batch).tofile(self.file)
+        else:
+            self.chunk[self.buffered : self.buffered + rows] = batch
+            self.buffered += rows
+        self.size += rows
 
     def update(self, x):
-        if self.size == self.capacity:
-            self.capacity = int(self.capacity * self.growth_factor)
-            if self.memmap:
-                self.data.flush()
-                self.data = np.memmap(
-                    self.memmap,
-                    mode="r+",
-                    shape=(self.capacity, *self.data.shape[1:]),
-                    dtype=self.dtype,
-                )
-            else:
-                self.data = np.resize(
-                    self.data, (self.capacity, *self.data.shape[1:])
-                )
-        self.data[self.size] = x
-        self.size += 1
+        """Appends a single row."""
+        self.extend(np.asarray(x)[np.newaxis])
 
     def finalize(self):
-        return self.data[: self.size]
+        """Completes the .npy file, returning it memory-mapped."""
+        if not self.file.closed:
+            self._flush()
+            # Drop whatever was reserved and not used
+            self.file.truncate()
+            self.file.seek(0)
+            self.file.write(self._header())
+            self.file.close()
+        if self.size == 0:
+            # Empty files cannot be memory-mapped
+            return np.load(self.path)
+        return np.load(self.path, mmap_mode="r")
+
+    def close(self):
+        """Closes the file, removing it if it is temporary."""
+        if not self.file.closed:
+            self.file.close()
+        if self.temporary:
+            self._cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -4,6 +4,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 from AugmentedNet.annotation_parser import parseAnnotation
+from AugmentedNet.dataframe_cache import cachedDataFrame
 from AugmentedNet.feature_representation import COMMON_ROMAN_NUMERALS
 
 
@@ -39,6 +40,8 @@ if __name__ == "__main__":
         "key_acc": [],
         "confusion_matrix": [],
     }
+    # The same annotations are compared on every run
+    parseAnnotation = cachedDataFrame("f")(parseAnnotation)
     i = 0
     for f in sorted(os.listdir(gtdir)):
         # if "bps-07" not in f:
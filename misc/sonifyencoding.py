@@ -1,5 +1,6 @@
 import music21
 import argparse
+from AugmentedNet.dataframe_cache import cachedDataFrame
 from AugmentedNet.score_parser import parseScore
 
 noteoctaves = {
@@ -19,7 +20,7 @@ if __name__ == "__main__":
         "input_musicxml", help="An input file to encode/sonify."
     )
     args = parser.parse_args([f])
-    df = parseScore(args.input_musicxml)
+    df = cachedDataFrame("f")(parseScore)(args.input_musicxml)
     bassPart = music21.stream.Part()
     chromaPart = music21.stream.Part()
     for n in df.s_notes:
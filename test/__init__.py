@@ -1,6 +1,9 @@
 import os
 import json
 
+# Keep the test runs out of the persistent caches of the user
+os.environ["AUGMENTEDNET_CACHE"] = ""
+
 
 class AuxiliaryFiles(object):
     """Reads any relevant auxiliary files of a unit test."""
@@ -1,6 +1,5 @@
 import unittest
 
-from music21.roman import RomanNumeral
 import pandas as pd
 
 from AugmentedNet import annotation_parser
@@ -42,6 +41,14 @@ class TestAnnotationParser(unittest.TestCase):
             with self.subTest(gt_index=rowGT.Index, index=row.Index):
                 self.assertEqual(rowGT._asdict(), row._asdict())
 
+    def test_fast_initial_dataframe(self):
+        dfGT = annotation_parser.from_tsv(aux.multiple_annotations_df1)
+        df = annotation_parser._fastInitialDataFrame(aux.multiple_annotations)
+        self.assertEqual(len(df), len(dfGT))
+        for rowGT, row in zip(dfGT.itertuples(), df.itertuples()):
+            with self.subTest(gt_index=rowGT.Index, index=row.Index):
+                self.assertEqual(rowGT._asdict(), row._asdict())
+
     def test_reindexed_dataframe(self):
         dfGT = annotation_parser.from_tsv(aux.multiple_annotations_df2)
         s = annotation_parser._m21Parse(aux.multiple_annotations)
@@ -53,11 +60,9 @@ class TestAnnotationParser(unittest.TestCase):
 
     def test_roman_numeral_secondary_dominants(self):
         for rn, (lkGT, pcsetGT, tkGT) in romanNumeralConversionsGT.items():
-            rnobj = RomanNumeral(rn, lkGT)
-            _, rndata = annotation_parser._extractRomanNumeralInformation(
-                rnobj
-            )
-            rndata = annotation_parser._correctRomanNumeral(rndata)
+            figure = annotation_parser._preprocessRomanNumeral(rn, lkGT)
+            analysis = annotation_parser._analyzeRomanNumeral(lkGT, figure)
+            rndata = analysis["corrected"]
             lk = rndata["localKey"]
             pcset = rndata["pcset"]
             tk = rndata["tonicizedKey"]
@@ -66,6 +71,14 @@ class TestAnnotationParser(unittest.TestCase):
                 self.assertEqual(pcsetGT, pcset)
                 self.assertEqual(tkGT, tk)
 
+    def test_analyze_roman_numeral(self):
+        _, rndata = annotation_parser._parseRomanNumeral("C", "V7/IV")
+        rndata = annotation_parser._correctRomanNumeral(rndata)
+        analysis = annotation_parser._analyzeRomanNumeral("C", "V7/IV")
+        self.assertEqual(analysis["corrected"], rndata)
+        self.assertEqual(analysis["degree1"], "5")
+        self.assertEqual(analysis["degree2"], "4")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,145 @@
+"""Tests for AugmentedNet.augmentation."""
+
+import unittest
+
+import numpy as np
+
+from AugmentedNet import joint_parser
+from AugmentedNet.augmentation import (
+    BatchTransposer,
+    sampleTranspositions,
+    transposableClasses,
+    transposeInputs,
+    transposeOutputs,
+)
+from AugmentedNet.feature_representation import INTERVALCLASSES
+from AugmentedNet.input_representations import (
+    available_representations as availableInputs,
+)
+from AugmentedNet.output_representations import (
+    available_representations as availableOutputs,
+)
+from AugmentedNet.utils import padToSequenceLength
+
+from test import AuxiliaryFiles
+
+aux = AuxiliaryFiles("joint_parser")
+
+INTERVALS = ["P1", "M3", "d5", "m7"]
+
+
+class TestAugmentation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = joint_parser.from_tsv(aux.haydnDataframeGT)
+        cls.transpositions = np.array(
+            [INTERVALCLASSES.index(i) for i in INTERVALS]
+        )
+
+    def _encode(self, representation, intervals, value=-1):
+        encoded = representation(self.df).runTranspositions(intervals)
+        return padToSequenceLength(encoded, 64, value=value)
+
+    def test_inputs_match_encoded_transpositions(self):
+        for name in ["Bass19", "Chromagram35", "BassChromagram70"]:
+            representation = availableInputs[name]
+            original = self._encode(representation, ["P1"])[0]
+            expected = self._encode(representation, INTERVALS)
+            padding = (original == -1).all(axis=-1)
+            table = representation.transpositionTable()
+            for i, transposition in enumerate(self.transpositions):
+                transpositions = np.full(len(original), transposition)
+                transposed = transposeInputs(
+                    original, table, transpositions, padding
+                )
+                with self.subTest(name=name, interval=INTERVALS[i]):
+                    self.assertTrue(np.array_equal(transposed, expected[i]))
+
+    def test_outputs_match_encoded_transpositions(self):
+        padding = self._encode(availableInputs["Bass35"], ["P1"])[0]
+        padding = (padding == -1).all(axis=-1)
+        for name in ["LocalKey38", "Bass35", "RomanNumeral31"]:
+            representation = availableOutputs[name]
+            original = self._encode(representation, ["P1"], value=0)[0]
+            expected = self._encode(representation, INTERVALS, value=0)
+            table = representation.transpositionTable()
+            for i, transposition in enumerate(self.transpositions):
+                transpositions = np.full(len(original), transposition)
+                transposed = transposeOutputs(
+                    original, table, transpositions, padding
+                )
+                with self.subTest(name=name, interval=INTERVALS[i]):
+                    self.assertTrue(np.array_equal(transposed, expected[i]))
+
+    def test_transposable_classes(self):
+        # C-- transposed a minor second up (D---) is outside of SPELLINGS
+        valid = transposableClasses("Bass35", np.array([[0, 2]]))
+        self.assertFalse(valid[INTERVALCLASSES.index("m2")])
+        self.assertTrue(valid[INTERVALCLASSES.index("M2")])
+
+    def test_sample_only_valid_transpositions(self):
+        masks = np.zeros((100, len(INTERVALCLASSES)), dtype="int8")
+        masks[:, self.transpositions] = 1
+        sampled = sampleTranspositions(masks, np.random.RandomState(0))
+        self.assertEqual(set(sampled), set(self.transpositions))
+
+    def test_sample_without_valid_transpositions(self):
+        masks = np.zeros((3, len(INTERVALCLASSES)), dtype="int8")
+        sampled = sampleTranspositions(masks, np.random.RandomState(0))
+        self.assertEqual(list(sampled), [INTERVALCLASSES.index("P1")] * 3)
+
+    def test_batch_transposer(self):
+        inputs, outputs = ["Bass19"], ["LocalKey38", "Bass35"]
+        x = self._encode(availableInputs["Bass19"], ["P1"])[0]
+        expectedX = self._encode(availableInputs["Bass19"], INTERVALS)
+        ys = [
+            self._encode(availableOutputs[name], ["P1"], value=0)[0]
+            for name in outputs
+        ]
+        expectedYs = [
+            self._encode(availableOutputs[name], INTERVALS, value=0)
+            for name in outputs
+        ]
+        # One valid interval per sequence, or none at all (stays in P1)
+        masks = np.zeros((len(x), len(INTERVALCLASSES)), dtype="int8")
+        choices = [1, None, 2, 3, 0, 2]
+        for sequence, choice in enumerate(choices):
+            if choice is not None:
+                masks[sequence, self.transpositions[choice]] = 1
+        choices = [0 if c is None else c for c in choices]
+        indices = np.arange(len(x))
+        transposer = BatchTransposer(inputs, outputs, masks, seed=0)
+        # A model that predicts every other frame, like Micchi2020
+        strided = [y[:, ::2] for y in ys]
+        for stride, batchYs in [(1, ys), (2, strided)]:
+            [transposedX], transposedYs = transposer(indices, [x], batchYs)
+            for sequence, choice in enumerate(choices):
+                with self.subTest(stride=stride, sequence=sequence):
+                    # The last sequence has padding frames
+                    self.assertTrue(
+                        np.array_equal(
+                            transposedX[sequence], expectedX[choice][sequence]
+                        )
+                    )
+                    for y, expected in zip(transposedYs, expectedYs):
+                        self.assertTrue(
+                            np.array_equal(
+                                y[sequence],
+                                expected[choice][sequence][::stride],
+                            )
+                        )
+
+    def test_batch_transposer_seed(self):
+        masks = np.ones((50, len(INTERVALCLASSES)), dtype="int8")
+        x = self._encode(availableInputs["Bass19"], ["P1"])[0][:1]
+        x = np.repeat(x, 50, axis=0)
+        transposed = []
+        for _ in range(2):
+            transposer = BatchTransposer(["Bass19"], [], masks, seed=7)
+            [batch], _ = transposer(np.arange(50), [x], [])
+            transposed.append(batch)
+        self.assertTrue(np.array_equal(*transposed))
+
+
+if __name__ == "__main__":
+    unittest.main()
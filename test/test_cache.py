@@ -1,9 +1,89 @@
 """Tests for AugmentedNet.cache."""
 
+import os
+import tempfile
 import unittest
+from unittest import mock
 
-import AugmentedNet.cache
+from AugmentedNet import cache
+from AugmentedNet.cache import TransposeKey, forceTonicization
+
+# (localKey, candidateKeys, tonicizedKey)
+tonicizationsGT = [
+    ("C", ["G", "D", "A"], "G"),
+    ("C", ["D", "G", "A"], "G"),
+    ("C", ["d", "e", "a"], "a"),
+    ("a", ["C", "F", "G"], "C"),
+    ("C", [], ""),
+]
 
 
 class TestCache(unittest.TestCase):
-    pass
+    def test_force_tonicization(self):
+        for localKey, candidateKeys, tonicizedKeyGT in tonicizationsGT:
+            tonicizedKey = forceTonicization(localKey, candidateKeys)
+            with self.subTest(localKey=localKey, candidates=candidateKeys):
+                self.assertEqual(tonicizedKey, tonicizedKeyGT)
+
+    def test_persistent_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.pkl")
+            transposed = TransposeKey("c#", "m3")
+            cache.saveCache(path)
+            self.assertTrue(os.path.isfile(path))
+            cache._transposeKey.clear()
+            cache.loadCache(path)
+            self.assertEqual(cache._transposeKey[("c#", "m3")], transposed)
+
+    def test_lazy_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.pkl")
+            cache._transposeKey[("c#", "m3")] = "from disk"
+            cache.saveCache(path)
+            del cache._transposeKey[("c#", "m3")]
+            env = {"AUGMENTEDNET_CACHE": path}
+            with mock.patch.dict(os.environ, env), mock.patch.object(
+                cache, "_loaded", False
+            ):
+                # The first miss reads the file instead of music21
+                self.assertEqual(TransposeKey("c#", "m3"), "from disk")
+                self.assertTrue(cache._loaded)
+            del cache._transposeKey[("c#", "m3")]
+
+    def test_writable_cache_is_ignored(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.pkl")
+            TransposeKey("c#", "m3")
+            cache.saveCache(path)
+            self.assertNotEqual(cache._readCache(path), {})
+            os.chmod(path, 0o666)
+            self.assertEqual(cache._readCache(path), {})
+
+    def test_source_change_invalidates(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.pkl")
+            TransposeKey("c#", "m3")
+            cache.saveCache(path)
+            self.assertNotEqual(cache._readCache(path), {})
+            with mock.patch.object(cache, "_sourceDigest", lambda: "edited"):
+                self.assertEqual(cache._readCache(path), {})
+
+    def test_roman_numeral_analysis(self):
+        calls = []
+
+        def analyze(localKey, figure):
+            calls.append((localKey, figure))
+            return {"figure": figure}
+
+        for _ in range(2):
+            analysis = cache.romanNumeralAnalysis("Eb", "bVI7", analyze)
+            self.assertEqual(analysis, {"figure": "bVI7"})
+        self.assertEqual(calls, [("Eb", "bVI7")])
+        self.assertIn(
+            ("Eb", "bVI7"), cache.PERSISTENT_TABLES["romanNumeralAnalysis"]
+        )
+        del cache._romanNumeralAnalysis[("Eb", "bVI7")]
+
+
+if __name__ == "__main__":
+    unittest.main()
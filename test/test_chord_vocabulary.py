@@ -2,7 +2,13 @@
 
 import unittest
 
-from AugmentedNet.chord_vocabulary import frompcset, closestPcSet
+import numpy as np
+
+from AugmentedNet.chord_vocabulary import (
+    frompcset,
+    closestPcSet,
+    closestPcSets,
+)
 from AugmentedNet.feature_representation import KEYS, PCSETS
 
 romanGT = {
@@ -65,3 +71,11 @@ class TestChordVocabulary(unittest.TestCase):
             pcs = closestPcSet(pcset)
             with self.subTest(pcset=pcset, closest_match=pcsGT):
                 self.assertEqual(pcs, pcsGT)
+
+    def test_closest_pcsets(self):
+        """The batched lookup should match the one-by-one lookup."""
+        vectors = np.zeros((len(pcsetsGT), 12))
+        for row, pcset in enumerate(pcsetsGT):
+            vectors[row, list(pcset)] = 1
+        pcsets = closestPcSets(vectors)
+        self.assertEqual(pcsets, list(pcsetsGT.values()))
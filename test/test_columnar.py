@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from AugmentedNet import columnar
+
+
+class TestColumnar(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "duration": [1.0, 0.5, np.nan],
+                "measure": [1, 1, 2],
+                "onset": [True, False, True],
+                "label": ["I", np.nan, "V7"],
+                "notes": [["C4", "E4"], [], ["G3"]],
+                "pcset": [(0, 4, 7), (7,), ()],
+                "mixed": [1, "a", None],
+                "mixedMissing": [1, np.nan, "b"],
+            },
+            index=pd.Index([0.0, 0.25, 0.5], name="offset"),
+        )
+
+    def roundtrip(self, df):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "df.npz")
+            columnar.save(df, path)
+            return columnar.load(path)
+
+    def test_roundtrip(self):
+        df = self.roundtrip(self.df)
+        self.assertTrue(df.equals(self.df))
+        self.assertEqual(df.index.name, "offset")
+        self.assertEqual(list(df.dtypes), list(self.df.dtypes))
+        self.assertIsInstance(df.notes[0], list)
+        self.assertIsInstance(df.pcset[0], tuple)
+        self.assertIsInstance(df.pcset[0][0], int)
+        self.assertTrue(np.isnan(df.label[0.25]))
+        self.assertIsNone(df.mixed[0.5])
+        self.assertTrue(np.isnan(df.mixedMissing[0.25]))
+
+    def test_literals_are_not_evaluated(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "df.npz")
+            columnar.save(pd.DataFrame({"mixed": [1, "a"]}), path)
+            with np.load(path) as npz:
+                arrays = dict(npz)
+            arrays["0_categories"] = np.array(["__import__('os')", "1"])
+            np.savez(path, **arrays)
+            with self.assertRaises(ValueError):
+                columnar.load(path)
+
+    def test_list_columns_are_flat(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "df.npz")
+            columnar.save(self.df, path)
+            with np.load(path) as npz:
+                notes = list(self.df.columns).index("notes")
+                offsets = npz[f"{notes}_offsets"].tolist()
+                codes = npz[f"{notes}_codes"]
+        self.assertEqual(offsets, [0, 2, 2, 3])
+        self.assertEqual(codes.dtype, np.int32)
+        self.assertEqual(len(codes), 3)
+
+    def test_missing_list_cells(self):
+        df = pd.DataFrame({"notes": [["C4", "E4"], np.nan, ["G3"]]})
+        loaded = self.roundtrip(df)
+        self.assertTrue(loaded.equals(df))
+        self.assertTrue(np.isnan(loaded.notes[1]))
+        self.assertEqual(loaded.notes[2], ["G3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from AugmentedNet import dataframe_cache, score_parser
+
+from test import AuxiliaryFiles
+
+aux = AuxiliaryFiles("score_parser")
+
+
+class TestDataFrameCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "cache.pkl")
+        self.env = mock.patch.dict(os.environ, {"AUGMENTEDNET_CACHE": path})
+        self.env.start()
+        self.directory = dataframe_cache.cacheDir()
+        cached = dataframe_cache.cachedDataFrame("f")
+        self.parseScore = cached(score_parser.parseScore)
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_cached_parse(self):
+        df = self.parseScore(aux.weirdRhythm)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        # A cached DataFrame does not parse the score again
+        with mock.patch.object(score_parser, "_m21Parse") as m21Parse:
+            cached = self.parseScore(aux.weirdRhythm)
+        m21Parse.assert_not_called()
+        self.assertTrue(df.equals(cached))
+        self.assertEqual(list(df.dtypes), list(cached.dtypes))
+
+    def test_options_are_part_of_the_key(self):
+        df = self.parseScore(aux.weirdRhythm, fixedOffset=0.25)
+        eventBased = self.parseScore(aux.weirdRhythm, eventBased=True)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        self.assertFalse(df.equals(eventBased))
+
+    def test_key_follows_the_content(self):
+        copy = os.path.join(self.tmp.name, "copy.krn")
+        with open(aux.weirdRhythm) as fd:
+            content = fd.read()
+        with open(copy, "w") as fd:
+            fd.write(content)
+        key = dataframe_cache.cacheKey("parser", [aux.weirdRhythm], [])
+        self.assertEqual(key, dataframe_cache.cacheKey("parser", [copy], []))
+        with open(copy, "a") as fd:
+            fd.write("!! A comment\n")
+        self.assertNotEqual(
+            key, dataframe_cache.cacheKey("parser", [copy], [])
+        )
+
+    def test_disabled_cache(self):
+        with mock.patch.dict(os.environ, {"AUGMENTEDNET_CACHE": ""}):
+            self.assertIsNone(dataframe_cache.cacheDir())
+            self.parseScore(aux.weirdRhythm)
+        self.assertFalse(os.path.exists(self.directory))
+
+    def test_evict_least_recently_used(self):
+        df = pd.DataFrame({"a": list(range(100))})
+        for key in ["first", "second", "third"]:
+            dataframe_cache.save(df, key, self.directory)
+            path = os.path.join(self.directory, f"{key}.npz")
+            past = time.time() - 100 + len(os.listdir(self.directory))
+            os.utime(path, (past, past))
+        size = os.path.getsize(path)
+        # Loading an entry makes it the most recently used
+        self.assertIsNotNone(dataframe_cache.load("first", self.directory))
+        dataframe_cache.evict(self.directory, maxSize=2 * size)
+        remaining = sorted(os.listdir(self.directory))
+        self.assertEqual(remaining, ["first.npz", "third.npz"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,91 @@
 """Tests for AugmentedNet.dataset_npz_generator."""
 
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
-import AugmentedNet.dataset_npz_generator
+import numpy as np
+import pandas as pd
+
+from AugmentedNet.cli import DefaultArguments
+from AugmentedNet.common import DATASETSUMMARYFILE
+from AugmentedNet.dataset_npz_generator import (
+    NpyDataset,
+    datasetExists,
+    datasetLocation,
+    generateDataset,
+)
+
+from test import AuxiliaryFiles
+
+aux = AuxiliaryFiles("joint_parser")
 
 
 class TestDatasetNpzGenerator(unittest.TestCase):
-    pass
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp)
+        files = [("a", "training"), ("b", "training"), ("c", "validation")]
+        for nickname, split in files:
+            os.makedirs(split, exist_ok=True)
+            shutil.copy(aux.haydnDataframeGT, f"{split}/bps-{nickname}.tsv")
+        summary = pd.DataFrame(
+            {
+                "file": [f"bps-{nickname}" for nickname, _ in files],
+                "collection": ["bps"] * len(files),
+                "split": [split for _, split in files],
+            }
+        )
+        summary.to_csv(DATASETSUMMARYFILE, sep="\t")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def _generate(self, npzOutput, jobs, **kwargs):
+        kwargs = {**DefaultArguments.npz, **kwargs}
+        kwargs.update(
+            tsvDir=".", sequenceLength=64, npzOutput=npzOutput, jobs=jobs
+        )
+        generateDataset(**kwargs)
+        location = datasetLocation(npzOutput, False, kwargs["datasetFormat"])
+        if kwargs["datasetFormat"] == "npy":
+            return NpyDataset(location)
+        return np.load(location)
+
+    def test_parallel_generation_matches_sequential(self):
+        sequential = self._generate("sequential", jobs=1)
+        parallel = self._generate("parallel", jobs=2)
+        self.assertEqual(sorted(sequential.files), sorted(parallel.files))
+        for npzfile in sequential.files:
+            with self.subTest(npzfile=npzfile):
+                self.assertEqual(
+                    sequential[npzfile].tolist(), parallel[npzfile].tolist()
+                )
+
+    def test_shards_are_written_next_to_the_output(self):
+        os.makedirs("output")
+        with mock.patch.object(
+            tempfile, "TemporaryDirectory", wraps=tempfile.TemporaryDirectory
+        ) as temporaryDirectory:
+            self._generate(os.path.join("output", "parallel"), jobs=2)
+        self.assertEqual(temporaryDirectory.call_args.kwargs["dir"], "output")
+
+    def test_npy_format_matches_npz(self):
+        npz = self._generate("dataset", jobs=1, noTransposition=True)
+        npy = self._generate(
+            "dataset", jobs=1, noTransposition=True, datasetFormat="npy"
+        )
+        self.assertTrue(datasetExists("dataset-npy"))
+        self.assertEqual(npz.files, npy.files)
+        for npzfile in npz.files:
+            with self.subTest(npzfile=npzfile):
+                self.assertIsInstance(npy[npzfile], np.memmap)
+                self.assertEqual(npz[npzfile].tolist(), npy[npzfile].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,8 +2,41 @@
 
 import unittest
 
+import pandas as pd
+
 import AugmentedNet.feature_representation
+from AugmentedNet.feature_representation import FeatureRepresentation
+
+
+class CountingRepresentation(FeatureRepresentation):
+    features = 2
+
+    def __init__(self, df):
+        super().__init__(df)
+        self.encoded = []
+
+    def run(self, transposition=None):
+        self.encoded.append(transposition)
+        return super().run(transposition)
 
 
 class TestFeatureRepresentation(unittest.TestCase):
-    pass
+    def setUp(self):
+        self.rep = CountingRepresentation(pd.DataFrame(index=range(3)))
+
+    def test_lazy_array(self):
+        self.assertEqual(self.rep.encoded, [])
+        self.assertEqual(self.rep.array.shape, (3, 2))
+        self.rep.array
+        self.assertEqual(self.rep.encoded, [None])
+
+    def test_memoized_transpositions(self):
+        stacked = self.rep.runTranspositions(["P1", "M3"])
+        self.assertEqual(stacked.shape, (2, 3, 2))
+        stacked = self.rep.runTranspositions(["M3", "m2", "M3"])
+        self.assertEqual(stacked.shape, (3, 3, 2))
+        self.assertEqual(self.rep.encoded, ["P1", "M3", "m2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,185 @@
 """Tests for AugmentedNet.inference."""
 
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
+from types import SimpleNamespace
+from unittest import mock
 
-import AugmentedNet.inference
+import numpy as np
+
+from AugmentedNet import inference
+from AugmentedNet.feature_representation import (
+    COMMON_ROMAN_NUMERALS,
+    KEYS,
+    PCSETS,
+    SPELLINGS,
+)
+from AugmentedNet.inference import (
+    ROMANNUMERALOUTPUTS,
+    resolveRomanNumeralCosine,
+    resolveRomanNumeralsCosine,
+)
+from AugmentedNet.output_representations import (
+    available_representations as availableOutputs,
+)
+
+from test import AuxiliaryFiles
+
+aux = AuxiliaryFiles("score_parser")
+
+# (bass, tenor, alto, soprano, pcset, key, numerator, tonicizedKey)
+chordsGT = {
+    ("C", "G", "C", "E", (0, 4, 7), "C", "I", "C"): ("I", "Cmaj"),
+    ("E", "G", "C", "C", (0, 4, 7), "C", "I", "C"): ("I6", "Cmaj/E"),
+    ("G", "G", "C", "E", (0, 4, 7), "C", "Cad", "C"): ("Cad64", "Cmaj/G"),
+    ("F#", "A", "C", "D", (0, 2, 6, 9), "C", "V7", "G"): (
+        "V65/V",
+        "D7/F#",
+    ),
+    ("G#", "B", "D", "F", (2, 5, 8, 11), "a", "viio7", "a"): (
+        "viio7",
+        "G#dim7",
+    ),
+}
+
+
+class StubModel(object):
+    """Predicts, for every frame, the class given by its first feature."""
+
+    def __init__(self, classes=4):
+        self.classes = classes
+        self.calls = []
+
+    def predict(self, inputs, batch_size=None):
+        frames = inputs[0][..., 0].astype(int)
+        self.calls.append(frames.shape[0])
+        return np.eye(self.classes)[frames]
+
+
+class SignatureStubModel(object):
+    """Predicts the first class of every output, with a real signature."""
+
+    sequenceLength = 16
+    outputLayers = list(ROMANNUMERALOUTPUTS) + ["HarmonicRhythm7"]
+
+    def __init__(self):
+        shape = (None, self.sequenceLength, 19)
+        self.inputs = [SimpleNamespace(name="input_Bass19", shape=shape)]
+        self.outputs = [
+            SimpleNamespace(name=f"{o}/Softmax") for o in self.outputLayers
+        ]
+
+    def predict(self, inputs, batch_size=None):
+        frames = inputs[0].shape[:2]
+        return [
+            np.zeros(frames + (availableOutputs[o].classesNumber(),))
+            for o in self.outputLayers
+        ]
+
+
+def encodedScore(value, windows, sequenceLength=4):
+    """The model inputs of a score whose frames are all of one class."""
+    return [np.full((windows, sequenceLength, 2), value)]
 
 
 class TestInference(unittest.TestCase):
-    pass
+    def test_resolve_roman_numeral(self):
+        for chord, (rnGT, chordLabelGT) in chordsGT.items():
+            rn, chordLabel = resolveRomanNumeralCosine(*chord)
+            with self.subTest(chord=chord):
+                self.assertEqual(rn, rnGT)
+                self.assertEqual(chordLabel, chordLabelGT)
+
+    def test_resolve_roman_numerals_batch(self):
+        classLists = [SPELLINGS] * 4 + [
+            PCSETS,
+            KEYS,
+            COMMON_ROMAN_NUMERALS,
+            KEYS,
+        ]
+        indices = [
+            [classList.index(label) for label in labels]
+            for classList, labels in zip(classLists, zip(*chordsGT))
+        ]
+        resolved = resolveRomanNumeralsCosine(*indices)
+        self.assertEqual(resolved, list(chordsGT.values()))
+
+    def test_predict_batch(self):
+        model = StubModel()
+        windows = [3, 1, 2]
+        encodedScores = [encodedScore(i, w) for i, w in enumerate(windows)]
+        predictions = inference.predictBatch(model, encodedScores)
+        self.assertEqual(model.calls, [6])
+        self.assertEqual(len(predictions), 3)
+        for i, (scorePredictions, w) in enumerate(zip(predictions, windows)):
+            [prediction] = scorePredictions
+            self.assertEqual(prediction.shape, (w * 4,))
+            self.assertTrue((prediction == i).all())
+
+    def test_batch_serial_flushes_the_last_batch(self):
+        model = StubModel()
+        windows = {"a.krn": 3, "b.krn": 2, "c.krn": 1}
+        values = {"a.krn": 1, "b.krn": 2, "c.krn": 3}
+
+        def encodeScore(filepath, inputs, sequenceLength):
+            modelInputs = encodedScore(values[filepath], windows[filepath])
+            return filepath, None, modelInputs
+
+        signature = (["Bass19"], ["Bass35"], 4)
+        with mock.patch.object(
+            inference, "_modelSignature", return_value=signature
+        ), mock.patch.object(
+            inference, "encodeScore", side_effect=encodeScore
+        ), mock.patch.object(
+            inference, "writeAnnotations"
+        ) as writeAnnotations:
+            inference._batchSerial(model, list(windows), batchSize=4)
+        # a and b fill a batch, and c is flushed at the end
+        self.assertEqual(model.calls, [5, 1])
+        written = [c.args[0] for c in writeAnnotations.call_args_list]
+        self.assertEqual(written, ["a.krn", "b.krn", "c.krn"])
+        for c in writeAnnotations.call_args_list:
+            filepath, df, _, [prediction], outputLayers = c.args
+            self.assertEqual(df, filepath)
+            self.assertEqual(outputLayers, ["Bass35"])
+            self.assertEqual(len(prediction), windows[filepath] * 4)
+            self.assertTrue((prediction == values[filepath]).all())
+
+    def test_batch_pool(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            scorePaths = []
+            for path in [aux.weirdRhythm, aux.octaveTest]:
+                scorePaths.append(shutil.copy(path, tmp))
+            model = SignatureStubModel()
+            inference._batchPool(model, scorePaths, batchSize=2, workers=2)
+            for path in scorePaths:
+                filename, _ = path.rsplit(".", 1)
+                for ext in ["csv", "rntxt"]:
+                    annotated = f"{filename}_annotated.{ext}"
+                    self.assertTrue(os.path.isfile(annotated))
+
+    def test_batch_pool_failed_score(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            broken = os.path.join(tmp, "broken.musicxml")
+            with open(broken, "w") as fd:
+                fd.write("<score-partwise>")
+            scorePaths = [shutil.copy(aux.weirdRhythm, tmp), broken]
+            model = SignatureStubModel()
+            with self.assertRaisesRegex(RuntimeError, "broken.musicxml"):
+                inference._batchPool(model, scorePaths, 2, workers=2)
+
+    def test_score_workers_do_not_import_tensorflow(self):
+        code = (
+            "import sys; import AugmentedNet.inference; "
+            "print('tensorflow' in sys.modules)"
+        )
+        output = subprocess.check_output([sys.executable, "-c", code])
+        self.assertEqual(output.strip(), b"False")
+
+
+if __name__ == "__main__":
+    unittest.main()
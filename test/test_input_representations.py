@@ -6,10 +6,14 @@ from music21.interval import Interval
 import numpy as np
 import pandas as pd
 
+from AugmentedNet.feature_representation import EncodingContext
 from AugmentedNet.input_representations import (
+    Bass35,
     BassChromagram38,
     BassChromagram70,
+    Chromagram19,
     BassIntervals58,
+    BassChromagramIntervals77,
     MeasureNoteOnset14,
     Intervals19,
 )
@@ -211,3 +215,78 @@ class TestBassChromagram70(unittest.TestCase):
         for timestep, (gt, x) in enumerate(zip(daArray, daGT)):
             with self.subTest(timestep=timestep):
                 self.assertEqual(gt.tolist(), x.tolist())
+
+
+class TestDecodeBatch(unittest.TestCase):
+    def test_decode_batch(self):
+        df = _load_dfgt(aux.haydn)
+        for rep in [BassChromagram70, MeasureNoteOnset14, Intervals19]:
+            stacked = rep(df).runTranspositions(["P1", "m3"])
+            decoded = rep.decodeBatch(stacked)
+            with self.subTest(rep=rep.__name__):
+                self.assertEqual(decoded.shape, stacked.shape[:2])
+                for array, values in zip(stacked, decoded):
+                    self.assertEqual(values.tolist(), rep.decode(array))
+
+
+class TestOutOfVocabularyNotes(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({"s_notes": [["B##3", "D4"], ["C4"]]})
+
+    def test_spellings(self):
+        # B## up an augmented second is C###, outside of the 35 spellings
+        encoding = Bass35(self.df).run(transposition="A2")
+        self.assertEqual(Bass35.decode(encoding)[1], "D#")
+        self.assertFalse(encoding[0].any())
+
+    def test_letters_and_pitch_classes(self):
+        encoding = Chromagram19(self.df).run(transposition="A2")
+        decoded = Chromagram19.decode(encoding)
+        self.assertEqual(decoded[0], (("C", "E"), (4, 5)))
+        self.assertEqual(decoded[1], (("D",), (3,)))
+
+
+class TestRunTranspositions(unittest.TestCase):
+    def setUp(self):
+        self.df = _load_dfgt(aux.haydn)
+        self.transpositions = ["P1", "m2", "M6", "P5", "d7"]
+
+    def test_stacked_transpositions(self):
+        for representation in [
+            BassChromagram70,
+            BassChromagramIntervals77,
+            MeasureNoteOnset14,
+        ]:
+            rep = representation(self.df)
+            stacked = rep.runTranspositions(self.transpositions)
+            with self.subTest(representation=representation.__name__):
+                self.assertEqual(
+                    stacked.shape,
+                    (len(self.transpositions), *rep.shape),
+                )
+                for array, transposition in zip(stacked, self.transpositions):
+                    expected = rep.run(transposition=transposition)
+                    self.assertEqual(array.tolist(), expected.tolist())
+
+
+class TestEncodingContext(unittest.TestCase):
+    def setUp(self):
+        self.df = _load_dfgt(aux.haydn)
+        self.transpositions = ["P1", "m2", "d7"]
+
+    def test_shared_parts(self):
+        context = EncodingContext(self.df)
+        composite = context.representation(BassChromagram70)
+        self.assertIs(composite, context.representation(BassChromagram70))
+        stacked = composite.runTranspositions(self.transpositions)
+        # The parts encoded for the composite are reused as they are
+        bass35 = context.representation(Bass35)
+        self.assertEqual(set(bass35._transpositions), set(self.transpositions))
+        expected = BassChromagram70(self.df).runTranspositions(
+            self.transpositions
+        )
+        self.assertEqual(stacked.tolist(), expected.tolist())
+        self.assertEqual(
+            bass35.runTranspositions(self.transpositions).tolist(),
+            stacked[..., : Bass35.features].tolist(),
+        )
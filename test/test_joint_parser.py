@@ -1,4 +1,6 @@
 import io
+import os
+import tempfile
 import unittest
 
 import pandas as pd
@@ -23,6 +25,22 @@ class TestJointParser(unittest.TestCase):
             with self.subTest(gt_index=rowGT.Index, index=row.Index):
                 self.assertEqual(rowGT._asdict(), row._asdict())
 
+    def test_columnar_roundtrip(self):
+        dfGT = joint_parser.from_tsv(aux.haydnDataframeGT)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "haydn.npz")
+            joint_parser.to_columnar(dfGT, path)
+            df = joint_parser.from_columnar(path)
+        self.assertTrue(df.equals(dfGT))
+        self.assertEqual(df.index.name, dfGT.index.name)
+        self.assertEqual(list(df.dtypes), list(dfGT.dtypes))
+        for col in joint_parser.J_LISTTYPE_COLUMNS:
+            with self.subTest(col=col):
+                self.assertEqual(df[col].tolist(), dfGT[col].tolist())
+                self.assertEqual(
+                    [type(v) for v in df[col]], [type(v) for v in dfGT[col]]
+                )
+
 
 if __name__ == "__main__":
     unittest.main()
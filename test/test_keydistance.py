@@ -2,8 +2,11 @@
 
 import unittest
 
-from AugmentedNet.keydistance import weberEuclidean
-
+from AugmentedNet.keydistance import (
+    WEBERDIAGONAL,
+    WEBERDISTANCES,
+    weberEuclidean,
+)
 
 GT = [
     ("C", 0.0),
@@ -52,3 +55,9 @@ class TestKeyDistance(unittest.TestCase):
             distance = round(weberEuclidean("C", key), 2)
             distances.append(distance)
         self.assertEqual(distancesGT, distances)
+
+    def test_key_distance_table(self):
+        self.assertEqual(WEBERDISTANCES.shape, (40, 40))
+        self.assertTrue((WEBERDISTANCES == WEBERDISTANCES.T).all())
+        self.assertTrue((WEBERDISTANCES.diagonal() == 0).all())
+        self.assertEqual(weberEuclidean(WEBERDIAGONAL[0], "C"), 5.0)
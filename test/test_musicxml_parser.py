@@ -0,0 +1,162 @@
+import os
+import tempfile
+import unittest
+
+import music21
+import numpy as np
+
+from AugmentedNet import musicxml_parser, score_parser
+
+# A pickup measure, a tie across the barline, two voices, and a chord
+SCORE = """<?xml version="1.0" encoding="UTF-8"?>
+<score-partwise version="3.1">
+  <part-list>
+    <score-part id="P1"><part-name>Piano</part-name></score-part>
+  </part-list>
+  <part id="P1">
+    <measure number="0">
+      <attributes>
+        <divisions>2</divisions>
+        <time><beats>3</beats><beat-type>4</beat-type></time>
+      </attributes>
+      <note>
+        <pitch><step>G</step><octave>4</octave></pitch>
+        <duration>2</duration><voice>1</voice><type>quarter</type>
+      </note>
+    </measure>
+    <measure number="1">
+      <direction>
+        <direction-type><words>dolce</words></direction-type>
+      </direction>
+      <note>
+        <pitch><step>C</step><octave>5</octave></pitch>
+        <duration>4</duration><tie type="start"/>
+        <voice>1</voice><type>half</type>
+      </note>
+      <note>
+        <pitch><step>B</step><octave>4</octave></pitch>
+        <duration>2</duration><voice>1</voice><type>quarter</type>
+      </note>
+      <backup><duration>6</duration></backup>
+      <note>
+        <pitch><step>C</step><octave>3</octave></pitch>
+        <duration>1</duration><voice>2</voice><type>eighth</type>
+      </note>
+      <note>
+        <pitch><step>E</step><alter>-1</alter><octave>3</octave></pitch>
+        <duration>1</duration><voice>2</voice><type>eighth</type>
+      </note>
+      <note>
+        <chord/>
+        <pitch><step>G</step><octave>3</octave></pitch>
+        <duration>1</duration><voice>2</voice><type>eighth</type>
+      </note>
+      <note>
+        <rest/><duration>4</duration><voice>2</voice><type>half</type>
+      </note>
+    </measure>
+    <measure number="2">
+      <note>
+        <pitch><step>C</step><octave>5</octave></pitch>
+        <duration>2</duration><tie type="stop"/>
+        <voice>1</voice><type>quarter</type>
+      </note>
+      <note>
+        <rest/><duration>4</duration><voice>1</voice><type>half</type>
+      </note>
+    </measure>
+  </part>
+</score-partwise>
+"""
+
+
+class TestMusicXMLParser(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.write("score.musicxml", SCORE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w") as fd:
+            fd.write(content)
+        return path
+
+    def assertSameDataFrame(self, path):
+        s = score_parser._m21Parse(path)
+        dfGT = score_parser._initialDataFrame(s)
+        df = score_parser._fastInitialDataFrame(path)
+        self.assertEqual(list(dfGT.index), list(df.index))
+        for rowGT, row in zip(dfGT.itertuples(), df.itertuples()):
+            with self.subTest(path=path, index=row.Index):
+                # Rests have nan in every list-typed column
+                rowGT = {k: str(v) for k, v in rowGT._asdict().items()}
+                row = {k: str(v) for k, v in row._asdict().items()}
+                self.assertEqual(rowGT, row)
+
+    def test_same_as_music21(self):
+        self.assertSameDataFrame(self.path)
+
+    def test_corpus_same_as_music21(self):
+        for work in ["bach/bwv66.6", "schumann_clara/polonaise_op1n1"]:
+            path = str(music21.corpus.getWork(work))
+            self.assertSameDataFrame(path)
+
+    def test_salami_slices(self):
+        dfdict, lastOffset = musicxml_parser.salamiSlices(self.path)
+        self.assertEqual(lastOffset, 7)
+        self.assertEqual(dfdict["s_offset"][:4], [0, 1, 1.5, 2])
+        self.assertEqual(dfdict["s_measure"][:3], [0, 1, 1])
+        self.assertEqual(dfdict["s_notes"][1], ["C3", "C5"])
+        self.assertEqual(dfdict["s_notes"][2], ["E-3", "G3", "C5"])
+        self.assertEqual(dfdict["s_isOnset"][2], [True, True, False])
+
+    def test_enharmonic_notes(self):
+        rest = (
+            "<note>\n        <rest/><duration>4</duration><voice>1</voice>"
+            "<type>half</type>\n      </note>"
+        )
+        # An E-4 above a D#4 spelled only by its displayed accidental
+        notes = """<note>
+        <pitch><step>E</step><alter>-1</alter><octave>4</octave></pitch>
+        <duration>4</duration><voice>1</voice><type>half</type>
+      </note>
+      <backup><duration>6</duration></backup>
+      <note>
+        <pitch><step>D</step><octave>4</octave></pitch>
+        <duration>6</duration><voice>2</voice><type>half</type><dot/>
+        <accidental>sharp</accidental>
+      </note>"""
+        self.assertIn(rest, SCORE)
+        path = self.write("enharmonic.musicxml", SCORE.replace(rest, notes))
+        self.assertSameDataFrame(path)
+        dfdict, _ = musicxml_parser.salamiSlices(path)
+        # Like music21 chords, the D#4 sorts below the E-4
+        self.assertEqual(dfdict["s_notes"][-1], ["D#4", "E-4"])
+
+    def test_unsupported_score(self):
+        harmony = "<harmony><root><root-step>C</root-step></root></harmony>"
+        measure = '<measure number="2">'
+        content = SCORE.replace(measure, measure + harmony)
+        path = self.write("harmony.musicxml", content)
+        with self.assertRaises(musicxml_parser.UnsupportedScore):
+            musicxml_parser.salamiSlices(path)
+        # parseScore falls back to music21
+        dfGT = score_parser.parseScore(path)
+        df = score_parser.parseScore(path, fastParser=True)
+        self.assertTrue(dfGT.equals(df))
+
+    def test_parse_score(self):
+        dfGT = score_parser.parseScore(self.path)
+        df = score_parser.parseScore(self.path, fastParser=True)
+        self.assertEqual(list(dfGT.columns), list(df.columns))
+        self.assertTrue(np.allclose(dfGT.index, df.index))
+        self.assertEqual(
+            dfGT.s_notes.astype(str).tolist(), df.s_notes.astype(str).tolist()
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
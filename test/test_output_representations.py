@@ -83,6 +83,29 @@ class TestBass35(unittest.TestCase):
             with self.subTest(timestep=timestep):
                 self.assertEqual(gt, x)
 
+    def test_dtype(self):
+        encoding = self.clas(self.df).array
+        self.assertEqual(encoding.dtype, np.int8)
+        self.assertLessEqual(self.clas.classesNumber(), 128)
+
+    def test_decode_batch(self):
+        encoding = self.clas(self.df).array.reshape(-1)
+        batch = encoding[: len(encoding) // 4 * 4].reshape(4, -1)
+        decoded = self.clas.decodeBatch(batch)
+        self.assertEqual(decoded.shape, batch.shape)
+        self.assertEqual(decoded.reshape(-1).tolist(), self.clas.decode(batch))
+
+    def test_transpositions(self):
+        stacked = self.clas(self.df).runTranspositions(self.transpositions)
+        transpose = getattr(self.clas, "transpositionFn", None)
+        for array, interval in zip(stacked, self.transpositions):
+            decoded = self.clas.decode(array)
+            expected = list(self.df[self.dfFeature])
+            if transpose:
+                expected = [transpose(x, interval) for x in expected]
+            with self.subTest(interval=interval):
+                self.assertEqual(decoded, expected)
+
     # def test_data_augmentation(self):
     #     rep = self.clas(self.df)
     #     daArray = np.copy(rep.array)
@@ -96,6 +119,17 @@ class TestBass35(unittest.TestCase):
     #             self.assertEqual(gt.tolist(), x.tolist())
 
 
+class TestOutOfVocabulary(unittest.TestCase):
+    def test_unknown_class(self):
+        df = _load_dfgt(aux.haydn)
+        df["a_bass"] = "B##"
+        self.assertEqual(
+            Bass35(df).run("m2")[0, 0], Bass35.classList.index("C##")
+        )
+        with self.assertRaises(ValueError):
+            Bass35(df).run("M2")
+
+
 class TestHarmonicRhythm7(TestBass35):
     clas = HarmonicRhythm7
     encodingGT = aux.haydnHarmonicRhythm7
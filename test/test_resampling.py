@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from AugmentedNet import resampling
+
+
+class TestResampling(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "duration": [1.0, 0.5, 1.5],
+                "measure": [1, 1, 2],
+                "notes": [np.nan, ["C4", "E4"], ["G3"]],
+            },
+            index=pd.Index([0.0, 1.0, 1.5], name="offset"),
+        )
+
+    def test_fixed_grid(self):
+        grid = resampling.fixedGrid(self.df, self.df.duration, 0.5)
+        self.assertEqual(grid.tolist(), [0.0, 0.5, 1.0, 1.5, 2.0, 2.5])
+
+    def test_source_events(self):
+        offsets = np.array([0.0, 1.0, 1.5])
+        grid = np.array([0.0, 0.5, 1.0, 1.25, 2.0])
+        events, onsets = resampling.sourceEvents(offsets, grid)
+        self.assertEqual(events.tolist(), [0, 0, 1, 1, 2])
+        self.assertEqual(onsets.tolist(), [True, False, True, False, False])
+
+    def test_filled_positions(self):
+        missing = np.array([True, False, True, True, False, True])
+        forward = resampling.filledPositions(missing)
+        self.assertEqual(forward.tolist(), [-1, 1, 1, 1, 4, 4])
+        both = resampling.filledPositions(missing, backward=True)
+        self.assertEqual(both.tolist(), [1, 1, 1, 1, 4, 4])
+        allMissing = resampling.filledPositions(np.ones(2, bool), True)
+        self.assertEqual(allMissing.tolist(), [-1, -1])
+
+    def test_same_as_reindex(self):
+        grid = np.arange(0.0, 3.0, 0.25)
+        for backward in [False, True]:
+            with self.subTest(backward=backward):
+                df = self.df.reindex(index=self.df.index.union(grid))
+                df.fillna(method="ffill", inplace=True)
+                if backward:
+                    df.fillna(method="bfill", inplace=True)
+                df = df.reindex(index=grid)
+                resampled = resampling.resample(self.df, grid, backward)
+                self.assertTrue(df.astype(str).equals(resampled.astype(str)))
+                self.assertEqual(list(df.dtypes), list(resampled.dtypes))
+                self.assertEqual(resampled.index.name, "offset")
+
+    def test_integers_on_the_grid(self):
+        grid = np.array([0.0, 1.0, 1.5])
+        resampled = resampling.resample(self.df, grid)
+        self.assertEqual(resampled.measure.dtype, np.int64)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""Tests for AugmentedNet.romantext_parser."""
+
+import os
+import tempfile
+import unittest
+from fractions import Fraction
+
+import music21
+
+from AugmentedNet import annotation_parser, romantext_parser
+
+# A pickup, key changes, a pivot chord, a chord held across the barline,
+# a skipped measure, a measure copy, and a no-chord token
+ANNOTATION = """Composer: Nobody
+Title: Test
+Time Signature: 3/4
+
+m0 b3 C: V
+m1 I b2 V/V b3 V G: I
+Time Signature: 6/8
+m2 I6 b2 V7
+m3 b2 I
+m5 NC b2 d: V
+m6-7 = m2-3
+m8 C: I
+"""
+
+
+class TestRomanTextParser(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.write("annotation.rntxt", ANNOTATION)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w") as fd:
+            fd.write(content)
+        return path
+
+    def assertSameRomanNumerals(self, path):
+        s = annotation_parser._m21Parse(path)
+        romanNumeralsGT = [
+            (
+                rn.offset,
+                rn.measureNumber,
+                rn.quarterLength,
+                rn.key.tonicPitchNameWithCase,
+                rn.figure,
+            )
+            for rn in s.flat.getElementsByClass("RomanNumeral")
+        ]
+        romanNumerals = list(romantext_parser.romanNumerals(path))
+        self.assertEqual(len(romanNumeralsGT), len(romanNumerals))
+        for rnGT, rn in zip(romanNumeralsGT, romanNumerals):
+            with self.subTest(path=path, rn=rnGT):
+                self.assertEqual(rnGT, rn)
+
+    def test_roman_numerals(self):
+        romanNumerals = list(romantext_parser.romanNumerals(self.path))
+        self.assertEqual(
+            romanNumerals[:4],
+            [
+                (Fraction(0), 0, Fraction(1), "C", "V"),
+                (Fraction(1), 1, Fraction(1), "C", "I"),
+                (Fraction(2), 1, Fraction(1), "C", "V/V"),
+                (Fraction(3), 1, Fraction(1), "C", "V"),
+            ],
+        )
+        # The V7 is held until the second beat of m3
+        self.assertEqual(romanNumerals[6], (7, 3, Fraction(3, 2), "G", "V7"))
+        # The skipped m4 holds the I, and the no-chord is a rest
+        self.assertEqual(romanNumerals[8], (10, 4, 3, "G", "I"))
+        self.assertEqual(romanNumerals[9], (Fraction(29, 2), 5, 1.5, "d", "V"))
+        # The copies keep the number of the copied measures
+        self.assertEqual(romanNumerals[10], (16, 2, 1.5, "d", "I6"))
+
+    def test_same_as_music21(self):
+        self.assertSameRomanNumerals(self.path)
+
+    def test_corpus_same_as_music21(self):
+        for work in [
+            "bach/choraleAnalyses/riemenschneider001.rntxt",
+            "monteverdi/madrigal.3.1.rntxt",
+        ]:
+            path = str(music21.corpus.getWork(work))
+            self.assertSameRomanNumerals(path)
+
+    def test_unsupported_annotation(self):
+        content = ANNOTATION.replace("m6-7 = m2-3", "m6-7 = m12-13")
+        path = self.write("missing.rntxt", content)
+        with self.assertRaises(romantext_parser.UnsupportedAnnotation):
+            list(romantext_parser.romanNumerals(path))
+
+    def test_parse_annotation(self):
+        dfGT = annotation_parser.parseAnnotation(self.path, fastParser=False)
+        df = annotation_parser.parseAnnotation(self.path, fastParser=True)
+        self.assertTrue(dfGT.equals(df))
+
+
+if __name__ == "__main__":
+    unittest.main()
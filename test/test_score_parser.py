@@ -50,6 +50,20 @@ class TestScoreParser(unittest.TestCase):
             with self.subTest(gt_index=rowGT.Index, index=row.Index):
                 self.assertEqual(rowGT._asdict(), row._asdict())
 
+    def test_parse_score_return_streams(self):
+        dfGT = score_parser.from_tsv(aux.octaveTestReindexDataFrame)
+        df, s, chordified = score_parser.parseScore(
+            aux.octaveTest, fixedOffset=0.25, returnStreams=True
+        )
+        self.assertIsInstance(s, music21.stream.Score)
+        self.assertEqual(
+            len(chordified.flat.notesAndRests),
+            len(s.chordify().flat.notesAndRests),
+        )
+        for rowGT, row in zip(dfGT.itertuples(), df.itertuples()):
+            with self.subTest(gt_index=rowGT.Index, index=row.Index):
+                self.assertEqual(rowGT._asdict(), row._asdict())
+
     def test_parse_annotation_as_score(self):
         # The texturization is random, thus, set the seed here
         random.seed(1337)
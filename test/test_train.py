@@ -2,8 +2,44 @@
 
 import unittest
 
+import numpy as np
+
 import AugmentedNet.train
+from AugmentedNet.train import streamDataset
 
 
 class TestEvaluate(unittest.TestCase):
     pass
+
+
+class TestStreamDataset(unittest.TestCase):
+    def setUp(self):
+        sequences = np.arange(10, dtype=np.int8)
+        self.x = [np.broadcast_to(sequences[:, None, None], (10, 4, 3))]
+        self.y = [
+            np.broadcast_to(sequences[:, None], (10, 4)),
+            np.broadcast_to(-sequences[:, None], (10, 4)),
+        ]
+
+    def test_every_sequence_once_per_epoch(self):
+        dataset = streamDataset(
+            self.x, self.y, batchsize=4, shuffleBuffer=3, readers=2
+        )
+        for _ in range(2):
+            seen = []
+            for x, (y1, y2) in dataset.as_numpy_iterator():
+                self.assertEqual(x.shape[1:], (4, 3))
+                self.assertEqual(x.dtype, np.int8)
+                self.assertEqual(x[:, 0, 0].tolist(), y1[:, 0].tolist())
+                self.assertEqual(y1.tolist(), (-y2).tolist())
+                seen.extend(x[:, 0, 0].tolist())
+            self.assertEqual(sorted(seen), list(range(10)))
+
+    def test_no_shuffle_keeps_order(self):
+        dataset = streamDataset(self.x, self.y[:1], batchsize=4, shuffle=False)
+        batches = [x[:, 0, 0].tolist() for x, _ in dataset.as_numpy_iterator()]
+        self.assertEqual(batches, [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Tests for AugmentedNet.transposition."""
+
+import unittest
+
+import numpy as np
+
+from AugmentedNet.cache import TransposeKey, TransposePcSet, TransposePitch
+from AugmentedNet.feature_representation import (
+    INTERVALCLASSES,
+    KEYS,
+    PCSETS,
+    SPELLINGS,
+)
+from AugmentedNet.transposition import (
+    TRANSPOSEDKEYS,
+    TRANSPOSEDPCSETS,
+    TRANSPOSEDSPELLINGS,
+    fifthsSpelling,
+    intervalFifths,
+    spellingFifths,
+    transposeKeys,
+    transposePcSets,
+    transposeSpellings,
+)
+
+
+def _music21Index(classList, label):
+    return classList.index(label) if label in classList else -1
+
+
+class TestTransposition(unittest.TestCase):
+    def test_line_of_fifths(self):
+        fifths = sorted(spellingFifths(s) for s in SPELLINGS)
+        self.assertEqual(fifths, list(range(-15, 20)))
+        for spelling in SPELLINGS:
+            self.assertEqual(
+                fifthsSpelling(spellingFifths(spelling)), spelling
+            )
+        self.assertEqual(intervalFifths("m3"), -3)
+        self.assertEqual(intervalFifths("A4"), 6)
+
+    def test_tables(self):
+        for table in [TRANSPOSEDSPELLINGS, TRANSPOSEDKEYS, TRANSPOSEDPCSETS]:
+            self.assertEqual(table.dtype, np.int16)
+            self.assertEqual(table.shape[1], len(INTERVALCLASSES))
+
+    def test_spellings_against_music21(self):
+        transposed = transposeSpellings(SPELLINGS, INTERVALCLASSES)
+        for spelling, row in zip(SPELLINGS, transposed):
+            for interval, index in zip(INTERVALCLASSES, row):
+                fifths = spellingFifths(spelling) + intervalFifths(interval)
+                if abs((fifths + 1) // 7) > 3:
+                    # music21 respells quadruple accidentals inconsistently
+                    continue
+                m21 = TransposePitch(spelling, interval)
+                with self.subTest(spelling=spelling, interval=interval):
+                    self.assertEqual(index, _music21Index(SPELLINGS, m21))
+
+    def test_keys_against_music21(self):
+        transposed = transposeKeys(KEYS, INTERVALCLASSES)
+        for key, row in zip(KEYS, transposed):
+            for interval, index in zip(INTERVALCLASSES, row):
+                fifths = spellingFifths(key) + intervalFifths(interval)
+                if abs((fifths + 1) // 7) > 3:
+                    continue
+                m21 = TransposeKey(key, interval)
+                with self.subTest(key=key, interval=interval):
+                    self.assertEqual(index, _music21Index(KEYS, m21))
+
+    def test_pcsets_against_music21(self):
+        transposed = transposePcSets(PCSETS, INTERVALCLASSES)
+        for pcset, row in zip(PCSETS, transposed):
+            for interval, index in zip(INTERVALCLASSES, row):
+                m21 = TransposePcSet(pcset, interval)
+                self.assertEqual(index, _music21Index(PCSETS, m21))
+
+    def test_transpose_column(self):
+        column = ["C", "E-", "C", "B##"]
+        transposed = transposeSpellings(column, "M3")
+        expected = [SPELLINGS.index(s) for s in ["E", "G", "E"]] + [-1]
+        self.assertEqual(transposed.tolist(), expected)
+        transposed = transposeKeys(["c", "a"], ["P1", "P5"])
+        self.assertEqual(transposed.shape, (2, 2))
+        self.assertEqual(KEYS[transposed[1, 1]], "e")
+
+
+if __name__ == "__main__":
+    unittest.main()
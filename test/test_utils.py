@@ -1,9 +1,56 @@
 """Tests for AugmentedNet.utils."""
 
+import os
+import tempfile
 import unittest
 
-import AugmentedNet.utils
+import numpy as np
+
+from AugmentedNet.utils import DynamicArray, padToSequenceLength
 
 
 class TestUtils(unittest.TestCase):
-    pass
+    def test_pad_to_sequence_length(self):
+        arr = np.ones((5, 3))
+        padded = padToSequenceLength(arr, 4, value=-1)
+        self.assertEqual(padded.shape, (2, 4, 3))
+        self.assertTrue((padded[1, 1:] == -1).all())
+        self.assertTrue((padded.reshape(-1, 3)[:5] == 1).all())
+
+    def test_pad_to_sequence_length_leading_axes(self):
+        arr = np.arange(2 * 5 * 3).reshape(2, 5, 3)
+        padded = padToSequenceLength(arr, 4, value=-1)
+        self.assertEqual(padded.shape, (2, 2, 4, 3))
+        for stacked, single in zip(padded, arr):
+            expected = padToSequenceLength(single, 4, value=-1)
+            self.assertEqual(stacked.tolist(), expected.tolist())
+
+    def test_dynamic_array_extend(self):
+        rng = np.random.default_rng(0)
+        batches = [rng.integers(-1, 2, (n, 4, 3)) for n in [1, 3, 0, 9, 2]]
+        with tempfile.TemporaryDirectory() as tmp:
+            array = DynamicArray((0, 4, 3), "int8", chunkRows=4, tmpdir=tmp)
+            array.reserve(100)
+            for batch in batches:
+                array.extend(batch)
+            array.update(np.ones((4, 3)))
+            finalized = array.finalize()
+            expected = np.concatenate(batches + [np.ones((1, 4, 3))])
+            self.assertEqual(finalized.dtype, np.int8)
+            self.assertEqual(finalized.tolist(), expected.tolist())
+            del finalized
+            array.close()
+            self.assertEqual(os.listdir(tmp), [])
+
+    def test_dynamic_array_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "array.npy")
+            array = DynamicArray((0, 2), "int8", path=path)
+            array.extend(np.arange(6).reshape(3, 2))
+            array.finalize()
+            array.close()
+            self.assertEqual(np.load(path).tolist(), [[0, 1], [2, 3], [4, 5]])
+
+
+if __name__ == "__main__":
+    unittest.main()